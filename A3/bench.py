@@ -0,0 +1,337 @@
+"""
+================================================================================
+A3 MANAGER - MICROBENCHMARKS
+================================================================================
+
+PURPOSE:
+
+Times the parsing stages of A3/main.py so changes to the parser can be compared
+against the previous implementation, and measures the memory held by parsed
+spaces and verdicts (slotted records vs. the previous per-space dicts).
+
+With --suite, every pipeline stage (parse_space_block, parse_analysis_summary,
+decide_verdict, report writing, and the whole run_report) and the previous
+in-memory split_space_blocks kept here for comparison are timed separately on
+synthetic inputs of each requested size (see synth.py). Results are written as JSON so runs on different commits can
+be compared with --compare.
+
+USAGE:
+
+    python A3/bench.py [--spaces N]
+    python A3/bench.py --suite [--sizes 100,1000,10000] [--out FILE] [--compare OLD.json]
+
+================================================================================
+"""
+
+# ===========================
+# IMPORTS
+# ===========================
+
+from pathlib import Path
+import argparse
+import json
+import platform
+import re
+import subprocess
+import tempfile
+import time
+import timeit
+import tracemalloc
+from typing import Dict, Any, List, Optional
+
+import main
+import synth
+
+# ===========================
+# REFERENCE: PER-LABEL REGEX PARSER (PREVIOUS parse_space_block)
+# ===========================
+
+def regex_parse_space_block(block: str) -> Optional[Dict[str, Any]]:
+    first = block.splitlines()[0].strip()
+    m = re.match(r"Space\s*:\s*(.+)$", first, re.IGNORECASE)
+    if not m:
+        return None
+    title = m.group(1).strip()
+    parts = re.split(r"[:\s]+", title)
+    space_id = parts[-1] if parts else title
+
+    def find_int(label: str) -> Optional[int]:
+        mm = re.search(rf"{re.escape(label)}\s*:\s*([0-9]+)", block, re.IGNORECASE)
+        return int(mm.group(1)) if mm else None
+
+    def to_cm(val: float, unit: Optional[str]) -> float:
+        unit = (unit or "cm").lower()
+        if unit == "m":
+            return val * 100.0
+        if unit == "mm":
+            return val / 10.0
+        return val
+
+    n_desks = find_int("No. of desks in this space") or 0
+    n_doors = find_int("No. of doors")
+
+    total_door = None
+    mm = re.search(r"Total door width(?:[^\n:]*):\s*([\d\.,]+)\s*(cm|mm|m)?", block, re.IGNORECASE)
+    if mm:
+        total_door = to_cm(float(mm.group(1).replace(",", ".")), mm.group(2))
+
+    ratio = None
+    mm2 = re.search(r"Desk to door width ratio\s*:\s*([\d\.,]+)\s*(cm|mm|m)?", block, re.IGNORECASE)
+    if mm2:
+        ratio = to_cm(float(mm2.group(1).replace(",", ".")), mm2.group(2))
+
+    floor = None
+    mf = re.search(r"Floor\s*:\s*(.+)", block, re.IGNORECASE)
+    if mf:
+        floor = mf.group(1).strip()
+
+    area = None
+    ma = re.search(r"Area\s*:\s*([\d\.,]+)\s*m2", block, re.IGNORECASE)
+    if ma:
+        area = float(ma.group(1).replace(",", "."))
+
+    height = None
+    mh = re.search(r"Height of space\s*:\s*([\d\.,]+)\s*m", block, re.IGNORECASE)
+    if mh:
+        height = float(mh.group(1).replace(",", "."))
+
+    return {
+        "space_id": str(space_id),
+        "title": title,
+        "n_desks": n_desks,
+        "n_doors_reported": n_doors,
+        "total_door_width_cm_reported": total_door,
+        "desk_to_door_ratio_cm": ratio,
+        "area_m2": area,
+        "height_m": height,
+        "floor": floor,
+    }
+
+# ===========================
+# REFERENCE: WHOLE-FILE BLOCK SPLITTER (PREVIOUS split_space_blocks)
+# ===========================
+
+def split_space_blocks(txt: str) -> List[str]:
+    """The whole desk report split into 'Space:' blocks in memory; main.iter_desk_report_blocks streams them instead."""
+    blocks = re.split(r"\n(?=Space\s*:)", txt)
+    return [b.strip() for b in blocks if b.strip()]
+
+# ===========================
+# BENCHMARKS
+# ===========================
+
+def bench_parse_space_block(repeat: int = 5, number: int = 200) -> Dict[str, float]:
+    """
+    Per-block cost (microseconds) of the table-driven parser vs. the per-label
+    regex parser, measured over every space block in the default GRP02 report.
+    """
+    blocks = [rec["raw"] for kind, rec in main.iter_desk_report(main.DESK_TXT, keep_raw=True) if kind == "space"]
+
+    # both parsers must agree before timing means anything
+    for b in blocks:
+        new = main.parse_space_block(b)
+        new = {k: v for k, v in new.items() if k not in ("raw", "unrecognised_labels")}
+        assert new == regex_parse_space_block(b), b.splitlines()[0]
+
+    def run(fn):
+        t = min(timeit.repeat(lambda: [fn(b) for b in blocks], repeat=repeat, number=number))
+        return t / (number * len(blocks)) * 1e6
+
+    regex_us = run(regex_parse_space_block)
+    table_us = run(main.parse_space_block)
+    return {"blocks": len(blocks), "regex_us_per_block": regex_us, "table_us_per_block": table_us, "speedup": regex_us / table_us}
+
+def synthetic_blocks(n_spaces: int) -> List[str]:
+    """n_spaces 'Space:' blocks made by cycling the blocks of the default report with fresh space ids."""
+    real = list(main.iter_desk_report_blocks(main.DESK_TXT))
+    real = [text for kind, text in real if kind == "space"]
+    blocks = []
+    for i in range(n_spaces):
+        first, _, rest = real[i % len(real)].partition("\n")
+        name = first.split(":")[1].strip()
+        blocks.append(f"Space: {name}:{9000000 + i}\n{rest}")
+    return blocks
+
+def traced_bytes(build) -> int:
+    """Bytes still allocated by build() once it returns (its result kept alive)."""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        kept = build()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del kept
+    return after - before
+
+def bench_memory(n_spaces: int = 100_000) -> Dict[str, Any]:
+    """
+    Memory held by the parsed spaces plus their verdicts for n_spaces synthetic spaces:
+     - "dicts":  previous layout, a dict per space with the raw block and a detail
+                 dict per space with formatted reasons
+     - "slots":  SpaceRecord / SpaceVerdict, raw text dropped, reasons unformatted
+    """
+    blocks = synthetic_blocks(n_spaces)
+    analysis, _ = main.parse_analysis_summary(main.ANALYSIS_SUMMARY_TXT)
+
+    def build_dicts():
+        spaces, details = {}, []
+        for b in blocks:
+            rec = regex_parse_space_block(b)
+            rec.update({"unrecognised_labels": [], "raw": b})
+            spaces[rec["space_id"]] = rec
+        for sid, rec in spaces.items():
+            verdict, reasons, statement = main.decide_verdict(rec, analysis)
+            details.append(main.space_detail(sid, rec, verdict, reasons, statement))
+        return spaces, details
+
+    def build_slots():
+        spaces = {}
+        for b in blocks:
+            rec = main.parse_space_block(b)
+            spaces[rec.space_id] = rec
+        return spaces, [(sid, rec, main.evaluate_space(rec, analysis)) for sid, rec in spaces.items()]
+
+    # blocks are shared input; in the old layout each record also holds on to its block
+    dict_bytes = traced_bytes(build_dicts)
+    slot_bytes = traced_bytes(build_slots)
+    return {"spaces": n_spaces, "dict_bytes": dict_bytes, "slot_bytes": slot_bytes, "reduction": 1 - slot_bytes / dict_bytes}
+
+# ===========================
+# STAGE SUITE ON SYNTHETIC INPUTS
+# ===========================
+
+SUITE_SIZES = (100, 1_000, 10_000)
+SUITE_STAGES = ("split_space_blocks", "parse_space_block", "parse_analysis_summary", "decide_verdict", "write_reports", "run_report")
+
+def best_of(fn, repeat: int) -> float:
+    """Fastest wall time of repeat calls, in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def write_reports(details: List[Dict[str, Any]], summary: Dict[str, Any], out_dir: Path):
+    """The TXT, JSON and HTML sinks of run_report, fed with ready-made details."""
+    sinks = [main.TextReportSink(out_dir / "bench.txt"), main.JsonReportSink(out_dir / "bench.json"),
+             main.render.HtmlReportSink(out_dir / "bench.html")]
+    for d in details:
+        for sink in sinks:
+            sink.write(d)
+    for sink in sinks:
+        sink.close(summary)
+
+def bench_stages(n_spaces: int, work_dir: Path, seed: int = 0) -> Dict[str, Any]:
+    """Seconds per stage for one synthetic input size (best of 3 below 10^5 spaces, else one run)."""
+    inputs = synth.write_inputs(work_dir, n_spaces, seed)
+    repeat = 3 if n_spaces < 100_000 else 1
+    out_dir = work_dir / f"out_{n_spaces}"
+    out_dir.mkdir(exist_ok=True)
+
+    txt = main.read_text(inputs["desks"])
+    blocks = [b for kind, b in main.iter_desk_report_blocks(inputs["desks"]) if kind == "space"]
+    parsed, desks_outside, warnings = main.load_desk_report(inputs["desks"])
+    analysis, _ = main.parse_analysis_summary(inputs["analysis"])
+    ids = sorted(parsed, key=str)
+
+    def details():
+        return [main.space_detail(sid, parsed[sid], *main.decide_verdict(parsed[sid], analysis)) for sid in ids]
+
+    ready = details()
+    seconds = {
+        "split_space_blocks": best_of(lambda: split_space_blocks(txt), repeat),
+        "parse_space_block": best_of(lambda: [main.parse_space_block(b) for b in blocks], repeat),
+        "parse_analysis_summary": best_of(lambda: main.parse_analysis_summary(inputs["analysis"]), repeat),
+        "decide_verdict": best_of(lambda: [main.decide_verdict(parsed[sid], analysis) for sid in ids], repeat),
+    }
+    totals = main.run_report(inputs["desks"], inputs["analysis"], report_dir=out_dir)["totals"]
+    summary = {"ts": "bench", "source_path": inputs["desks"], "analysis_path": inputs["analysis"], "warnings": warnings,
+               "totals": totals, "cm_per_occupant": main.BR18_CM_PER_OCCUPANT, "desks_outside": desks_outside}
+    seconds["write_reports"] = best_of(lambda: write_reports(ready, summary, out_dir), repeat)
+    seconds["run_report"] = best_of(lambda: main.run_report(inputs["desks"], inputs["analysis"], report_dir=out_dir), repeat)
+
+    return {
+        "spaces": len(parsed),
+        "space_blocks": len(blocks),
+        "desk_report_bytes": inputs["desks"].stat().st_size,
+        "seconds": {k: round(v, 6) for k, v in seconds.items()},
+        "us_per_space": {k: round(v / max(1, len(parsed)) * 1e6, 3) for k, v in seconds.items()},
+    }
+
+def git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=main.REPO_ROOT, capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+def run_suite(sizes: List[int], work_dir: Optional[Path] = None, seed: int = 0) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as tmp:
+        work = Path(work_dir) if work_dir else Path(tmp)
+        work.mkdir(parents=True, exist_ok=True)
+        results = {str(n): bench_stages(n, work, seed) for n in sizes}
+    return {
+        "generated": main.now_ts(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": seed,
+        "results": results,
+    }
+
+def compare_suites(new: Dict[str, Any], old: Dict[str, Any]) -> List[str]:
+    """One line per size and stage present in both runs: old -> new time and the ratio."""
+    lines = [f"compared with {old.get('commit') or '?'} ({old.get('generated')}):"]
+    for size, res in new["results"].items():
+        prev = old.get("results", {}).get(size)
+        if not prev:
+            continue
+        for stage in SUITE_STAGES:
+            a, b = prev["seconds"].get(stage), res["seconds"].get(stage)
+            if a and b:
+                lines.append(f" {size:>8} {stage:<24} {a * 1e3:>10.3f} ms -> {b * 1e3:>10.3f} ms  x{b / a:.2f}")
+    return lines
+
+# ===========================
+# MAIN / CLI
+# ===========================
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="A3 manager microbenchmarks.")
+    parser.add_argument("--spaces", type=int, default=100_000, help="synthetic spaces for the memory measurement")
+    parser.add_argument("--suite", action="store_true", help="time every pipeline stage on synthetic inputs instead")
+    parser.add_argument("--sizes", default=",".join(str(n) for n in SUITE_SIZES), help="comma-separated space counts for --suite (up to 10^6)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--work", type=Path, default=None, help="keep the synthetic inputs and reports in this folder")
+    parser.add_argument("--out", type=Path, default=None, help="suite results JSON (default A3/Results/bench_<timestamp>.json)")
+    parser.add_argument("--compare", type=Path, default=None, help="earlier suite results JSON to compare with")
+    args = parser.parse_args()
+
+    if args.suite:
+        suite = run_suite([int(n) for n in args.sizes.split(",") if n.strip()], args.work, args.seed)
+        out = args.out or main.REPORT_DIR / f"bench_{suite['generated']}.json"
+        out.write_text(json.dumps(suite, indent=2), encoding="utf-8")
+        print(f"{'spaces':>8} " + " ".join(f"{s[:14]:>14}" for s in SUITE_STAGES) + "   (us per space)")
+        for size, res in suite["results"].items():
+            print(f"{size:>8} " + " ".join(f"{res['us_per_space'][s]:>14.2f}" for s in SUITE_STAGES))
+        if args.compare:
+            print("\n".join(compare_suites(suite, json.loads(args.compare.read_text(encoding="utf-8")))))
+        print("Suite results written:", out)
+        return
+
+    r = bench_parse_space_block()
+    print(f"parse_space_block over {r['blocks']} blocks:")
+    print(f" per-label regex : {r['regex_us_per_block']:.1f} us/block")
+    print(f" table-driven    : {r['table_us_per_block']:.1f} us/block")
+    print(f" speedup         : {r['speedup']:.2f}x")
+
+    m = bench_memory(args.spaces)
+    print(f"memory held by {m['spaces']} spaces + verdicts:")
+    print(f" dict records    : {m['dict_bytes'] / 1e6:.1f} MB")
+    print(f" slotted records : {m['slot_bytes'] / 1e6:.1f} MB")
+    print(f" reduction       : {m['reduction']:.0%}")
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,338 @@
+"""
+================================================================================
+RUN HISTORY (SQLITE) FOR THE A3 MANAGER SCRIPT
+================================================================================
+
+PURPOSE:
+
+Keeps every report run in one local SQLite database, so questions such as
+"when did space 1158149 start failing?" are answered with one indexed query
+instead of re-reading every spaces_accessibility_allspaces_<ts>.json.
+
+ - main.py --history [DB] adds a HistorySink next to the TXT/JSON/HTML sinks:
+   one row per run, one row per space, all in a single transaction
+   (executemany in batches), committed only when the run completes
+ - older JSON reports can be back-filled with the import command
+
+TABLES:
+
+ - runs        (run_id, ts, report_path, source_path, analysis_path, totals
+                columns, totals_json)                      index: ts
+ - spaces      (run_id, space_id, title, floor, n_desks, door width, verdict,
+                reasons_json, fire_route_statement)
+               primary key (run_id, space_id); indexes: (space_id, run_id),
+               (floor, run_id), (verdict, run_id)
+ - run_floors  (run_id, floor, spaces, pass, fail, unknown, not_applicable,
+                desks), counted while the run is written  index: (floor, run_id)
+
+USAGE:
+
+    python A3/history.py [--db DB] runs [--last N]
+    python A3/history.py [--db DB] space SPACE_ID
+    python A3/history.py [--db DB] diff [RUN_A RUN_B]       (default: last two runs)
+    python A3/history.py [--db DB] floors [--floor NAME] [--last N]
+    python A3/history.py [--db DB] import REPORT.json [...]
+
+ DB defaults to A3/Results/accessibility_history.sqlite.
+
+================================================================================
+"""
+
+# ===========================
+# IMPORTS
+# ===========================
+
+from pathlib import Path
+import argparse
+import json
+import sqlite3
+from typing import Dict, Any, List, Optional, Iterable
+
+# ===========================
+# CONSTANTS
+# ===========================
+
+DEFAULT_DB = Path(__file__).resolve().parent / "Results" / "accessibility_history.sqlite"
+SCHEMA_VERSION = 1
+INSERT_BATCH = 5000
+FLOOR_COUNT_SLOT = {"PASS": 1, "FAIL": 2, "UNKNOWN": 3, "NOT_APPLICABLE": 4}   # run_floors counts: spaces, pass, fail, unknown, not_applicable, desks
+NO_FLOOR = "(no floor)"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    ts TEXT NOT NULL,
+    report_path TEXT UNIQUE,
+    source_path TEXT,
+    analysis_path TEXT,
+    spaces_scanned INTEGER,
+    spaces_with_desks INTEGER,
+    spaces_pass INTEGER,
+    spaces_fail INTEGER,
+    spaces_unknown INTEGER,
+    spaces_not_applicable INTEGER,
+    desks_total INTEGER,
+    br18_min_total_door_width_cm REAL,
+    door_width_reported_total_cm REAL,
+    totals_json TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_ts ON runs (ts);
+
+CREATE TABLE IF NOT EXISTS spaces (
+    run_id INTEGER NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+    space_id TEXT NOT NULL,
+    title TEXT,
+    floor TEXT,
+    n_desks INTEGER,
+    n_doors_reported INTEGER,
+    total_door_width_cm_reported REAL,
+    verdict TEXT NOT NULL,
+    reasons_json TEXT,
+    fire_route_statement TEXT,
+    PRIMARY KEY (run_id, space_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS spaces_space ON spaces (space_id, run_id);
+CREATE INDEX IF NOT EXISTS spaces_floor ON spaces (floor, run_id);
+CREATE INDEX IF NOT EXISTS spaces_verdict ON spaces (verdict, run_id);
+
+CREATE TABLE IF NOT EXISTS run_floors (
+    run_id INTEGER NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+    floor TEXT NOT NULL,
+    spaces INTEGER NOT NULL,
+    pass INTEGER NOT NULL,
+    fail INTEGER NOT NULL,
+    unknown INTEGER NOT NULL,
+    not_applicable INTEGER NOT NULL,
+    desks INTEGER NOT NULL,
+    PRIMARY KEY (run_id, floor)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS run_floors_floor ON run_floors (floor, run_id);
+"""
+
+# ===========================
+# DATABASE
+# ===========================
+
+def connect(db_path: Path) -> sqlite3.Connection:
+    """Opens (and if needed creates) the history database. Transactions are explicit (BEGIN/COMMIT)."""
+    db_path = Path(db_path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(str(db_path), isolation_level=None)
+    con.row_factory = sqlite3.Row
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA foreign_keys=ON")
+    if con.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+        con.executescript(SCHEMA)
+        con.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+    return con
+
+# ===========================
+# HISTORY SINK (SAME INTERFACE AS THE REPORT SINKS IN main.py)
+# ===========================
+
+class HistorySink:
+    """
+    write(detail) per space, close(summary) once. Everything goes into one
+    transaction that is only committed by close(); a run that dies half-way
+    leaves no rows behind. A run whose report_path is already in the database
+    replaces it (the report file was overwritten), or is skipped with
+    skip_existing=True (used by the import command).
+    """
+
+    def __init__(self, db_path: Path, ts: str, report_path: Optional[Path] = None,
+                 source_path: Optional[Path] = None, analysis_path: Optional[Path] = None, skip_existing: bool = False):
+        self.con = connect(db_path)
+        self.rows: List[tuple] = []
+        self.floors: Dict[str, List[int]] = {}
+        existing = self.con.execute("SELECT run_id FROM runs WHERE report_path = ?", (str(report_path),)).fetchone() \
+            if report_path is not None else None
+        self.skipped = existing is not None and skip_existing
+        self.run_id = None
+        if self.skipped:
+            return
+        self.con.execute("BEGIN")
+        if existing is not None:
+            self.con.execute("DELETE FROM runs WHERE run_id = ?", (existing[0],))
+        self.run_id = self.con.execute(
+            "INSERT INTO runs (ts, report_path, source_path, analysis_path) VALUES (?, ?, ?, ?)",
+            (ts, str(report_path) if report_path else None,
+             str(source_path) if source_path else None, str(analysis_path) if analysis_path else None)).lastrowid
+
+    def write(self, d: Dict[str, Any]):
+        if self.skipped:
+            return
+        verdict = d["verdict"]
+        self.rows.append((self.run_id, str(d["space_id"]), d.get("title"), d.get("floor"), d.get("n_desks") or 0,
+                          d.get("n_doors_reported"), d.get("total_door_width_cm_reported"), verdict,
+                          json.dumps(d.get("reasons") or [], ensure_ascii=False), d.get("fire_route_statement")))
+        counts = self.floors.setdefault(d.get("floor") or NO_FLOOR, [0, 0, 0, 0, 0, 0])
+        counts[0] += 1
+        if verdict in FLOOR_COUNT_SLOT:
+            counts[FLOOR_COUNT_SLOT[verdict]] += 1
+        counts[5] += d.get("n_desks") or 0
+        if len(self.rows) >= INSERT_BATCH:
+            self.flush()
+
+    def flush(self):
+        self.con.executemany("INSERT INTO spaces VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", self.rows)
+        self.rows = []
+
+    def close(self, summary: Dict[str, Any]):
+        if self.skipped:
+            self.con.close()
+            return
+        try:
+            self.flush()
+            self.con.executemany("INSERT INTO run_floors VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                 [(self.run_id, floor, *counts) for floor, counts in self.floors.items()])
+            t = summary["totals"]
+            self.con.execute(
+                "UPDATE runs SET spaces_scanned = ?, spaces_with_desks = ?, spaces_pass = ?, spaces_fail = ?,"
+                " spaces_unknown = ?, spaces_not_applicable = ?, desks_total = ?, br18_min_total_door_width_cm = ?,"
+                " door_width_reported_total_cm = ?, totals_json = ? WHERE run_id = ?",
+                (t.get("spaces_scanned"), t.get("spaces_with_desks"), t.get("spaces_pass"), t.get("spaces_fail"),
+                 t.get("spaces_unknown"), t.get("spaces_not_applicable"), t.get("desks_total"),
+                 t.get("br18_min_total_door_width_cm"), t.get("door_width_reported_total_cm"),
+                 json.dumps(t, ensure_ascii=False, default=str), self.run_id))
+            self.con.execute("COMMIT")
+        except Exception:
+            self.con.execute("ROLLBACK")
+            raise
+        finally:
+            self.con.close()
+
+def import_report(db_path: Path, json_path: Path) -> Optional[int]:
+    """Back-fills one spaces_accessibility_allspaces_<ts>.json; returns the run_id, or None if it was already imported."""
+    json_path = Path(json_path).resolve()
+    with json_path.open("r", encoding="utf-8") as f:
+        report = json.load(f)
+    sink = HistorySink(db_path, report.get("generated") or "", report_path=json_path, skip_existing=True)
+    for d in report.get("details") or []:
+        sink.write(d)
+    run_id = sink.run_id
+    sink.close({"totals": report.get("totals") or {}})
+    return run_id
+
+# ===========================
+# QUERIES
+# ===========================
+
+def list_runs(con: sqlite3.Connection, last: Optional[int] = None) -> List[Dict[str, Any]]:
+    rows = con.execute(
+        "SELECT run_id, ts, spaces_scanned, spaces_pass, spaces_fail, spaces_unknown, spaces_not_applicable,"
+        " desks_total, report_path FROM runs ORDER BY run_id DESC LIMIT ?", (last if last else -1,)).fetchall()
+    return [dict(r) for r in reversed(rows)]
+
+def space_history(con: sqlite3.Connection, space_id: str) -> List[Dict[str, Any]]:
+    """The space's verdict in every run it appears in, oldest first; "changed" marks a new verdict."""
+    rows = con.execute(
+        "SELECT s.run_id, r.ts, s.verdict, s.n_desks, s.total_door_width_cm_reported, s.floor"
+        " FROM spaces s JOIN runs r ON r.run_id = s.run_id WHERE s.space_id = ? ORDER BY s.run_id",
+        (str(space_id),)).fetchall()
+    out, previous = [], None
+    for r in rows:
+        entry = dict(r)
+        entry["changed"] = previous is not None and r["verdict"] != previous
+        previous = r["verdict"]
+        out.append(entry)
+    return out
+
+def last_two_runs(con: sqlite3.Connection) -> List[int]:
+    return [r[0] for r in reversed(con.execute("SELECT run_id FROM runs ORDER BY run_id DESC LIMIT 2").fetchall())]
+
+def verdict_changes(con: sqlite3.Connection, run_a: int, run_b: int) -> List[Dict[str, Any]]:
+    """Spaces whose verdict differs between two runs; a missing side (space added/removed) has verdict None."""
+    rows = con.execute(
+        "SELECT a.space_id, a.verdict AS verdict_a, b.verdict AS verdict_b, COALESCE(b.floor, a.floor) AS floor"
+        " FROM spaces a LEFT JOIN spaces b ON b.run_id = ? AND b.space_id = a.space_id"
+        " WHERE a.run_id = ? AND b.verdict IS NOT a.verdict"
+        " UNION ALL"
+        " SELECT b.space_id, NULL, b.verdict, b.floor FROM spaces b"
+        " WHERE b.run_id = ? AND NOT EXISTS (SELECT 1 FROM spaces a WHERE a.run_id = ? AND a.space_id = b.space_id)"
+        " ORDER BY 1",
+        (run_b, run_a, run_b, run_a)).fetchall()
+    return [dict(r) for r in rows]
+
+def floor_trends(con: sqlite3.Connection, floor: Optional[str] = None, last: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Per-floor verdict counts per run (oldest first), optionally for one floor and the last N runs."""
+    first_run = 0
+    if last:
+        row = con.execute("SELECT MIN(run_id) FROM (SELECT run_id FROM runs ORDER BY run_id DESC LIMIT ?)", (last,)).fetchone()
+        first_run = row[0] or 0
+    sql = ("SELECT f.run_id, r.ts, f.floor, f.spaces, f.pass, f.fail, f.unknown, f.not_applicable, f.desks"
+           " FROM run_floors f JOIN runs r ON r.run_id = f.run_id WHERE f.run_id >= ?")
+    params: List[Any] = [first_run]
+    if floor is not None:
+        sql += " AND f.floor = ?"
+        params.append(floor)
+    return [dict(r) for r in con.execute(sql + " ORDER BY f.run_id, f.floor", params).fetchall()]
+
+# ===========================
+# PRINTING
+# ===========================
+
+def print_rows(rows: Iterable[Dict[str, Any]], columns: List[str]):
+    rows = list(rows)
+    if not rows:
+        print("(no rows)")
+        return
+    widths = [max(len(c), *(len(str(r.get(c) if r.get(c) is not None else "-")) for r in rows)) for c in columns]
+    print("  ".join(c.ljust(w) for c, w in zip(columns, widths)))
+    for r in rows:
+        print("  ".join(str(r.get(c) if r.get(c) is not None else "-").ljust(w) for c, w in zip(columns, widths)))
+
+# ===========================
+# MAIN / CLI
+# ===========================
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Query the A3 report run history (SQLite).")
+    parser.add_argument("--db", type=Path, default=DEFAULT_DB, help=f"history database (default {DEFAULT_DB})")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("runs", help="list the runs with their totals")
+    p.add_argument("--last", type=int, default=None)
+    p = sub.add_parser("space", help="verdict of one space in every run")
+    p.add_argument("space_id")
+    p = sub.add_parser("diff", help="spaces whose verdict changed between two runs (default: the last two)")
+    p.add_argument("runs", type=int, nargs="*", metavar="RUN_ID")
+    p = sub.add_parser("floors", help="verdict counts per floor and run")
+    p.add_argument("--floor", default=None)
+    p.add_argument("--last", type=int, default=None)
+    p = sub.add_parser("import", help="back-fill spaces_accessibility_allspaces_<ts>.json reports")
+    p.add_argument("reports", type=Path, nargs="+")
+    args = parser.parse_args()
+
+    if args.command == "import":
+        for path in args.reports:
+            run_id = import_report(args.db, path)
+            print(f"{path}: " + (f"run {run_id}" if run_id is not None else "already imported"))
+        return
+
+    con = connect(args.db)
+    try:
+        if args.command == "runs":
+            print_rows(list_runs(con, args.last), ["run_id", "ts", "spaces_scanned", "spaces_pass", "spaces_fail",
+                                                   "spaces_unknown", "spaces_not_applicable", "desks_total"])
+        elif args.command == "space":
+            rows = space_history(con, args.space_id)
+            print_rows(rows, ["run_id", "ts", "verdict", "changed", "n_desks", "total_door_width_cm_reported", "floor"])
+            fails = [r for r in rows if r["verdict"] == "FAIL" and (r["changed"] or r is rows[0])]
+            if fails:
+                print(f"Latest start of FAIL: run {fails[-1]['run_id']} ({fails[-1]['ts']})")
+        elif args.command == "diff":
+            if len(args.runs) not in (0, 2):
+                parser.error("diff takes two run IDs or none")
+            run_a, run_b = args.runs or (last_two_runs(con) + [None, None])[:2]
+            if run_b is None:
+                print("Need at least two runs in", args.db)
+                return
+            print(f"Verdict changes from run {run_a} to run {run_b}:")
+            print_rows(verdict_changes(con, run_a, run_b), ["space_id", "verdict_a", "verdict_b", "floor"])
+        elif args.command == "floors":
+            print_rows(floor_trends(con, args.floor, args.last),
+                       ["run_id", "ts", "floor", "spaces", "pass", "fail", "unknown", "not_applicable", "desks"])
+    finally:
+        con.close()
+
+if __name__ == "__main__":
+    main_cli()
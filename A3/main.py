@@ -21,6 +21,21 @@ OUTPUT FILES:
     (Human-readable report with per-space verdicts)
  - A3/reports/spaces_accessibility_allspaces_<timestamp>.json
     (Machine-readable JSON with detailed results)
+ - A3/reports/spaces_accessibility_allspaces_<timestamp>.html
+    (Self-contained HTML report: summary, SVG charts, per-floor table, linked per-space reasons)
+ - A3/reports/spaces_accessibility_chart_<timestamp>.svg   (.png with --chart png)
+ - A3/reports/spaces_accessibility_floors_<timestamp>.svg   (verdicts per floor)
+ - A3/reports/spaces_accessibility_allspaces_<timestamp>.ndjson   (with --ndjson)
+    (One JSON object per space and line; the last line holds the totals)
+ - A3/reports/profile_<timestamp>.prof   (with --profile; cProfile stats)
+ - A3/Results/accessibility_history.sqlite   (with --history; run history, see history.py)
+
+Unchanged inputs, parameters and options are detected (see parse_cache.py): the
+run then writes nothing and prints the existing report's path (--no-cache to
+force a new report).
+
+The JSON totals carry a "perf" block with wall/CPU seconds and record counts per
+stage (tracemalloc peaks per stage with --trace-memory).
 
 BR18 COMPLIANCE RULES:
 
@@ -50,17 +65,25 @@ the fire route statement reflects this even if local space data passes.
 
 from pathlib import Path
 import re
+import csv
 import json
+import marshal
+import math
+import mmap
+import os
+import argparse
 import datetime
-from typing import Dict, Any, List, Tuple, Optional
-
-# OPTIONAL IMPORT FOR CHARTS (non-fatal)
-
-try:
-    import matplotlib.pyplot as plt
-    MATPLOTLIB_AVAILABLE = True
-except Exception:
-    MATPLOTLIB_AVAILABLE = False
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Any, List, Tuple, Optional, Iterator, Iterable
+
+import render   # dependency-free SVG charts and HTML report; matplotlib is only loaded for PNG charts
+import spatial  # grid index of space footprints for desks outside any IfcSpace
 
 # ===========================
 # CONSTANTS AND PATHS
@@ -91,323 +114,1620 @@ def read_text(path: Path) -> str:
         raise FileNotFoundError(path)
     return path.read_text(encoding="utf-8", errors="ignore")
 
+# ===========================
+# COMPACT SPACE / VERDICT RECORDS
+# ===========================
+
+SPACE_RECORD_FIELDS = ("space_id", "title", "n_desks", "n_doors_reported", "total_door_width_cm_reported",
+                       "desk_to_door_ratio_cm", "area_m2", "height_m", "floor", "unrecognised_labels", "raw")
+
+class SpaceRecord:
+    """
+    One parsed space, stored in fixed slots instead of a per-space dict. Read
+    access is dict-like (rec["floor"], rec.get("floor"), dict(rec)), so code
+    written against the old dict records keeps working. Floor names are
+    interned: thousands of spaces share a handful of floor strings.
+    """
+    __slots__ = SPACE_RECORD_FIELDS
+
+    def __init__(self, space_id: str, title: Optional[str], n_desks: int = 0, n_doors_reported: Optional[int] = None,
+                 total_door_width_cm_reported: Optional[float] = None, desk_to_door_ratio_cm: Optional[float] = None,
+                 area_m2: Optional[float] = None, height_m: Optional[float] = None, floor: Optional[str] = None,
+                 unrecognised_labels: Tuple[str, ...] = (), raw: Optional[str] = None):
+        self.space_id = space_id
+        self.title = title
+        self.n_desks = n_desks
+        self.n_doors_reported = n_doors_reported
+        self.total_door_width_cm_reported = total_door_width_cm_reported
+        self.desk_to_door_ratio_cm = desk_to_door_ratio_cm
+        self.area_m2 = area_m2
+        self.height_m = height_m
+        self.floor = sys.intern(floor) if floor else floor
+        self.unrecognised_labels = tuple(unrecognised_labels) if unrecognised_labels else ()
+        self.raw = raw
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in SPACE_RECORD_FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in SPACE_RECORD_FIELDS else default
+
+    def keys(self) -> Tuple[str, ...]:
+        return SPACE_RECORD_FIELDS
+
+    def values(self) -> Tuple[Any, ...]:
+        return tuple(getattr(self, k) for k in SPACE_RECORD_FIELDS)
+
+    def items(self) -> List[Tuple[str, Any]]:
+        return list(zip(SPACE_RECORD_FIELDS, self.values()))
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, SpaceRecord):
+            return NotImplemented
+        return self.values() == other.values()
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"SpaceRecord({self.space_id!r}, floor={self.floor!r}, n_desks={self.n_desks})"
+
+class SpaceVerdict:
+    """
+    Verdict of one space. The reasons are kept as (template, args) pairs and only
+    turned into text by reasons() when a report is written; the verdict and
+    statement are shared module constants.
+    """
+    __slots__ = ("verdict", "reason_parts", "statement")
+
+    def __init__(self, verdict: str, reason_parts: Tuple[Tuple[str, Tuple[Any, ...]], ...], statement: str):
+        self.verdict = verdict
+        self.reason_parts = reason_parts
+        self.statement = statement
+
+    def reasons(self) -> List[str]:
+        return [template.format(*args) if args else template for template, args in self.reason_parts]
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, SpaceVerdict):
+            return NotImplemented
+        return (self.verdict, self.reason_parts, self.statement) == (other.verdict, other.reason_parts, other.statement)
+
+    __hash__ = None
+
 # ===========================
 # PARSE ANALYSIS_SUMMARY TXT FOR FAILING ELEMENT IDS
 # ===========================
 
-def parse_analysis_summary(path: Path) -> Tuple[Dict[str, set], List[str]]:
+FAILING_ENTRY_RE = re.compile(r"([0-9]+)(?:\s+Run\s+([0-9]+(?::[0-9]+)*))?", re.IGNORECASE)
+
+def to_int(text: str) -> Optional[int]:
+    text = (text or "").strip()
+    return int(text) if text.isdigit() else None
+
+def parse_analysis_table(path: Path) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+    """
+    Parses the GRP04 analysis_summary as what it is: a tab-separated table whose
+    'Failing element ID's' and 'Reason for failure' cells are quoted multi-line
+    cells, one line per failing entry. Single pass, linear in the file size.
+
+    Returns ({category: record}, warnings) where each record holds:
+     - "passing" / "failing": counts from the table (None if not numeric)
+     - "failures": {entry: reason}, e.g. {"1324988 Run 1:2": "sides_covered=0/4"}
+     - "by_element": {element_id: [{"run": "1:2" | None, "reason": ...}]}
+    """
+    warnings: List[str] = []
+    categories: Dict[str, Dict[str, Any]] = {}
+    columns: Optional[Dict[str, int]] = None
+
+    with path.open("r", encoding="utf-8", errors="ignore", newline="") as f:
+        for row in csv.reader(f, delimiter="\t"):
+            if not row or not row[0].strip():
+                continue
+            if columns is None:
+                # rows before the header are the requirements preamble
+                if row[0].strip().lower() == "category":
+                    header = [c.strip().lower() for c in row]
+                    columns = {}
+                    for i, h in enumerate(header):
+                        if h.startswith("passing"):
+                            columns["passing"] = i
+                        elif h.startswith("failing count"):
+                            columns["failing"] = i
+                        elif h.startswith("failing element"):
+                            columns["ids"] = i
+                        elif h.startswith("reason"):
+                            columns["reasons"] = i
+                continue
+
+            def cell(key: str) -> str:
+                i = columns.get(key)
+                return row[i] if i is not None and i < len(row) else ""
+
+            name = row[0].strip()
+            entries = [ln.strip() for ln in cell("ids").splitlines() if ln.strip()]
+            reasons = [ln.strip() for ln in cell("reasons").splitlines() if ln.strip()]
+            if reasons and len(reasons) != len(entries):
+                warnings.append(f"{name}: {len(entries)} failing IDs but {len(reasons)} reasons; reasons matched by position.")
+
+            failures: Dict[str, Optional[str]] = {}
+            by_element: Dict[str, List[Dict[str, Optional[str]]]] = {}
+            for i, entry in enumerate(entries):
+                reason = reasons[i] if i < len(reasons) else None
+                failures[entry] = reason
+                m = FAILING_ENTRY_RE.match(entry)
+                if not m:
+                    warnings.append(f"{name}: unrecognised failing entry '{entry}'")
+                    continue
+                by_element.setdefault(m.group(1), []).append({"run": m.group(2), "reason": reason})
+
+            failing = to_int(cell("failing"))
+            if failing is not None and entries and failing != len(entries):
+                warnings.append(f"{name}: failing count {failing} but {len(entries)} failing IDs listed.")
+
+            categories[name] = {
+                "passing": to_int(cell("passing")),
+                "failing": failing,
+                "failures": failures,
+                "by_element": by_element,
+            }
+
+    if columns is None:
+        warnings.append(f"No 'Category' table found in analysis_summary: {path}")
+    return categories, warnings
+
+def parse_analysis_summary(path: Path) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Failing corridor / stair element IDs from the GRP04 table, plus the full
+    per-category table under "categories" (see parse_analysis_table).
+    """
     warnings: List[str] = []
-    result = {"corridor_fail_ids": set(), "stairflight_fail_ids": set()}
+    result: Dict[str, Any] = {"corridor_fail_ids": set(), "stairflight_fail_ids": set(), "fail_ids": set(), "categories": {}}
     if not path.exists():
         warnings.append(f"analysis_summary not found: {path}")
         return result, warnings
 
-    text = read_text(path)
-
-    # ---------- HELPER: EXTRACT IDS AFTER SECTION ----------
-    def extract_ids_after(section_name: str) -> set:
-        ids = set()
-        pattern = rf"{re.escape(section_name)}.*?Failing element ID's\s*(?:\"([^\"]+)\"|([^\n]+))"
-        m = re.search(pattern, text, re.IGNORECASE | re.DOTALL)
-        block = None
-        if m:
-            block = (m.group(1) or m.group(2) or "").strip()
-        if block:
-            found = re.findall(r"\b[0-9]+\b", block)
-            for f in found:
-                ids.add(f.strip())
-        return ids
-
-    try:
-        result["corridor_fail_ids"] = extract_ids_after("Corridors")
-        result["stairflight_fail_ids"] = extract_ids_after("Stair flights") | extract_ids_after("Stairs")
-    except Exception:
-        warnings.append("Failed to robustly parse analysis_summary; heuristic extraction used.")
-
-    # ---------- FALLBACK: SCAN QUOTED BLOCKS AND CLASSIFY BY CONTEXT ----------
-    if not (result["corridor_fail_ids"] or result["stairflight_fail_ids"]):
-        for m in re.finditer(r"\"([^\"]+)\"", text, re.DOTALL):
-            block = m.group(1)
-            ctx = text[max(0, m.start() - 200): m.start()].lower()
-            found = re.findall(r"\b[0-9]+\b", block)
-            if found:
-                if "corridor" in ctx:
-                    result["corridor_fail_ids"].update(found)
-                elif "stair" in ctx:
-                    result["stairflight_fail_ids"].update(found)
+    categories, t_warnings = parse_analysis_table(path)
+    warnings.extend(t_warnings)
+    result["categories"] = categories
+
+    # "Stairs (width)" and "Stair flights (4-wall enclosure)" both count as stair failures
+    for name, cat in categories.items():
+        key = name.lower()
+        if key.startswith("corridor"):
+            result["corridor_fail_ids"].update(cat["by_element"])
+        elif key.startswith("stair"):
+            result["stairflight_fail_ids"].update(cat["by_element"])
+    result["fail_ids"] = result["corridor_fail_ids"] | result["stairflight_fail_ids"]
     return result, warnings
 
 # ===========================
 # PARSE GRP02 DESK TXT INTO SPACE RECORDS
 # ===========================
-def split_space_blocks(txt: str) -> List[str]:
-    blocks = re.split(r"\n(?=Space\s*:)", txt)
-    return [b.strip() for b in blocks if b.strip()]
 
-def parse_space_block(block: str) -> Optional[Dict[str, Any]]:
-    first = block.splitlines()[0].strip()
-    m = re.match(r"Space\s*:\s*(.+)$", first, re.IGNORECASE)
+# ---------- FIELD EXTRACTOR: ONE PASS OVER "  - Label: value unit" LINES ----------
+
+LENGTH_VALUE_RE = re.compile(r"([\d\.,]+)\s*(cm|mm|m)?", re.IGNORECASE)
+AREA_VALUE_RE = re.compile(r"([\d\.,]+)\s*m2", re.IGNORECASE)
+HEIGHT_VALUE_RE = re.compile(r"([\d\.,]+)\s*m", re.IGNORECASE)
+INT_VALUE_RE = re.compile(r"[0-9]+")
+LABEL_QUALIFIER_RE = re.compile(r"\s*\(.*\)\s*$")
+
+def to_float(text: str) -> Optional[float]:
+    try:
+        return float(text.replace(",", "."))
+    except ValueError:
+        return None
+
+def int_value(value: str) -> Optional[int]:
+    m = INT_VALUE_RE.match(value)
+    return int(m.group(0)) if m else None
+
+def length_to_cm(val: float, unit: Optional[str]) -> float:
+    unit = (unit or "cm").lower()
+    if unit == "m":
+        return val * 100.0
+    if unit == "mm":
+        return val / 10.0
+    return val
+
+def length_cm_value(value: str) -> Optional[float]:
+    """Length with optional m/mm/cm unit (default cm), converted to cm."""
+    m = LENGTH_VALUE_RE.match(value)
     if not m:
         return None
-    title = m.group(1).strip()
+    val = to_float(m.group(1))
+    return length_to_cm(val, m.group(2)) if val is not None else None
+
+def area_m2_value(value: str) -> Optional[float]:
+    m = AREA_VALUE_RE.match(value)
+    return to_float(m.group(1)) if m else None
+
+def height_m_value(value: str) -> Optional[float]:
+    m = HEIGHT_VALUE_RE.match(value)
+    return to_float(m.group(1)) if m else None
+
+def text_value(value: str) -> Optional[str]:
+    return value or None
+
+# label (lower-case, without "(qualifier)") -> (record key, converter)
+SPACE_FIELDS = {
+    "no. of desks in this space": ("n_desks", int_value),
+    "no. of doors": ("n_doors_reported", int_value),
+    "total door width": ("total_door_width_cm_reported", length_cm_value),
+    "desk to door width ratio": ("desk_to_door_ratio_cm", length_cm_value),
+    "floor": ("floor", text_value),
+    "area": ("area_m2", area_m2_value),
+    "height of space": ("height_m", height_m_value),
+}
+
+# labels that may carry a free-text qualifier, e.g. "Total door width external"
+SPACE_FIELD_PREFIXES = ("total door width",)
+
+# labels GRP02 reports that the manager does not use
+IGNORED_SPACE_LABELS = {"volume per desk", "area per desk", "length of desk"}
+
+def title_space_id(title: str) -> str:
+    """Space id from a space title such as "Office:1158167": its last ':' / space separated part."""
     parts = re.split(r"[:\s]+", title)
-    space_id = parts[-1] if parts else title
-
-    def find_int(label: str) -> Optional[int]:
-        mm = re.search(rf"{re.escape(label)}\s*:\s*([0-9]+)", block, re.IGNORECASE)
-        return int(mm.group(1)) if mm else None
-
-    n_desks = find_int("No. of desks in this space") or 0
-    n_doors = find_int("No. of doors")
-
-    total_door = None
-    mm = re.search(r"Total door width(?:[^\n:]*):\s*([\d\.,]+)\s*(cm|mm|m)?", block, re.IGNORECASE)
-    if mm:
-        val = float(mm.group(1).replace(",", "."))
-        unit = (mm.group(2) or "cm").lower()
-        if unit == "m":
-            total_door = val * 100.0
-        elif unit == "mm":
-            total_door = val / 10.0
-        else:
-            total_door = val
-
-    ratio = None
-    mm2 = re.search(r"Desk to door width ratio\s*:\s*([\d\.,]+)\s*(cm|mm|m)?", block, re.IGNORECASE)
-    if mm2:
-        val = float(mm2.group(1).replace(",", "."))
-        unit = (mm2.group(2) or "cm").lower()
-        if unit == "m":
-            ratio = val * 100.0
-        elif unit == "mm":
-            ratio = val / 10.0
-        else:
-            ratio = val
+    return parts[-1] if parts else title
+
+def parse_space_block(block: str, keep_raw: bool = False) -> Optional[SpaceRecord]:
+    lines = block.splitlines()
+    m = re.match(r"Space\s*:\s*(.+)$", lines[0].strip(), re.IGNORECASE)
+    if not m:
+        return None
+    title = m.group(1).strip()
+    space_id = title_space_id(title)
+
+    # first parsable value per label wins; unknown labels are reported, not guessed
+    fields: Dict[str, Any] = {}
+    unrecognised: List[str] = []
+    for ln in lines[1:]:
+        label, sep, value = ln.strip().lstrip("- ").partition(":")
+        if not sep:
+            continue
+        key = label.strip().lower()
+        if "(" in key:
+            key = LABEL_QUALIFIER_RE.sub("", key)
+        spec = SPACE_FIELDS.get(key)
+        if spec is None:
+            prefix = next((p for p in SPACE_FIELD_PREFIXES if key.startswith(p)), None)
+            spec = SPACE_FIELDS.get(prefix) if prefix else None
+        if spec is None:
+            if key not in IGNORED_SPACE_LABELS:
+                unrecognised.append(label.strip())
+            continue
+        field, convert = spec
+        if field not in fields:
+            val = convert(value.strip())
+            if val is not None:
+                fields[field] = val
+
+    return SpaceRecord(
+        str(space_id),
+        title,
+        n_desks=fields.get("n_desks") or 0,
+        n_doors_reported=fields.get("n_doors_reported"),
+        total_door_width_cm_reported=fields.get("total_door_width_cm_reported"),
+        desk_to_door_ratio_cm=fields.get("desk_to_door_ratio_cm"),
+        area_m2=fields.get("area_m2"),
+        height_m=fields.get("height_m"),
+        floor=fields.get("floor"),
+        unrecognised_labels=unrecognised,
+        raw=block if keep_raw else None,
+    )
+
+NO_DESKS_RAW = "Listed under SPACES WITH NO DESKS"
+
+def no_desks_record(space_id: str) -> SpaceRecord:
+    """Space record for an entry listed under SPACES WITH NO DESKS."""
+    return SpaceRecord(space_id, space_id, raw=NO_DESKS_RAW)
 
-    floor = None
-    mf = re.search(r"Floor\s*:\s*(.+)", block, re.IGNORECASE)
-    if mf:
-        floor = mf.group(1).strip()
+# ===========================
+# PARSE ONE LINE OF THE SPACES WITH NO DESKS SECTION
+# ===========================
 
-    area = None
-    ma = re.search(r"Area\s*:\s*([\d\.,]+)\s*m2", block, re.IGNORECASE)
-    if ma:
-        area = float(ma.group(1).replace(",", "."))
+def parse_no_desks_line(ln: str) -> Optional[str]:
+    ln = ln.strip()
+    if not ln.startswith("- "):
+        return None
+    val = ln.lstrip("- ").strip()
+    if not val:
+        return None
+    return val.split()[-1].strip()
 
-    height = None
-    mh = re.search(r"Height of space\s*:\s*([\d\.,]+)\s*m", block, re.IGNORECASE)
-    if mh:
-        height = float(mh.group(1).replace(",", "."))
+# ===========================
+# PARSE ONE LINE OF THE DESKS NOT IN ANY IFCSPACE SECTION
+# ===========================
 
-    return {
-        "space_id": str(space_id),
-        "title": title,
-        "n_desks": n_desks,
-        "n_doors_reported": n_doors,
-        "total_door_width_cm_reported": total_door,
-        "desk_to_door_ratio_cm": ratio,
-        "area_m2": area,
-        "height_m": height,
-        "floor": floor,
-        "raw": block,
-    }
+def parse_desk_outside_line(ln: str) -> Optional[Dict[str, str]]:
+    ln = ln.strip()
+    if not ln.startswith("- "):
+        return None
+    parts = re.split(r"\s*\(\s*GlobalId\s*:\s*", ln, flags=re.IGNORECASE)
+    left = parts[0]
+    mm = re.search(r"Desk\s*[:\s]*([A-Za-z0-9\-_]+)", left, re.IGNORECASE)
+    gid = parts[1].rstrip(")") if len(parts) > 1 else None
+    if not mm:
+        return None
+    return {"desk": mm.group(1), "globalid": gid}
+
+# ===========================
+# STREAMING PARSER FOR GRP02 DESK TXT (ONE PASS, CONSTANT MEMORY)
+# ===========================
+
+SPACE_START_RE = re.compile(r"Space\s*:")
+NO_DESKS_HEADER_RE = re.compile(r"={5,}\s*SPACES WITH NO DESKS\s*={5,}", re.IGNORECASE)
+DESKS_OUTSIDE_HEADER_RE = re.compile(r"={5,}\s*DESKS NOT IN ANY 'IfcSpace'\s*={5,}", re.IGNORECASE)
+
+def iter_desk_report_blocks(path: Path) -> Iterator[Tuple[str, Any]]:
+    """
+    Same walk as iter_desk_report, but yields ("space", block_text) with the raw
+    text of every 'Space:' block instead of a parsed record, so callers can hash
+    or cache blocks before paying for parse_space_block.
+    """
+    if not path.is_file():
+        raise FileNotFoundError(path)
+    with path.open("r", encoding="utf-8", errors="ignore") as f:
+        yield from iter_report_lines(f)
+
+def iter_report_lines(lines: Iterable[str], mode: str = "preamble") -> Iterator[Tuple[str, Any]]:
+    """
+    The walk of iter_desk_report_blocks over any sequence of lines (from a file or
+    a decoded chunk); mode is the state at the first line (see plan_chunks).
+    """
+    block: List[str] = []
+
+    def flush() -> str:
+        text = "\n".join(block).strip()
+        block.clear()
+        return text
+
+    for line in lines:
+        line = line.rstrip("\n")
+        if SPACE_START_RE.match(line):
+            if mode == "space":
+                text = flush()
+                if text:
+                    yield "space", text
+            mode = "space"
+            block.append(line)
+            continue
+        if "==" in line:
+            if mode == "space":
+                text = flush()
+                if text:
+                    yield "space", text
+            if NO_DESKS_HEADER_RE.search(line):
+                mode = "no_desks"
+            elif DESKS_OUTSIDE_HEADER_RE.search(line):
+                mode = "desks_outside"
+            elif mode == "no_desks":
+                mode = "other"
+            continue
+        if mode == "space":
+            block.append(line)
+        elif mode == "no_desks":
+            sid = parse_no_desks_line(line)
+            if sid:
+                yield "no_desks", sid
+        elif mode == "desks_outside":
+            item = parse_desk_outside_line(line)
+            if item:
+                yield "desk_outside", item
+
+    if mode == "space":
+        text = flush()
+        if text:
+            yield "space", text
+
+def iter_desk_report(path: Path, keep_raw: bool = False) -> Iterator[Tuple[str, Any]]:
+    """
+    Reads the GRP02 desk report line by line and yields one record at a time:
+     - ("space", record)        for every 'Space:' block (SpaceRecord, see parse_space_block)
+     - ("no_desks", space_id)   for entries under SPACES WITH NO DESKS
+     - ("desk_outside", item)   for entries under DESKS NOT IN ANY 'IfcSpace'
+    Only the lines of the current space block are buffered, so memory stays flat
+    regardless of the size of the report.
+    """
+    yield from parse_report_events(iter_desk_report_blocks(path), keep_raw)
+
+def parse_report_events(events: Iterable[Tuple[str, Any]], keep_raw: bool = False) -> Iterator[Tuple[str, Any]]:
+    """Turns the ("space", block_text) events of iter_report_lines into ("space", SpaceRecord)."""
+    for kind, item in events:
+        if kind == "space":
+            item = parse_space_block(item, keep_raw=keep_raw)
+            if not item:
+                continue
+        yield kind, item
 
 # ===========================
-# PARSE SPACES WITH NO DESKS SECTION
+# PARALLEL PARSER FOR LARGE GRP02 DESK TXT (MEMORY-MAPPED, CHUNKED)
 # ===========================
+# The file is cut into byte ranges at section headers and, within a section, at
+# lines where the walk's state is known: a "\nSpace:" line (it always starts a new
+# block), or any line of a SPACES WITH NO DESKS / DESKS NOT IN ANY 'IfcSpace' list
+# that has no other block or "==" line in it. Each worker maps the file itself,
+# walks its range from the known state and sends back plain tuples, never raw text.
+# The parent replays the events in file order, so the parsed_spaces[space_id]
+# merge keeps "last one wins" and the result equals the sequential reader's.
+
+PARALLEL_MIN_BYTES = 8 * 1024 * 1024   # below this a process pool costs more than it saves
+CHUNKS_PER_JOB = 4                     # a few chunks per worker to even out uneven sections
+
+def decode_lines(data: bytes) -> List[str]:
+    """Bytes as text lines, decoded like the sequential reader does (utf-8, errors ignored, universal newlines)."""
+    return data.decode("utf-8", errors="ignore").replace("\r\n", "\n").replace("\r", "\n").split("\n")
+
+def line_end(mm, pos: int, end: int) -> int:
+    """Offset just past the line that contains pos (or end)."""
+    nl = mm.find(b"\n", pos, end)
+    return end if nl == -1 else nl + 1
+
+def next_space_start(mm, pos: int, end: int) -> int:
+    """Offset of the first line after pos that starts a 'Space:' block, or end."""
+    while True:
+        hit = mm.find(b"\nSpace", pos, end)
+        if hit == -1:
+            return end
+        start = hit + 1
+        if SPACE_START_RE.match(mm[start:line_end(mm, start, end)].decode("utf-8", errors="ignore")):
+            return start
+        pos = start
+
+def section_headers(mm) -> List[Tuple[int, str]]:
+    """(offset, mode) of every SPACES WITH NO DESKS / DESKS NOT IN ANY 'IfcSpace' header line."""
+    headers, pos = [], 0
+    while True:
+        hit = mm.find(b"==", pos)
+        if hit == -1:
+            return headers
+        start = mm.rfind(b"\n", 0, hit) + 1
+        stop = line_end(mm, hit, len(mm))
+        line = mm[start:stop].decode("utf-8", errors="ignore")
+        if NO_DESKS_HEADER_RE.search(line):
+            headers.append((start, "no_desks"))
+        elif DESKS_OUTSIDE_HEADER_RE.search(line):
+            headers.append((start, "desks_outside"))
+        pos = stop
+
+def plan_chunks(mm, n_chunks: int) -> List[Tuple[int, int, str]]:
+    """(start, end, mode at start) byte ranges of roughly len(mm) / n_chunks, cut only where the walk's state is known."""
+    size = len(mm)
+    step = max(size // max(n_chunks, 1), 1)
+    sections = [(0, "preamble")] + section_headers(mm)
+    chunks = []
+    for k, (start, mode) in enumerate(sections):
+        end = sections[k + 1][0] if k + 1 < len(sections) else size
+        body = line_end(mm, start, end) if mode != "preamble" else start
+        # a plain list (no blocks, no "==" lines) stays in its mode on every line
+        plain_list = (mode != "preamble" and next_space_start(mm, max(body - 1, start), end) == end
+                      and (mode == "desks_outside" or mm.find(b"==", body, end) == -1))
+        a = start
+        while a < end:
+            target = min(max(a + step, body), end)
+            b = line_end(mm, target, end) if plain_list else next_space_start(mm, max(target - 1, a), end)
+            chunks.append((a, b, mode if a == start or plain_list else "space"))
+            a = b
+    return chunks
+
+def parse_report_chunk(job: Tuple[str, int, int, str, bool]) -> List[Tuple[str, Any]]:
+    """Worker: the events of one byte range, with SpaceRecords as field tuples."""
+    path, start, end, mode, keep_raw = job
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        lines = decode_lines(mm[start:end])
+    return [(kind, item.values() if kind == "space" else item)
+            for kind, item in parse_report_events(iter_report_lines(lines, mode), keep_raw)]
+
+def iter_desk_report_parallel(path: Path, jobs: int, keep_raw: bool = False) -> Iterator[Tuple[str, Any]]:
+    """
+    Same events, in the same order, as iter_desk_report, with the file parsed
+    across `jobs` processes. Files under PARALLEL_MIN_BYTES (or jobs < 2) use the
+    sequential reader.
+    """
+    if not path.is_file():
+        raise FileNotFoundError(path)
+    if jobs < 2 or path.stat().st_size < PARALLEL_MIN_BYTES:
+        yield from iter_desk_report(path, keep_raw)
+        return
+    with path.open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        chunks = plan_chunks(mm, jobs * CHUNKS_PER_JOB)
 
-def parse_spaces_without_desks(txt: str) -> List[str]:
-    out: List[str] = []
-    m = re.search(r"={5,}\s*SPACES WITH NO DESKS\s*={5,}([\s\S]+?)(?:={2,}|$)", txt, re.IGNORECASE)
-    section = m.group(1) if m else None
-    if section:
-        for ln in section.splitlines():
-            ln = ln.strip()
-            if ln.startswith("- "):
-                val = ln.lstrip("- ").strip()
-                last = val.split()[-1]
-                out.append(last.strip())
-    return out
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        for events in pool.map(parse_report_chunk, [(str(path), a, b, mode, keep_raw) for a, b, mode in chunks]):
+            for kind, item in events:
+                yield kind, SpaceRecord(*item) if kind == "space" else item
 
 # ===========================
-# PARSE DESKS NOT IN ANY IFCSPACE SECTION
+# DIRECT IFC EXTRACTION (BYPASSES THE ANALYST TEXT REPORTS)
 # ===========================
 
-def parse_desks_not_in_space(txt: str) -> List[Dict[str, str]]:
-    out: List[Dict[str, str]] = []
-    m = re.search(r"={5,}\s*DESKS NOT IN ANY 'IfcSpace'\s*={5,}([\s\S]+)$", txt, re.IGNORECASE)
-    if not m:
-        return out
-    section = m.group(1)
-    for ln in section.splitlines():
-        ln = ln.strip()
-        if ln.startswith("- "):
-            parts = re.split(r"\s*\(\s*GlobalId\s*:\s*", ln, flags=re.IGNORECASE)
-            left = parts[0]
-            mm = re.search(r"Desk\s*[:\s]*([A-Za-z0-9\-_]+)", left, re.IGNORECASE)
-            gid = parts[1].rstrip(")") if len(parts) > 1 else None
-            if mm:
-                out.append({"desk": mm.group(1), "globalid": gid})
-    return out
+# name / object type / type name fragments that identify a furnishing element as a desk
+DESK_KEYWORDS = ("desk", "workstation", "skrivebord")
+
+# (pset or qto name, property name) in order of preference; see A3/IDS.ids
+SPACE_DESK_COUNT_PROPS = [("Pset_Space", "DeskCount"), ("Pset_SpaceOccupancy", "OccupantCount")]
+SPACE_AREA_PROPS = [("Qto_SpaceBaseQuantities", "NetFloorArea"), ("Qto_SpaceBaseQuantities", "GrossFloorArea"), ("Pset_SpaceCommon", "GrossPlannedArea")]
+SPACE_HEIGHT_PROPS = [("Qto_SpaceBaseQuantities", "Height"), ("Qto_SpaceBaseQuantities", "FinishCeilingHeight")]
+DOOR_WIDTH_PROPS = [("Pset_DoorCommon", "ClearWidth"), ("Pset_DoorCommon", "OverallWidth"), ("Pset_DoorCommon", "OpeningWidth"), ("Qto_DoorBaseQuantities", "Width")]
+
+def load_ifcopenshell():
+    # imported lazily so the text-report mode never pays for it
+    try:
+        import ifcopenshell
+        import ifcopenshell.util.placement
+        import ifcopenshell.util.unit
+    except ImportError as e:
+        raise RuntimeError("ifcopenshell is required for IFC extraction mode (pip install ifcopenshell)") from e
+    return ifcopenshell
+
+def element_label(el) -> str:
+    """Revit element id (Tag) when numeric, else the STEP id; matches the ids used by the analysts."""
+    tag = str(getattr(el, "Tag", None) or "").strip()
+    return tag if tag.isdigit() else str(el.id())
+
+def space_label(space) -> str:
+    """
+    Id of an IfcSpace as the GRP02 / GRP04 reports list it. IfcSpace has no Tag, so
+    this is the number ending its Name or LongName (read like the GRP02 titles, see
+    title_space_id), else the STEP id.
+    """
+    for text in (getattr(space, "Name", None), getattr(space, "LongName", None)):
+        if text and text.strip():
+            number = title_space_id(text.strip())
+            if number.isdigit():
+                return number
+    return str(space.id())
+
+def space_title(space, sid: str) -> str:
+    """"Office:1158149" style title: LongName or Name, with the id appended unless it already ends with it."""
+    name = (space.LongName or space.Name or "Space").strip()
+    return name if title_space_id(name) == sid else f"{name}:{sid}"
+
+def build_ifc_index(model) -> Dict[str, Any]:
+    """
+    One pass over each relationship type to index everything the manager needs:
+     - "space_elements": space id -> elements contained in the space
+     - "space_doors":    space id -> doors bounding or contained in the space
+     - "space_storey":   space id -> storey name
+     - "space_links":    space id -> openings / virtual boundaries / stairs linking the space to others
+     - "stair_parts":    stair id -> its aggregated parts (flights, landings)
+     - "contained":      ids of all elements contained in any IfcSpace
+     - "has_boundaries": whether the model has any IfcRelSpaceBoundary (else door counts are unknown)
+     - "props":          element id -> {pset/qto name: {property: value}} (type values, then instance overrides)
+     - "space_ids":      space id -> id used in the reports (see space_label); a number taken by an
+                         earlier space keeps the STEP id, counted in "duplicate_space_ids"
+    Each relationship is visited exactly once, so cost is linear in the model size.
+    """
+    wanted_sets = {pset for props in (SPACE_DESK_COUNT_PROPS, SPACE_AREA_PROPS, SPACE_HEIGHT_PROPS, DOOR_WIDTH_PROPS) for pset, _ in props}
+    index: Dict[str, Any] = {"space_elements": {}, "space_doors": {}, "space_storey": {}, "space_links": {},
+                             "stair_parts": {}, "contained": set(), "props": {}, "has_boundaries": False,
+                             "space_ids": {}, "duplicate_space_ids": 0}
+
+    taken = set()
+    for space in model.by_type("IfcSpace"):
+        label = space_label(space)
+        if label in taken:
+            label = str(space.id())
+            index["duplicate_space_ids"] += 1
+        taken.add(label)
+        index["space_ids"][space.id()] = label
+
+    def read_set(pdef) -> Optional[Dict[str, Any]]:
+        if pdef is None or getattr(pdef, "Name", None) not in wanted_sets:
+            return None
+        values: Dict[str, Any] = {}
+        if pdef.is_a("IfcPropertySet"):
+            for prop in pdef.HasProperties or ():
+                if prop.is_a("IfcPropertySingleValue") and prop.NominalValue is not None:
+                    values[prop.Name] = prop.NominalValue.wrappedValue
+        elif pdef.is_a("IfcElementQuantity"):
+            for q in pdef.Quantities or ():
+                if q.is_a("IfcPhysicalSimpleQuantity"):
+                    values[q.Name] = q[3]  # LengthValue / AreaValue / VolumeValue / CountValue
+        return values
+
+    def merge(el_id: int, pset_name: str, values: Dict[str, Any]):
+        index["props"].setdefault(el_id, {}).setdefault(pset_name, {}).update(values)
+
+    for rel in model.by_type("IfcRelContainedInSpatialStructure"):
+        host = rel.RelatingStructure
+        if host is not None and host.is_a("IfcSpace"):
+            elements = index["space_elements"].setdefault(host.id(), [])
+            for el in rel.RelatedElements or ():
+                elements.append(el)
+                index["contained"].add(el.id())
+                if el.is_a("IfcDoor"):
+                    index["space_doors"].setdefault(host.id(), {})[el.id()] = el
+                elif is_route_link(el):
+                    index["space_links"].setdefault(host.id(), {})[el.id()] = el
+
+    for rel in model.by_type("IfcRelSpaceBoundary"):
+        index["has_boundaries"] = True
+        space, el = rel.RelatingSpace, rel.RelatedBuildingElement
+        if space is None or el is None or not space.is_a("IfcSpace"):
+            continue
+        if el.is_a("IfcDoor"):
+            index["space_doors"].setdefault(space.id(), {})[el.id()] = el
+        elif is_route_link(el):
+            index["space_links"].setdefault(space.id(), {})[el.id()] = el
+
+    for rel in model.by_type("IfcRelAggregates"):
+        parent = rel.RelatingObject
+        if parent is not None and parent.is_a("IfcBuildingStorey"):
+            for child in rel.RelatedObjects or ():
+                if child.is_a("IfcSpace"):
+                    index["space_storey"][child.id()] = parent.Name
+        elif parent is not None and parent.is_a("IfcStair"):
+            index["stair_parts"].setdefault(parent.id(), []).extend(rel.RelatedObjects or ())
+
+    # type-level values first so instance psets override them below
+    for rel in model.by_type("IfcRelDefinesByType"):
+        for pdef in getattr(rel.RelatingType, "HasPropertySets", None) or ():
+            values = read_set(pdef)
+            if values:
+                for obj in rel.RelatedObjects or ():
+                    merge(obj.id(), pdef.Name, values)
+
+    for rel in model.by_type("IfcRelDefinesByProperties"):
+        pdef = rel.RelatingPropertyDefinition
+        values = read_set(pdef)
+        if values:
+            for obj in rel.RelatedObjects or ():
+                merge(obj.id(), pdef.Name, values)
+
+    return index
+
+def is_route_link(el) -> bool:
+    """Non-door elements that let occupants pass between spaces or reach a stair."""
+    return el.is_a("IfcOpeningElement") or el.is_a("IfcVirtualElement") or el.is_a("IfcStair") or el.is_a("IfcStairFlight")
+
+def first_prop(index: Dict[str, Any], el, candidates: List[Tuple[str, str]]) -> Any:
+    psets = index["props"].get(el.id(), {})
+    for pset_name, prop in candidates:
+        val = psets.get(pset_name, {}).get(prop)
+        if val is not None:
+            return val
+    return None
+
+def is_desk(el) -> bool:
+    if not el.is_a("IfcFurnishingElement"):
+        return False
+    names = [getattr(el, "Name", None), getattr(el, "ObjectType", None)]
+    for rel in getattr(el, "IsTypedBy", None) or getattr(el, "IsDefinedBy", None) or ():
+        if rel.is_a("IfcRelDefinesByType"):
+            names.append(rel.RelatingType.Name)
+    text = " ".join(n for n in names if n).lower()
+    return any(k in text for k in DESK_KEYWORDS)
+
+def open_ifc(ifc_path: Path) -> Dict[str, Any]:
+    """Opens the model once and indexes it: {"model", "index", "ifcopenshell"}."""
+    if not ifc_path.is_file():
+        raise FileNotFoundError(ifc_path)
+    ifcopenshell = load_ifcopenshell()
+    model = ifcopenshell.open(str(ifc_path))
+    return {"model": model, "index": build_ifc_index(model), "ifcopenshell": ifcopenshell}
+
+def load_ifc_spaces(ifc_path: Path, ifc: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, SpaceRecord], List[Dict[str, str]], List[str]]:
+    """
+    Same (space records, desks outside any IfcSpace, warnings) as load_desk_report,
+    read directly from the IFC model instead of the GRP02 text report.
+    Pass an already opened model (see open_ifc) as ifc to avoid parsing it again.
+    """
+    ifc = ifc or open_ifc(ifc_path)
+    ifcopenshell, model, index = ifc["ifcopenshell"], ifc["model"], ifc["index"]
+    length_to_m = ifcopenshell.util.unit.calculate_unit_scale(model)
+    area_to_m2 = ifcopenshell.util.unit.calculate_unit_scale(model, "AREAUNIT")
+
+    warnings: List[str] = []
+    parsed_spaces: Dict[str, SpaceRecord] = {}
+    doors_without_width = 0
+    spaces_without_door_data = 0
+
+    for space in model.by_type("IfcSpace"):
+        sid = index["space_ids"][space.id()]
+        desks = [el for el in index["space_elements"].get(space.id(), ()) if is_desk(el)]
+        n_desks = len(desks)
+        if not n_desks:
+            counted = first_prop(index, space, SPACE_DESK_COUNT_PROPS)
+            n_desks = int(counted) if counted else 0
+
+        doors = list(index["space_doors"].get(space.id(), {}).values())
+        widths = []
+        for door in doors:
+            width = first_prop(index, door, DOOR_WIDTH_PROPS) or getattr(door, "OverallWidth", None)
+            if width:
+                widths.append(float(width) * length_to_m * 100.0)
+            else:
+                doors_without_width += 1
+        total_door = round(sum(widths), 1) if widths else None
+        # without space boundaries, doors are only found when contained in the space:
+        # no door there means "not reported", not "zero doors"
+        n_doors = len(doors) if doors or index["has_boundaries"] else None
+        if n_doors is None:
+            spaces_without_door_data += 1
+
+        area = first_prop(index, space, SPACE_AREA_PROPS)
+        height = first_prop(index, space, SPACE_HEIGHT_PROPS)
+        parsed_spaces[sid] = SpaceRecord(
+            sid,
+            space_title(space, sid),
+            n_desks=n_desks,
+            n_doors_reported=n_doors,
+            total_door_width_cm_reported=total_door,
+            desk_to_door_ratio_cm=round(total_door / n_desks, 1) if total_door is not None and n_desks else None,
+            area_m2=round(float(area) * area_to_m2, 2) if area is not None else None,
+            height_m=round(float(height) * length_to_m, 2) if height is not None else None,
+            floor=index["space_storey"].get(space.id()),
+        )
+
+    desks_outside = [
+        {"desk": element_label(el), "globalid": el.GlobalId}
+        for el in model.by_type("IfcFurnishingElement")
+        if el.id() not in index["contained"] and is_desk(el)
+    ]
+
+    if index["duplicate_space_ids"]:
+        warnings.append(f"{index['duplicate_space_ids']} IfcSpace(s) repeat the number of an earlier space in Name/LongName; listed under their STEP id.")
+    if spaces_without_door_data:
+        warnings.append(f"No IfcRelSpaceBoundary in the model: door count not reported for {spaces_without_door_data} space(s) without a contained door.")
+    if doors_without_width:
+        warnings.append(f"{doors_without_width} door(s) without a width in Pset_DoorCommon or OverallWidth; left out of door widths.")
+    return parsed_spaces, desks_outside, warnings
+
+# ===========================
+# FIRE-ROUTE GRAPH: SPACE - DOOR - CORRIDOR - STAIR REACHABILITY
+# ===========================
+
+# spaces whose name marks them as a stairwell are route targets like IfcStair itself
+STAIR_SPACE_KEYWORDS = ("stair", "trappe")
+
+def node_name(el, label: str) -> str:
+    if el.is_a("IfcSpace"):
+        return space_title(el, label)
+    return f"{el.is_a()[3:]}:{label}"
+
+def build_route_graph(model, index: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Undirected adjacency over spaces (corridors are spaces too), doors, openings and
+    stairs, from the relations already collected by build_ifc_index:
+     - space - door / opening / stair  (IfcRelSpaceBoundary or containment in the space)
+     - stair - flight / landing        (IfcRelAggregates)
+    A door or opening shared by two spaces connects them. Spaces are labelled with
+    their report id (index["space_ids"]), other elements with element_label.
+    Returns {"adj": {id: set(ids)}, "labels": {id: label}, "names": {id: name},
+             "spaces": [ids], "stairs": [ids]}.
+    """
+    adj: Dict[int, set] = {}
+    labels: Dict[int, str] = {}
+    names: Dict[int, str] = {}
+
+    def add(el):
+        if el.id() not in adj:
+            adj[el.id()] = set()
+            labels[el.id()] = index["space_ids"].get(el.id()) or element_label(el)
+            names[el.id()] = node_name(el, labels[el.id()])
+
+    def link(a, b):
+        add(a)
+        add(b)
+        adj[a.id()].add(b.id())
+        adj[b.id()].add(a.id())
+
+    spaces = model.by_type("IfcSpace")
+    for space in spaces:
+        add(space)
+        for group in ("space_doors", "space_links"):
+            for el in index[group].get(space.id(), {}).values():
+                link(space, el)
+
+    for stair_id, parts in index["stair_parts"].items():
+        stair = model.by_id(stair_id)
+        for part in parts:
+            link(stair, part)
+
+    stairs = [n for n in adj if model.by_id(n).is_a("IfcStair") or model.by_id(n).is_a("IfcStairFlight")]
+    stairs += [sp.id() for sp in spaces if any(k in names[sp.id()].lower() for k in STAIR_SPACE_KEYWORDS)]
+    return {"adj": adj, "labels": labels, "names": names, "spaces": [sp.id() for sp in spaces], "stairs": stairs}
+
+def route_to_stairs(graph: Dict[str, Any], fail_ids: set) -> Dict[str, Dict[str, Any]]:
+    """
+    One multi-source BFS from every stair over the whole building, O(V + E).
+    Entering an element GRP04 lists as failing costs 1, so the search runs in
+    layers of failing elements passed (0-1 BFS); within a layer it is a plain
+    breadth-first search. Each space gets the route to a stair that passes the
+    fewest failing elements, and among those a short one.
+    Returns {space label: {"reachable", "route": [names, space first], "failing": [ids on route]}}.
+    """
+    adj, labels = graph["adj"], graph["labels"]
+    cost = {n: (1 if labels[n] in fail_ids else 0) for n in adj}
+    dist: Dict[int, int] = {}
+    parent: Dict[int, Optional[int]] = {}
+    layers: Dict[int, List[int]] = {0: [], 1: []}
+
+    for s in set(graph["stairs"]):
+        dist[s] = cost[s]
+        parent[s] = None
+        layers[cost[s]].append(s)
+
+    k = 0
+    while k in layers:
+        queue = deque(n for n in layers.pop(k) if dist[n] == k)  # skip entries improved since queued
+        while queue:
+            u = queue.popleft()
+            for v in adj[u]:
+                d = k + cost[v]
+                if d < dist.get(v, d + 1):
+                    dist[v] = d
+                    parent[v] = u
+                    if cost[v]:
+                        layers.setdefault(d, []).append(v)
+                    else:
+                        queue.append(v)
+        k += 1
+
+    routes: Dict[str, Dict[str, Any]] = {}
+    for sp in graph["spaces"]:
+        if sp not in dist:
+            routes[labels[sp]] = {"reachable": False, "route": [], "failing": []}
+            continue
+        path, n = [], sp
+        while n is not None:
+            path.append(n)
+            n = parent[n]
+        routes[labels[sp]] = {
+            "reachable": True,
+            "route": [graph["names"][n] for n in path],
+            "failing": [labels[n] for n in path if cost[n]],
+        }
+    return routes
+
+def load_ifc_routes(ifc_path: Path, analysis: Dict[str, Any], ifc: Optional[Dict[str, Any]] = None,
+                    space_ids: Optional[Iterable[str]] = None) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+    """
+    Per-space fire routes for the model, with the GRP04 failing IDs of this analysis on each route.
+    space_ids (the report's spaces) are only used to warn when no route can be found for any of them.
+    """
+    ifc = ifc or open_ifc(ifc_path)
+    graph = build_route_graph(ifc["model"], ifc["index"])
+    if not graph["stairs"]:
+        return {}, [f"No stairs found in {ifc_path}; fire routes fall back to matching space IDs."]
+    fail_ids = analysis.get("fail_ids", set())
+    routes = route_to_stairs(graph, fail_ids)
+    unreachable = sum(1 for r in routes.values() if not r["reachable"])
+    warnings = [f"{unreachable} space(s) have no route to a stair in the model."] if unreachable else []
+    if space_ids is not None:
+        space_ids = list(space_ids)
+        if space_ids and not any(find_route(routes, sid, space_check_ids(sid)) for sid in space_ids):
+            warnings.append(f"None of the {len(space_ids)} report space(s) is a space in {ifc_path}; "
+                            "their fire routes fall back to matching space IDs.")
+    if fail_ids and fail_ids.isdisjoint(graph["labels"].values()):
+        warnings.append(f"None of the {len(fail_ids)} GRP04 failing ID(s) is an element of {ifc_path}; "
+                        "no failing element can show up on a route.")
+    return routes, warnings
+
+# ===========================
+# DESKS NOT IN ANY IFCSPACE: ASSIGN TO THE CONTAINING OR NEAREST SPACE
+# ===========================
+# Desk placements and space footprints (extruded rectangle / polyline profiles)
+# are read from the model and matched per storey through spatial.StoreyIndex, so
+# each desk is tested against the few spaces around it, not against all spaces.
+
+DESK_ASSIGN_TOLERANCE_M = 0.5   # a desk this close to a space's outline counts as in it
+
+def matmul(a, b) -> List[List[float]]:
+    return [[sum(a[i][k] * b[k][j] for k in range(4)) for j in range(4)] for i in range(4)]
+
+def apply_matrix(m, x: float, y: float, z: float = 0.0) -> Tuple[float, float, float]:
+    return (m[0][0] * x + m[0][1] * y + m[0][2] * z + m[0][3],
+            m[1][0] * x + m[1][1] * y + m[1][2] * z + m[1][3],
+            m[2][0] * x + m[2][1] * y + m[2][2] * z + m[2][3])
+
+def profile_points(profile) -> Optional[List[Tuple[float, float]]]:
+    """Outline of a rectangle or closed polyline profile, in profile coordinates."""
+    if profile.is_a("IfcRectangleProfileDef"):
+        hx, hy = profile.XDim / 2.0, profile.YDim / 2.0
+        pts = [(-hx, -hy), (hx, -hy), (hx, hy), (-hx, hy)]
+        pos = getattr(profile, "Position", None)
+        if pos is None:
+            return pts
+        ox, oy = pos.Location.Coordinates[:2]
+        dx, dy = pos.RefDirection.DirectionRatios[:2] if pos.RefDirection is not None else (1.0, 0.0)
+        norm = math.hypot(dx, dy) or 1.0
+        dx, dy = dx / norm, dy / norm
+        return [(ox + x * dx - y * dy, oy + x * dy + y * dx) for x, y in pts]
+    if profile.is_a("IfcArbitraryClosedProfileDef"):
+        curve = profile.OuterCurve
+        if curve.is_a("IfcPolyline"):
+            pts = [tuple(p.Coordinates[:2]) for p in curve.Points]
+        elif curve.is_a("IfcIndexedPolyCurve"):
+            pts = [tuple(c[:2]) for c in curve.Points.CoordList]
+        else:
+            return None
+        if len(pts) > 1 and pts[0] == pts[-1]:
+            pts = pts[:-1]
+        return pts
+    return None
+
+def space_footprint(space, placement, length_to_m: float) -> Optional[Tuple[List[Tuple[float, float]], float]]:
+    """(footprint polygon, base elevation) in metres from the space's first extruded body, or None."""
+    if space.Representation is None or space.ObjectPlacement is None:
+        return None
+    matrix = placement.get_local_placement(space.ObjectPlacement)
+    for rep in space.Representation.Representations or ():
+        for item in rep.Items or ():
+            if not item.is_a("IfcExtrudedAreaSolid"):
+                continue
+            pts = profile_points(item.SweptArea)
+            if not pts:
+                continue
+            m = matmul(matrix, placement.get_axis2placement(item.Position)) if item.Position is not None else matrix
+            world = [apply_matrix(m, x, y) for x, y in pts]
+            return [(x * length_to_m, y * length_to_m) for x, y, _ in world], world[0][2] * length_to_m
+    return None
+
+def assign_orphan_desks(ifc: Dict[str, Any], parsed_spaces: Dict[str, SpaceRecord], desks_outside: List[Dict[str, Any]],
+                        tolerance_m: float = DESK_ASSIGN_TOLERANCE_M) -> Tuple[Dict[str, int], List[str]]:
+    """
+    Finds each desk outside any IfcSpace (by GlobalId) in the model and assigns it to
+    the space on its storey that contains it, else to the nearest one within
+    tolerance_m. Assigned desks are added to that space's n_desks (and its desk to
+    door ratio), and their desks_outside entry gets "assigned_to", "assigned_by"
+    ("contained" / "nearest") and "distance_m". Returns ({space id: desks added}, warnings).
+    """
+    ifcopenshell, model, index = ifc["ifcopenshell"], ifc["model"], ifc["index"]
+    placement = ifcopenshell.util.placement
+    length_to_m = ifcopenshell.util.unit.calculate_unit_scale(model)
+
+    # model spaces -> report keys: the same id, else the one report key holding that number
+    by_number: Dict[str, Optional[str]] = {}
+    for key in parsed_spaces:
+        for number in ID_DIGITS_RE.findall(key):
+            by_number[number] = key if number not in by_number else None
+
+    footprints: Dict[Any, List[Tuple[str, List[Tuple[float, float]]]]] = {}
+    elevations: Dict[Any, float] = {}
+    no_footprint = matched = 0
+    model_spaces = model.by_type("IfcSpace")
+    for space in model_spaces:
+        label = index["space_ids"][space.id()]
+        key = label if label in parsed_spaces else by_number.get(label)
+        if key is None:
+            continue
+        matched += 1
+        fp = space_footprint(space, placement, length_to_m)
+        if fp is None:
+            no_footprint += 1
+            continue
+        storey = index["space_storey"].get(space.id())
+        footprints.setdefault(storey, []).append((key, fp[0]))
+        elevations[storey] = min(elevations.get(storey, fp[1]), fp[1])
+    grid = spatial.StoreyIndex(footprints, elevations)
+
+    storey_of: Dict[int, Any] = {}
+    for rel in model.by_type("IfcRelContainedInSpatialStructure"):
+        host = rel.RelatingStructure
+        if host is not None and host.is_a("IfcBuildingStorey"):
+            for el in rel.RelatedElements or ():
+                storey_of[el.id()] = host.Name
+
+    added: Dict[str, int] = {}
+    not_found = by_distance = 0
+    for item in desks_outside:
+        try:
+            desk = model.by_guid(item.get("globalid")) if item.get("globalid") else None
+        except RuntimeError:
+            desk = None
+        if desk is None or desk.ObjectPlacement is None:
+            not_found += 1
+            continue
+        x, y, z = (v * length_to_m for v in apply_matrix(placement.get_local_placement(desk.ObjectPlacement), 0.0, 0.0))
+        storey = storey_of.get(desk.id())
+        if storey not in grid.grids:
+            storey = grid.storey_at(z + tolerance_m)
+        hit = grid.locate(storey, x, y, tolerance_m)
+        if hit is None:
+            continue
+        key, distance = hit
+        item["assigned_to"] = key
+        item["assigned_by"] = "contained" if distance == 0.0 else "nearest"
+        item["distance_m"] = round(distance, 2)
+        by_distance += distance > 0.0
+        added[key] = added.get(key, 0) + 1
+
+    for key, n in added.items():
+        rec = parsed_spaces[key]
+        rec.n_desks = (rec.n_desks or 0) + n
+        if rec.total_door_width_cm_reported is not None:
+            rec.desk_to_door_ratio_cm = round(rec.total_door_width_cm_reported / rec.n_desks, 1)
+
+    n_assigned = sum(added.values())
+    warnings = []
+    if desks_outside and not matched:
+        warnings.append(f"None of the {len(model_spaces)} IfcSpace(s) in the model matches one of the {len(parsed_spaces)} report space(s) "
+                        "by id (see space_label); no desks can be assigned.")
+    warnings.append(f"{n_assigned} of {len(desks_outside)} desk(s) not in any IfcSpace assigned to {len(added)} space(s) by location "
+                    f"({by_distance} to the nearest space within {tolerance_m} m); {len(desks_outside) - n_assigned} left unassigned.")
+    if not_found:
+        warnings.append(f"{not_found} desk(s) not in any IfcSpace not found in the model by GlobalId (or without placement).")
+    if no_footprint:
+        warnings.append(f"{no_footprint} space(s) without an extruded footprint in the model; no desks assigned to them.")
+    return added, warnings
 
 # ===========================
 # DECISION + FIRE-ROUTE STATEMENT
 # ===========================
 
-def decide_verdict(space: Dict[str, Any], analysis: Dict[str, set]) -> Tuple[str, List[str], str]:
+ID_DIGITS_RE = re.compile(r"\b[0-9]+\b")
+
+def space_check_ids(sid: str) -> set:
+    """IDs matched against the GRP04 failing entries: the numbers in the space id, else the id itself."""
+    sid_digits = ID_DIGITS_RE.findall(sid)
+    return set(sid_digits) if sid_digits else {sid.strip()}
+
+def find_route(routes: Optional[Dict[str, Dict[str, Any]]], sid: str, check_ids: set) -> Optional[Dict[str, Any]]:
+    if not routes:
+        return None
+    if sid in routes:
+        return routes[sid]
+    return next((routes[i] for i in check_ids if i in routes), None)
+
+# reason templates and statements are shared by every space; only the arguments are per space
+REASON_N_DOORS = "Reported number of doors: {}"
+REASON_NO_WIDTH = "Door(s) present; width not reported — treat as PASS"
+REASON_WIDTH_OK = "Total door width {:.1f} cm >= required {:.1f} cm (BR18)"
+REASON_WIDTH_LOW = "Total door width {:.1f} cm < required {:.1f} cm (BR18)"
+REASON_ZERO_DOORS = "Reported 0 doors in space"
+REASON_NO_EVIDENCE = "No explicit door/width evidence to decide"
+REASON_ROUTE = "Route to stair: {}"
+REASON_ROUTE_FAILING = "GRP04 failing element(s) on route: {}"
+REASON_NO_ROUTE = "No route from this space to a stair in the model"
+REASON_NO_DESKS = "No desks in this space"
+
+STATEMENT_NOT_APPLICABLE = "Not applicable (no desks)"
+STATEMENT_FAIL = "Occupants DO NOT have the necessary access to the fire route (desk/door data fails BR18)."
+STATEMENT_NO_ROUTE = "Occupants DO NOT have access to a fire route (no route from this space to a stair in the model)."
+STATEMENT_ANALYSIS_FAILING = "Occupants DO NOT have access to the fire route located by GRP04 (related element reported as failing)."
+STATEMENT_PASS = "Occupants HAVE access to the fire route (desk/door data PASS BR18)."
+STATEMENT_UNKNOWN = "Occupants' access to the fire route is UNKNOWN — desk/door data inconclusive and analysis contains no failing entry for this space."
+
+NOT_APPLICABLE_VERDICT = SpaceVerdict("NOT_APPLICABLE", ((REASON_NO_DESKS, ()),), STATEMENT_NOT_APPLICABLE)
+
+def evaluate_space(space: SpaceRecord, analysis: Dict[str, Any], door_cm_per_desk: Optional[float] = None) -> SpaceVerdict:
     """
-    Returns (verdict, reasons[], fire_route_statement).
+    Verdict of one space, with the reasons left unformatted (see SpaceVerdict).
+    door_cm_per_desk overrides DOOR_CM_PER_DESK (used for threshold studies).
     Final fire_route_statement rules:
      - If base verdict == FAIL -> "Occupants DO NOT have the necessary access..."
      - Else if analysis lists failing element for this space -> "Occupants DO NOT have access..."
      - Else if base verdict == PASS -> "Occupants HAVE access..."
      - Else -> "Occupants' access is UNKNOWN..."
     """
-    reasons: List[str] = []
+    reasons: List[Tuple[str, Tuple[Any, ...]]] = []
     n = space.get("n_desks") or 0
     sid = str(space.get("space_id") or "")
+    cm_per_desk = DOOR_CM_PER_DESK if door_cm_per_desk is None else door_cm_per_desk
 
     if n == 0:
-        return "NOT_APPLICABLE", ["No desks in this space"], "Not applicable (no desks)"
+        return NOT_APPLICABLE_VERDICT
 
     # evaluate local door evidence
     n_doors = space.get("n_doors_reported")
     total_door = space.get("total_door_width_cm_reported")
     if n_doors and n_doors > 0:
-        reasons.append(f"Reported number of doors: {n_doors}")
+        reasons.append((REASON_N_DOORS, (n_doors,)))
         if total_door is None:
-            reasons.append("Door(s) present; width not reported — treat as PASS")
+            reasons.append((REASON_NO_WIDTH, ()))
             base_verdict = "PASS"
         else:
-            required = n * DOOR_CM_PER_DESK
+            required = n * cm_per_desk
             if total_door >= required:
-                reasons.append(f"Total door width {total_door:.1f} cm >= required {required:.1f} cm (BR18)")
+                reasons.append((REASON_WIDTH_OK, (total_door, required)))
                 base_verdict = "PASS"
             else:
-                reasons.append(f"Total door width {total_door:.1f} cm < required {required:.1f} cm (BR18)")
+                reasons.append((REASON_WIDTH_LOW, (total_door, required)))
                 base_verdict = "FAIL"
     else:
         # no door count reported
         if total_door is not None:
-            required = n * DOOR_CM_PER_DESK
+            required = n * cm_per_desk
             if total_door >= required:
-                reasons.append(f"Total door width {total_door:.1f} cm >= required {required:.1f} cm (BR18)")
+                reasons.append((REASON_WIDTH_OK, (total_door, required)))
                 base_verdict = "PASS"
             else:
-                reasons.append(f"Total door width {total_door:.1f} cm < required {required:.1f} cm (BR18)")
+                reasons.append((REASON_WIDTH_LOW, (total_door, required)))
                 base_verdict = "FAIL"
         elif n_doors == 0:
-            reasons.append("Reported 0 doors in space")
+            reasons.append((REASON_ZERO_DOORS, ()))
             base_verdict = "FAIL"
         else:
-            reasons.append("No explicit door/width evidence to decide")
+            reasons.append((REASON_NO_EVIDENCE, ()))
             base_verdict = "UNKNOWN"
 
-    # determine if analysis_summary indicates failing element for this space
-    cid_set = analysis.get("corridor_fail_ids", set())
-    stf_set = analysis.get("stairflight_fail_ids", set())
-    sid_digits = re.findall(r"\b[0-9]+\b", sid)
-    check_ids = set(sid_digits) if sid_digits else {sid.strip()}
-    analysis_failing = bool(check_ids & (cid_set | stf_set))
+    # determine if analysis_summary indicates failing element for this space:
+    # on its route to a stair when a route graph is available, else by matching its own ID
+    check_ids = space_check_ids(sid)
+    route = find_route(analysis.get("routes"), sid, check_ids)
+    no_route = False
+    if route is not None:
+        if route["reachable"]:
+            reasons.append((REASON_ROUTE, (" -> ".join(route["route"]),)))
+            if route["failing"]:
+                reasons.append((REASON_ROUTE_FAILING, (", ".join(route["failing"]),)))
+        else:
+            reasons.append((REASON_NO_ROUTE, ()))
+        no_route = not route["reachable"]
+        analysis_failing = bool(route["failing"])
+    else:
+        fail_ids = analysis.get("fail_ids")
+        if fail_ids is None:
+            fail_ids = analysis.get("corridor_fail_ids", set()) | analysis.get("stairflight_fail_ids", set())
+        analysis_failing = bool(check_ids & fail_ids)
 
     # Compose final natural-language statement
     if base_verdict == "FAIL":
-        fire_route_statement = "Occupants DO NOT have the necessary access to the fire route (desk/door data fails BR18)."
+        fire_route_statement = STATEMENT_FAIL
+    elif no_route:
+        fire_route_statement = STATEMENT_NO_ROUTE
     elif analysis_failing:
-        fire_route_statement = "Occupants DO NOT have access to the fire route located by GRP04 (related element reported as failing)."
+        fire_route_statement = STATEMENT_ANALYSIS_FAILING
     elif base_verdict == "PASS":
-        fire_route_statement = "Occupants HAVE access to the fire route (desk/door data PASS BR18)."
+        fire_route_statement = STATEMENT_PASS
     else:
-        fire_route_statement = "Occupants' access to the fire route is UNKNOWN — desk/door data inconclusive and analysis contains no failing entry for this space."
+        fire_route_statement = STATEMENT_UNKNOWN
+
+    return SpaceVerdict(base_verdict, tuple(reasons), fire_route_statement)
 
-    return base_verdict, reasons, fire_route_statement
+def decide_verdict(space: SpaceRecord, analysis: Dict[str, Any], door_cm_per_desk: Optional[float] = None) -> Tuple[str, List[str], str]:
+    """Returns (verdict, reasons[], fire_route_statement); see evaluate_space."""
+    v = evaluate_space(space, analysis, door_cm_per_desk)
+    return v.verdict, v.reasons(), v.statement
 
 # ===========================
-# CHART CREATION: PASS/FAIL/UNKNOWN/NOT_APPLICABLE BAR CHART (PNG)
+# CHART CREATION: PASS/FAIL/UNKNOWN/NOT_APPLICABLE BAR CHART (PNG, ON REQUEST)
 # ===========================
 
+def load_matplotlib_figure():
+    """matplotlib's Figure class, imported on first use only (PNG charts); None if matplotlib is missing."""
+    try:
+        from matplotlib.figure import Figure   # no pyplot state: safe to render off the main thread
+    except Exception:
+        return None
+    return Figure
+
 def create_pass_fail_chart(counts: Dict[str, int], out_path: Path) -> Optional[Path]:
     """
     Creates and saves a simple bar chart showing counts for PASS/FAIL/UNKNOWN/NOT_APPLICABLE.
     Returns out_path on success or None if matplotlib not available or error occurred.
     """
-    if not MATPLOTLIB_AVAILABLE:
+    Figure = load_matplotlib_figure()
+    if Figure is None:
         return None
     labels = []
     values = []
     colors = []
-    mapping_colors = {
-        "PASS": "#2ca02c", "FAIL": "#d62728", "UNKNOWN": "#ff7f0e", "NOT_APPLICABLE": "#7f7f7f"
-    }
-    for k in ("PASS", "FAIL", "UNKNOWN", "NOT_APPLICABLE"):
+    for k in render.VERDICT_ORDER:
         labels.append(k)
         values.append(counts.get(k, 0))
-        colors.append(mapping_colors.get(k, "#808080"))
+        colors.append(render.VERDICT_COLORS.get(k, "#808080"))
     try:
-        plt.figure(figsize=(6,4), dpi=150)
-        bars = plt.bar(labels, values, color=colors)
-        plt.title("Spaces accessibility verdicts")
-        plt.ylabel("Number of spaces")
-        plt.grid(axis="y", linestyle="--", alpha=0.3)
+        fig = Figure(figsize=(6,4), dpi=150)
+        ax = fig.add_subplot()
+        bars = ax.bar(labels, values, color=colors)
+        ax.set_title("Spaces accessibility verdicts")
+        ax.set_ylabel("Number of spaces")
+        ax.grid(axis="y", linestyle="--", alpha=0.3)
         for bar in bars:
             h = bar.get_height()
-            plt.text(bar.get_x() + bar.get_width()/2, h + 0.5, str(int(h)), ha="center", va="bottom", fontsize=8)
-        plt.tight_layout()
+            ax.text(bar.get_x() + bar.get_width()/2, h + 0.5, str(int(h)), ha="center", va="bottom", fontsize=8)
+        fig.tight_layout()
         out_path.parent.mkdir(parents=True, exist_ok=True)
-        plt.savefig(out_path)
-        plt.close()
+        fig.savefig(out_path)
         return out_path
     except Exception:
         return None
 
+# ===========================
+# STAGE TIMING (JSON totals["perf"])
+# ===========================
+# Two clock reads per stage, so it is always on. CPU time is for the whole process
+# (it includes the PNG chart worker). The per-space loop only adds up wall time for
+# its "verdicts" / "write_details" split. Memory peaks are only traced on request.
+
+class StageTimer:
+    """Wall/CPU seconds and record counts per report stage; tracemalloc peak per stage with trace_memory=True."""
+
+    def __init__(self, trace_memory: bool = False):
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self.trace_memory = trace_memory
+        self.started = (time.perf_counter(), time.process_time())
+        if trace_memory:
+            tracemalloc.start()
+
+    def start(self) -> Tuple[float, float]:
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        return time.perf_counter(), time.process_time()
+
+    def stop(self, name: str, started: Tuple[float, float], records: Optional[int] = None) -> None:
+        stage = {"wall_s": round(time.perf_counter() - started[0], 6),
+                 "cpu_s": round(time.process_time() - started[1], 6),
+                 "records": records}
+        if self.trace_memory:
+            stage["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        self.stages[name] = stage
+
+    def add(self, name: str, wall_s: float, records: Optional[int] = None) -> None:
+        """Stage measured elsewhere (wall time only), e.g. summed over the per-space loop or on a worker thread."""
+        self.stages[name] = {"wall_s": round(wall_s, 6), "cpu_s": None, "records": records}
+
+    def perf(self) -> Dict[str, Any]:
+        """{"stages": {name: {"wall_s", "cpu_s", "records"[, "peak_bytes"]}}, "total_wall_s", "total_cpu_s"[, "peak_bytes"]}."""
+        out: Dict[str, Any] = {"stages": dict(self.stages),
+                               "total_wall_s": round(time.perf_counter() - self.started[0], 6),
+                               "total_cpu_s": round(time.process_time() - self.started[1], 6)}
+        if self.trace_memory:
+            out["peak_bytes"] = max((s.get("peak_bytes") or 0 for s in self.stages.values()), default=0)
+        return out
+
+    def close(self) -> None:
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+def timed_chart(make_chart, counts: Dict[str, int], out_path: Path) -> Tuple[Optional[Path], float]:
+    """Runs a chart function (on the worker thread) and returns (path or None, wall seconds)."""
+    t0 = time.perf_counter()
+    path = make_chart(counts, out_path)
+    return path, time.perf_counter() - t0
+
+# ===========================
+# REPORT SINKS (ONE SPACE AT A TIME)
+# ===========================
+# Every sink gets write(detail) per space, in report order, and close(summary) once
+# all spaces are in. summary = {"ts", "source_path", "analysis_path", "warnings",
+# "totals", "cm_per_occupant", "desks_outside"}. The TXT and JSON reports start with
+# the totals, so their per-space part is spooled to a temporary file and copied in
+# behind the header on close; the formatted details are never held in memory.
+
+def indent_json(text: str, spaces: int) -> str:
+    return text.replace("\n", "\n" + " " * spaces)
+
+class TextReportSink:
+    def __init__(self, path: Path):
+        self.path = path
+        self.spool = tempfile.TemporaryFile("w+", encoding="utf-8", dir=path.parent)
+
+    def write(self, d: Dict[str, Any]):
+        f = self.spool
+        f.write("\n---\n")
+        f.write(f"Space: {d['space_id']}  ({d.get('title')})\n")
+        f.write(f" Floor: {d['floor']}, Area: {d['area_m2']}, Height: {d['height_m']}\n")
+        f.write(f" Desks: {d['n_desks']} | Doors reported: {d['n_doors_reported']} | Total door width (cm): {d['total_door_width_cm_reported']}\n")
+        f.write(f" Desk-to-door ratio (cm): {d['desk_to_door_ratio_cm']}\n")
+        f.write(f" Verdict: {d['verdict']}\n")
+        for r in d['reasons']:
+            f.write(f"  - {r}\n")
+        f.write(f" Statement: {d.get('fire_route_statement')}\n")
+
+    def close(self, summary: Dict[str, Any]):
+        totals = summary["totals"]
+        with self.path.open("w", encoding="utf-8") as f:
+            f.write("All-spaces accessibility to fire route\n")
+            f.write(f"Generated: {summary['ts']}\n\n")
+            f.write(f"Source: {summary['source_path']}\n")
+            f.write(f"Reference analysis: {summary['analysis_path']}\n\n")
+            if summary["warnings"]:
+                f.write("Notes / parsing warnings:\n")
+                for w in summary["warnings"]:
+                    f.write(f" - {w}\n")
+                f.write("\n")
+
+            f.write("=== Summary ===\n")
+            f.write(f"Spaces scanned: {totals['spaces_scanned']}\n")
+            f.write(f"Spaces with desks: {totals['spaces_with_desks']}\n")
+            f.write(f"Total desks (sum): {totals['desks_total']}\n")
+
+            # building-level entries
+            f.write(f"Total occupants (based on desks): {totals['occupants_total']}\n")
+            f.write(f"BR18 minimum total door width required ({summary['cm_per_occupant']:.1f} cm per occupant): {totals['br18_min_total_door_width_cm']:.1f} cm\n")
+
+            f.write(f"PASS: {totals['spaces_pass']}  FAIL: {totals['spaces_fail']}  UNKNOWN: {totals['spaces_unknown']}\n\n")
+            f.write("=== Per-space details ===\n")
+            self.spool.seek(0)
+            shutil.copyfileobj(self.spool, f)
+            self.spool.close()
+
+            if summary["desks_outside"]:
+                f.write("\n\n=== Desks not in any IfcSpace (listed) ===\n")
+                for item in summary["desks_outside"]:
+                    f.write(f" Desk: {item.get('desk')}  GlobalId: {item.get('globalid')}{assigned_note(item)}\n")
+
+def assigned_note(item: Dict[str, Any]) -> str:
+    """' -> space X (contained | nearest, d m)' for a desk placed by assign_orphan_desks, else ''."""
+    if not item.get("assigned_to"):
+        return ""
+    how = "contained" if item.get("assigned_by") == "contained" else f"nearest, {item.get('distance_m')} m"
+    return f"  -> space {item['assigned_to']} ({how})"
+
+class JsonReportSink:
+    """Writes the same bytes as json.dumps({"generated", "totals", "details", "desks_outside"}, indent=2)."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.spool = tempfile.TemporaryFile("w+", encoding="utf-8", dir=path.parent)
+        self.count = 0
+
+    def write(self, d: Dict[str, Any]):
+        self.spool.write(",\n    " if self.count else "\n    ")
+        self.spool.write(indent_json(json.dumps(d, indent=2, ensure_ascii=False), 4))
+        self.count += 1
+
+    def close(self, summary: Dict[str, Any]):
+        head = json.dumps({"generated": summary["ts"], "totals": summary["totals"]}, indent=2, ensure_ascii=False)
+        with self.path.open("w", encoding="utf-8") as f:
+            f.write(head[:-2])  # drop the closing "\n}"
+            f.write(',\n  "details": [')
+            self.spool.seek(0)
+            shutil.copyfileobj(self.spool, f)
+            self.spool.close()
+            f.write("\n  ]" if self.count else "]")
+            f.write(',\n  "desks_outside": ')
+            f.write(indent_json(json.dumps(summary["desks_outside"], indent=2, ensure_ascii=False), 2))
+            f.write("\n}")
+
+class NdjsonReportSink:
+    """One JSON object per space and line, written as it arrives; the last line holds the totals."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.f = path.open("w", encoding="utf-8")
+
+    def write(self, d: Dict[str, Any]):
+        self.f.write(json.dumps(d, ensure_ascii=False))
+        self.f.write("\n")
+
+    def close(self, summary: Dict[str, Any]):
+        self.f.write(json.dumps({"generated": summary["ts"], "totals": summary["totals"], "desks_outside": summary["desks_outside"]}, ensure_ascii=False))
+        self.f.write("\n")
+        self.f.close()
+
 # ===========================
 # GENERATE FULL REPORT FOR ALL SPACES
 # ===========================
 
-def generate_report_for_all_spaces(txt_path: Path, analysis_path: Path) -> Path:
-    raw = read_text(txt_path)
-    blocks = split_space_blocks(raw)
-    parsed_spaces: Dict[str, Dict[str, Any]] = {}
+def load_desk_report(txt_path: Path, jobs: int = 1) -> Tuple[Dict[str, SpaceRecord], List[Dict[str, str]], List[str]]:
+    """
+    Space records, desks outside any IfcSpace and warnings from the GRP02 desk report.
+    jobs > 1 parses large reports across that many processes (iter_desk_report_parallel).
+    """
+    parsed_spaces: Dict[str, SpaceRecord] = {}
+    desks_outside: List[Dict[str, str]] = []
     warnings: List[str] = []
 
-    for blk in blocks:
-        parsed = parse_space_block(blk)
-        if parsed:
-            parsed_spaces[parsed["space_id"]] = parsed
-
-    # add any explicitly listed "spaces with no desks"
-    no_desks_list = parse_spaces_without_desks(raw)
-    for sid in no_desks_list:
-        if sid not in parsed_spaces:
-            parsed_spaces[sid] = {
-                "space_id": sid,
-                "title": sid,
-                "n_desks": 0,
-                "n_doors_reported": None,
-                "total_door_width_cm_reported": None,
-                "desk_to_door_ratio_cm": None,
-                "area_m2": None,
-                "height_m": None,
-                "floor": None,
-                "raw": "Listed under SPACES WITH NO DESKS",
-            }
+    unrecognised_labels: Dict[str, int] = {}
+
+    # single streaming pass; a "spaces with no desks" entry never replaces a parsed space block
+    events = iter_desk_report_parallel(txt_path, jobs) if jobs > 1 else iter_desk_report(txt_path)
+    for kind, rec in events:
+        if kind == "space":
+            parsed_spaces[rec["space_id"]] = rec
+            for label in rec["unrecognised_labels"]:
+                unrecognised_labels[label] = unrecognised_labels.get(label, 0) + 1
+        elif kind == "no_desks":
+            if rec not in parsed_spaces:
+                parsed_spaces[rec] = no_desks_record(rec)
+        elif kind == "desk_outside":
+            desks_outside.append(rec)
+
+    if unrecognised_labels:
+        listed = ", ".join(f"'{k}' ({v}x)" for k, v in sorted(unrecognised_labels.items()))
+        warnings.append(f"Unrecognised labels in desk report ignored: {listed}")
+    return parsed_spaces, desks_outside, warnings
+
+# ===========================
+# PARSE CACHE (CONTENT-ADDRESSED, SEE parse_cache.py)
+# ===========================
+# Parsed records are stored as marshal bytes of plain tuples / sets / dicts, keyed
+# by the input file's hash, its path (warnings quote it), the hash of this code and
+# the marshal format / Python version that wrote them. An entry that still does not
+# load (truncated, foreign) counts as a miss and is parsed and written again.
+
+CODE_DIGEST: Optional[str] = None
+
+def code_digest() -> str:
+    """Hash of main.py, render.py and the marshal / Python version: a change to any of them invalidates every cache entry."""
+    global CODE_DIGEST
+    if CODE_DIGEST is None:
+        import parse_cache
+        CODE_DIGEST = parse_cache.key_of(parse_cache.file_digest(Path(__file__)), parse_cache.file_digest(Path(render.__file__)),
+                                         marshal.version, tuple(sys.version_info[:2]))
+    return CODE_DIGEST
+
+def cached_desk_report(store, txt_path: Path, key: str, jobs: int = 1) -> Tuple[Dict[str, SpaceRecord], List[Dict[str, str]], List[str]]:
+    """load_desk_report through the parse cache."""
+    data = store.get(key)
+    if data is not None:
+        try:
+            records, desks_outside, warnings = marshal.loads(data)
+            return {v[0]: SpaceRecord(*v) for v in records}, desks_outside, warnings
+        except (ValueError, EOFError, TypeError):
+            pass   # unreadable entry: parse again and overwrite it
+    parsed_spaces, desks_outside, warnings = load_desk_report(txt_path, jobs)
+    store.put(key, marshal.dumps(([rec.values() for rec in parsed_spaces.values()], desks_outside, warnings)))
+    return parsed_spaces, desks_outside, warnings
+
+def cached_analysis(store, analysis_path: Path, key: str) -> Tuple[Dict[str, Any], List[str]]:
+    """parse_analysis_summary through the parse cache."""
+    data = store.get(key)
+    if data is not None:
+        try:
+            analysis, warnings = marshal.loads(data)
+            return analysis, warnings
+        except (ValueError, EOFError, TypeError):
+            pass   # unreadable entry: parse again and overwrite it
+    analysis, warnings = parse_analysis_summary(analysis_path)
+    store.put(key, marshal.dumps((analysis, warnings)))
+    return analysis, warnings
+
+def space_detail(sid: str, info: Dict[str, Any], verdict: str, reasons: List[str], fire_route_statement: str) -> Dict[str, Any]:
+    """One entry of the JSON report's "details" list."""
+    return {
+        "space_id": sid,
+        "title": info.get("title"),
+        "n_desks": info.get("n_desks") or 0,
+        "n_doors_reported": info.get("n_doors_reported"),
+        "total_door_width_cm_reported": info.get("total_door_width_cm_reported"),
+        "desk_to_door_ratio_cm": info.get("desk_to_door_ratio_cm"),
+        "area_m2": info.get("area_m2"),
+        "height_m": info.get("height_m"),
+        "floor": info.get("floor"),
+        "verdict": verdict,
+        "reasons": reasons,
+        "fire_route_statement": fire_route_statement,
+    }
+
+def generate_report_for_all_spaces(txt_path: Optional[Path], analysis_path: Path, ifc_path: Optional[Path] = None, report_dir: Optional[Path] = None) -> Path:
+    """
+    Writes the TXT/JSON(/PNG) report and returns the TXT path. Space records come
+    from the GRP02 desk report at txt_path, or straight from the IFC model when
+    ifc_path is given. Reports go to report_dir (default REPORT_DIR).
+    """
+    return run_report(txt_path, analysis_path, ifc_path=ifc_path, report_dir=report_dir)["txt"]
 
-    desks_outside = parse_desks_not_in_space(raw)
+def run_report(txt_path: Optional[Path], analysis_path: Path, ifc_path: Optional[Path] = None, report_dir: Optional[Path] = None,
+               door_cm_per_desk: Optional[float] = None, cm_per_occupant: Optional[float] = None,
+               route_ifc_path: Optional[Path] = None, ndjson: bool = False, chart: str = "svg",
+               trace_memory: bool = False, history_db: Optional[Path] = None, use_cache: bool = False,
+               jobs: int = 1, assign_desks_m: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Same as generate_report_for_all_spaces; returns {"txt", "json", "ndjson", "html", "chart", "floors_chart", "totals", "noop"}.
+    door_cm_per_desk / cm_per_occupant override the BR18 constants for this run.
+    GRP04 failures are checked along each space's route to a stair when an IFC model
+    is available (ifc_path, or route_ifc_path next to a text desk report).
+    With ndjson=True the per-space details are also written as NDJSON.
+    chart: "svg" (default), "png" (needs matplotlib; falls back to SVG) or "none".
+    totals["perf"] holds wall/CPU seconds and record counts per stage (see StageTimer);
+    trace_memory=True adds the tracemalloc peak per stage. The JSON report is closed
+    last, so its own write is the one stage not in the block.
+    With history_db set, the run and all space details are also stored in that
+    SQLite database (see history.py), committed after the JSON report.
+    With use_cache=True (text reports only, no route tracing) the parsed inputs come
+    from the parse cache (see parse_cache.py) when their content is unchanged, and a
+    run whose inputs, parameters, options and code all match an earlier run is a
+    no-op: nothing is written and the earlier run's files and totals are returned
+    with "noop": True.
+    jobs > 1 parses a large desk report across that many processes (see
+    iter_desk_report_parallel); the records are the same as with jobs=1.
+    With assign_desks_m set, desks not in any IfcSpace are assigned to the space that
+    contains them, or the nearest one within that many metres, using the IFC model
+    (ifc_path or route_ifc_path), before the spaces are decided (see assign_orphan_desks).
+    """
+    report_dir = Path(report_dir) if report_dir is not None else REPORT_DIR
+    cm_per_desk = DOOR_CM_PER_DESK if door_cm_per_desk is None else door_cm_per_desk
+    cm_per_occupant = BR18_CM_PER_OCCUPANT if cm_per_occupant is None else cm_per_occupant
+    report_dir.mkdir(parents=True, exist_ok=True)
+    timer = StageTimer(trace_memory)
+    try:
+        return write_all_reports(timer, txt_path, analysis_path, ifc_path, report_dir, cm_per_desk, cm_per_occupant,
+                                 route_ifc_path, ndjson, chart, history_db, use_cache, jobs, assign_desks_m)
+    finally:
+        timer.close()
+
+def write_all_reports(timer: StageTimer, txt_path: Optional[Path], analysis_path: Path, ifc_path: Optional[Path],
+                      report_dir: Path, cm_per_desk: float, cm_per_occupant: float, route_ifc_path: Optional[Path],
+                      ndjson: bool, chart: str, history_db: Optional[Path] = None, use_cache: bool = False,
+                      jobs: int = 1, assign_desks_m: Optional[float] = None) -> Dict[str, Any]:
+    """Body of run_report, one timer stage per step."""
+    store = run_key = desk_key = analysis_key = None
+    if use_cache and ifc_path is None and route_ifc_path is None:
+        import parse_cache   # only when asked for
+        store = parse_cache.ParseCache()
+        desk_key = parse_cache.key_of("desks", code_digest(), str(txt_path), parse_cache.file_digest(txt_path))
+        analysis_key = (parse_cache.key_of("analysis", code_digest(), str(analysis_path), parse_cache.file_digest(analysis_path))
+                        if analysis_path.exists() else None)
+        run_key = parse_cache.key_of("run", desk_key, analysis_key, cm_per_desk, cm_per_occupant, ndjson, chart,
+                                     str(report_dir.resolve()), str(history_db) if history_db else None, assign_desks_m,
+                                     timer.trace_memory)
+        previous = store.find_run(run_key)
+        if previous is not None:
+            outputs = {k: Path(v) if v else None for k, v in previous["outputs"].items()}
+            return {**outputs, "totals": previous["totals"], "noop": True}
+
+    ifc = None
+    started = timer.start()
+    if ifc_path is not None:
+        ifc = open_ifc(ifc_path)
+        parsed_spaces, desks_outside, warnings = load_ifc_spaces(ifc_path, ifc)
+        source_path = route_ifc_path = ifc_path
+    elif store is not None:
+        parsed_spaces, desks_outside, warnings = cached_desk_report(store, txt_path, desk_key, jobs)
+        source_path = txt_path
+    else:
+        parsed_spaces, desks_outside, warnings = load_desk_report(txt_path, jobs)
+        source_path = txt_path
+    timer.stop("load_spaces", started, len(parsed_spaces))
 
-    analysis, a_warnings = parse_analysis_summary(analysis_path)
+    started = timer.start()
+    if store is not None and analysis_key is not None:
+        analysis, a_warnings = cached_analysis(store, analysis_path, analysis_key)
+    else:
+        analysis, a_warnings = parse_analysis_summary(analysis_path)
     warnings.extend(a_warnings)
+    timer.stop("parse_analysis", started, len(analysis["fail_ids"]))
 
-    details: List[Dict[str, Any]] = []
-    totals = {"spaces_scanned": 0, "spaces_with_desks": 0, "spaces_pass": 0, "spaces_fail": 0, "spaces_unknown": 0, "desks_total": 0, "spaces_not_applicable": 0}
+    desks_assigned = None
+    if assign_desks_m is not None:
+        started = timer.start()
+        if route_ifc_path is None:
+            warnings.append("Assigning desks not in any IfcSpace needs an IFC model (--ifc or --routes-from); desks left unassigned.")
+        else:
+            ifc = ifc or open_ifc(route_ifc_path)
+            added, d_warnings = assign_orphan_desks(ifc, parsed_spaces, desks_outside, assign_desks_m)
+            desks_assigned = sum(added.values())
+            warnings.extend(d_warnings)
+        timer.stop("assign_desks", started, len(desks_outside))
+
+    if route_ifc_path is not None:
+        started = timer.start()
+        analysis["routes"], r_warnings = load_ifc_routes(route_ifc_path, analysis, ifc, parsed_spaces)
+        warnings.extend(r_warnings)
+        timer.stop("routes", started, len(analysis["routes"]))
 
-    for sid, info in parsed_spaces.items():
+    ts = now_ts()
+    out_txt = report_dir / f"spaces_accessibility_allspaces_{ts}.txt"
+    out_json = report_dir / f"spaces_accessibility_allspaces_{ts}.json"
+    out_ndjson = report_dir / f"spaces_accessibility_allspaces_{ts}.ndjson" if ndjson else None
+    out_html = report_dir / f"spaces_accessibility_allspaces_{ts}.html"
+    text_sink, json_sink, html_sink = TextReportSink(out_txt), JsonReportSink(out_json), render.HtmlReportSink(out_html)
+    sinks: List[Any] = [text_sink, json_sink, html_sink] + ([NdjsonReportSink(out_ndjson)] if ndjson else [])
+    history_sink = None
+    if history_db is not None:
+        import history   # sqlite3 run history, only when asked for
+        history_sink = history.HistorySink(history_db, ts, report_path=out_json.resolve(),
+                                           source_path=source_path, analysis_path=analysis_path)
+
+    totals = {"spaces_scanned": 0, "spaces_with_desks": 0, "spaces_pass": 0, "spaces_fail": 0, "spaces_unknown": 0, "desks_total": 0, "spaces_not_applicable": 0}
+    if desks_assigned is not None:
+        totals["desks_assigned_to_spaces"] = desks_assigned
+    door_width_reported_total = 0.0
+
+    # spaces are decided in report order and each detail goes straight to the sinks
+    started = timer.start()
+    verdict_s = write_s = 0.0
+    for sid in sorted(parsed_spaces, key=str):
+        t0 = time.perf_counter()
+        info = parsed_spaces[sid]
         totals["spaces_scanned"] += 1
         n = info.get("n_desks") or 0
         totals["desks_total"] += n
+        door_width_reported_total += info.get("total_door_width_cm_reported") or 0.0
         if n > 0:
             totals["spaces_with_desks"] += 1
 
-        verdict, reasons, fire_route_statement = decide_verdict(info, analysis)
+        result = evaluate_space(info, analysis, cm_per_desk)
+        verdict = result.verdict
         if verdict == "PASS":
             totals["spaces_pass"] += 1
         elif verdict == "FAIL":
@@ -417,104 +1737,146 @@ def generate_report_for_all_spaces(txt_path: Path, analysis_path: Path) -> Path:
         elif verdict == "NOT_APPLICABLE":
             totals["spaces_not_applicable"] += 1
 
-        details.append({
-            "space_id": sid,
-            "title": info.get("title"),
-            "n_desks": n,
-            "n_doors_reported": info.get("n_doors_reported"),
-            "total_door_width_cm_reported": info.get("total_door_width_cm_reported"),
-            "desk_to_door_ratio_cm": info.get("desk_to_door_ratio_cm"),
-            "area_m2": info.get("area_m2"),
-            "height_m": info.get("height_m"),
-            "floor": info.get("floor"),
-            "verdict": verdict,
-            "reasons": reasons,
-            "fire_route_statement": fire_route_statement,
-        })
-
-    details = sorted(details, key=lambda d: str(d["space_id"]))
+        detail = space_detail(sid, info, verdict, result.reasons(), result.statement)
+        t1 = time.perf_counter()
+        for sink in sinks:
+            sink.write(detail)
+        if history_sink is not None:
+            history_sink.write(detail)
+        verdict_s += t1 - t0
+        write_s += time.perf_counter() - t1
+    timer.stop("decide_and_write", started, totals["spaces_scanned"])
+    timer.add("verdicts", verdict_s, totals["spaces_scanned"])
+    timer.add("write_details", write_s, totals["spaces_scanned"] * (len(sinks) + (history_sink is not None)))
 
     # building-level occupants and BR18 minimum total door width
     occupants_total = totals["desks_total"]
-    br18_min_total_door_width_cm = round(occupants_total * BR18_CM_PER_OCCUPANT, 1)
+    br18_min_total_door_width_cm = round(occupants_total * cm_per_occupant, 1)
+    totals["occupants_total"] = occupants_total
+    totals["br18_min_total_door_width_cm"] = br18_min_total_door_width_cm
 
-    ts = now_ts()
-    out_txt = REPORT_DIR / f"spaces_accessibility_allspaces_{ts}.txt"
-    out_json = REPORT_DIR / f"spaces_accessibility_allspaces_{ts}.json"
-
-    # write text report
-    with out_txt.open("w", encoding="utf-8") as f:
-        f.write("All-spaces accessibility to fire route\n")
-        f.write(f"Generated: {ts}\n\n")
-        f.write(f"Source: {txt_path}\n")
-        f.write(f"Reference analysis: {analysis_path}\n\n")
-        if warnings:
-            f.write("Notes / parsing warnings:\n")
-            for w in warnings:
-                f.write(f" - {w}\n")
-            f.write("\n")
-
-        f.write("=== Summary ===\n")
-        f.write(f"Spaces scanned: {totals['spaces_scanned']}\n")
-        f.write(f"Spaces with desks: {totals['spaces_with_desks']}\n")
-        f.write(f"Total desks (sum): {totals['desks_total']}\n")
-
-        # building-level entries
-        f.write(f"Total occupants (based on desks): {occupants_total}\n")
-        f.write(f"BR18 minimum total door width required (1.0 cm per occupant): {br18_min_total_door_width_cm:.1f} cm\n")
-
-        f.write(f"PASS: {totals['spaces_pass']}  FAIL: {totals['spaces_fail']}  UNKNOWN: {totals['spaces_unknown']}\n\n")
-        f.write("=== Per-space details ===\n")
-        for d in details:
-            f.write("\n---\n")
-            f.write(f"Space: {d['space_id']}  ({d.get('title')})\n")
-            f.write(f" Floor: {d['floor']}, Area: {d['area_m2']}, Height: {d['height_m']}\n")
-            f.write(f" Desks: {d['n_desks']} | Doors reported: {d['n_doors_reported']} | Total door width (cm): {d['total_door_width_cm_reported']}\n")
-            f.write(f" Desk-to-door ratio (cm): {d['desk_to_door_ratio_cm']}\n")
-            f.write(f" Verdict: {d['verdict']}\n")
-            for r in d['reasons']:
-                f.write(f"  - {r}\n")
-            f.write(f" Statement: {d.get('fire_route_statement')}\n")
-
-        if desks_outside:
-            f.write("\n\n=== Desks not in any IfcSpace (listed) ===\n")
-            for item in desks_outside:
-                f.write(f" Desk: {item.get('desk')}  GlobalId: {item.get('globalid')}\n")
-
-    # CREATE PASS/FAIL CHART (PNG) AND ADD PATH TO JSON TOTALS (NON-DESTRUCTIVE ADDITION)
+    # CREATE PASS/FAIL CHART: SVG INLINE, PNG ON A BACKGROUND WORKER WHILE THE TXT SINK IS CLOSED
     chart_counts = {
         "PASS": totals.get("spaces_pass", 0),
         "FAIL": totals.get("spaces_fail", 0),
         "UNKNOWN": totals.get("spaces_unknown", 0),
         "NOT_APPLICABLE": totals.get("spaces_not_applicable", 0)
     }
-    chart_path = REPORT_DIR / f"spaces_accessibility_chart_{ts}.png"
+    summary = {"ts": ts, "source_path": source_path, "analysis_path": analysis_path, "warnings": warnings[:],
+               "totals": totals, "cm_per_occupant": cm_per_occupant, "desks_outside": desks_outside}
     chart_file = None
-    if MATPLOTLIB_AVAILABLE:
-        chart_file = create_pass_fail_chart(chart_counts, chart_path)
-        if chart_file is None:
-            warnings.append("matplotlib available but chart creation failed.")
-    else:
-        warnings.append("matplotlib not available — skipping chart generation.")
+    chart_s = 0.0
+    started = timer.start()
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        png_path = report_dir / f"spaces_accessibility_chart_{ts}.png"
+        chart_job = pool.submit(timed_chart, create_pass_fail_chart, chart_counts, png_path) if chart == "png" else None
+        text_sink.close(summary)
+        timer.stop("write_txt", started, 1)
+        if chart_job is not None:
+            chart_file, chart_s = chart_job.result()
+    if chart == "png" and chart_file is None:
+        summary["warnings"].append("PNG chart needs matplotlib (missing or chart creation failed) — SVG chart written instead.")
+    if chart == "svg" or (chart == "png" and chart_file is None):
+        t0 = time.perf_counter()
+        chart_file = render.write_svg(render.svg_verdict_chart(chart_counts), report_dir / f"spaces_accessibility_chart_{ts}.svg")
+        chart_s += time.perf_counter() - t0
+    timer.add("chart", chart_s, 1 if chart_file else 0)
 
-    # update totals for JSON and write
-    totals["occupants_total"] = occupants_total
-    totals["br18_min_total_door_width_cm"] = br18_min_total_door_width_cm
     totals["chart_path"] = str(chart_file) if chart_file else None
-
-    out_json.write_text(json.dumps({"generated": ts, "totals": totals, "details": details, "desks_outside": desks_outside}, indent=2, ensure_ascii=False), encoding="utf-8")
-    return out_txt
+    totals["door_width_reported_total_cm"] = round(door_width_reported_total, 1)
+
+    # other reports first, so the JSON totals can carry their timings
+    started = timer.start()
+    for sink in sinks[2:]:
+        sink.close(summary)
+    floors_chart = render.write_svg(html_sink.floor_chart(), report_dir / f"spaces_accessibility_floors_{ts}.svg")
+    timer.stop("write_html_ndjson_floors", started, len(sinks) - 1)
+
+    totals["perf"] = timer.perf()
+    json_sink.close(summary)
+    if history_sink is not None:
+        history_sink.close(summary)
+    outputs = {"txt": out_txt, "json": out_json, "ndjson": out_ndjson, "html": out_html, "chart": chart_file,
+               "floors_chart": floors_chart}
+    if store is not None:
+        store.record_run(run_key, ts, outputs, totals)
+    return {**outputs, "totals": totals, "noop": False}
 
 # ===========================
 # MAIN / CLI
 # ===========================
 
+def history_path(arg) -> Optional[Path]:
+    """--history value: None (off), True (default database) or a path."""
+    if arg is True:
+        import history
+        return history.DEFAULT_DB
+    return arg
+
+def print_perf(perf: Dict[str, Any]) -> None:
+    """One line per stage from totals["perf"]."""
+    print(f"Stages (total {perf['total_wall_s']:.3f} s wall, {perf['total_cpu_s']:.3f} s CPU):")
+    for name, st in perf["stages"].items():
+        cpu = f"{st['cpu_s']:.3f} s CPU" if st["cpu_s"] is not None else "-"
+        peak = f", peak {st['peak_bytes'] / 1e6:.1f} MB" if "peak_bytes" in st else ""
+        print(f"  {name:<26} {st['wall_s']:8.3f} s wall  {cpu:>12}  {st['records'] if st['records'] is not None else '-':>8} records{peak}")
+
+def dump_profile(profiler, out_path: Path) -> None:
+    """Writes the cProfile stats (load with pstats / snakeviz) and prints the top functions by cumulative time."""
+    import pstats
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    profiler.dump_stats(str(out_path))
+    print("Profile written:", out_path)
+    pstats.Stats(profiler).sort_stats("cumulative").print_stats(15)
+
 def main():
+    parser = argparse.ArgumentParser(description="All-spaces accessibility to evacuation route (BR18).")
+    parser.add_argument("--desks", type=Path, default=DESK_TXT, help="GRP02 desk report (TXT)")
+    parser.add_argument("--analysis", type=Path, default=ANALYSIS_SUMMARY_TXT, help="GRP04 analysis_summary (TXT)")
+    parser.add_argument("--ifc", type=Path, default=None, help="read spaces, desks and doors directly from this IFC model instead of --desks")
+    parser.add_argument("--routes-from", type=Path, default=None, help="IFC model used to trace each space's route to a stair (implied by --ifc)")
+    parser.add_argument("--door-cm-per-desk", type=float, default=None, help=f"per-space BR18 door width per desk (default {DOOR_CM_PER_DESK})")
+    parser.add_argument("--cm-per-occupant", type=float, default=None, help=f"building-level BR18 door width per occupant (default {BR18_CM_PER_OCCUPANT})")
+    parser.add_argument("--ndjson", action="store_true", help="also write the per-space details as NDJSON, one space per line")
+    parser.add_argument("--chart", choices=("svg", "png", "none"), default="svg", help="verdict chart format (png needs matplotlib)")
+    parser.add_argument("--profile", nargs="?", type=Path, const=True, default=None, metavar="FILE",
+                        help="run under cProfile and dump the stats (default FILE: A3/Results/profile_<timestamp>.prof)")
+    parser.add_argument("--history", nargs="?", type=Path, const=True, default=None, metavar="DB",
+                        help="also store the run in a SQLite history (default DB: A3/Results/accessibility_history.sqlite; query with history.py)")
+    parser.add_argument("--assign-desks", nargs="?", type=float, const=DESK_ASSIGN_TOLERANCE_M, default=None, metavar="METRES",
+                        help=f"assign desks not in any IfcSpace to the containing or nearest space within METRES (default {DESK_ASSIGN_TOLERANCE_M}); needs --ifc or --routes-from")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="parse a large desk report (8 MB or more) across N processes; 0 = one per CPU core")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="always parse and write a new report (default: reuse parsed inputs from A3/Results/.cache and skip unchanged runs)")
+    parser.add_argument("--trace-memory", action="store_true", help="add the tracemalloc peak per stage to the JSON totals[\"perf\"] block")
+    args = parser.parse_args()
+    profiler = None
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
     try:
-        out = generate_report_for_all_spaces(DESK_TXT, ANALYSIS_SUMMARY_TXT)
-        print("Report written:", out)
+        out = run_report(args.desks, args.analysis, ifc_path=args.ifc,
+                         door_cm_per_desk=args.door_cm_per_desk, cm_per_occupant=args.cm_per_occupant,
+                         route_ifc_path=args.routes_from, ndjson=args.ndjson, chart=args.chart,
+                         trace_memory=args.trace_memory, history_db=history_path(args.history),
+                         use_cache=not args.no_cache, jobs=args.jobs or os.cpu_count() or 1,
+                         assign_desks_m=args.assign_desks)
+        if out["noop"]:
+            print("Inputs, parameters and options unchanged since the last run; existing report:", out["txt"])
+        else:
+            print("Report written:", out["txt"])
+            print_perf(out["totals"]["perf"])
     except FileNotFoundError as e:
         print("Missing input:", e)
+    except RuntimeError as e:
+        print("Error:", e)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            dump_profile(profiler, REPORT_DIR / f"profile_{now_ts()}.prof" if args.profile is True else args.profile)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
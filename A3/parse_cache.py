@@ -0,0 +1,139 @@
+"""
+================================================================================
+CONTENT-ADDRESSED PARSE CACHE AND NO-OP RUN DETECTION FOR THE A3 MANAGER SCRIPT
+================================================================================
+
+PURPOSE:
+
+Re-running main.py on unchanged analyst files used to repeat all parsing and
+write an identical report under a new timestamp. This module gives main.py:
+
+ - a blob store keyed by content hashes (blake2b): main.py keeps the parsed
+   space records and the GRP04 analysis ID sets in it as marshal bytes
+ - a run index: the hash of both input files, the BR18 parameters, the output
+   options and the code itself, mapped to the report files of the run that
+   produced them. A run with the same key is a no-op and points to those files
+   (as long as they still exist).
+
+The store is one folder of <key>.bin / <key>.run.json files, bounded in size
+(CACHE_MAX_BYTES). Every hit refreshes the file's modification time, and the
+least recently used files are removed first when the bound is exceeded.
+
+Only the standard library is used. What is stored (and how it is encoded) is
+decided by main.py; see main.cached_desk_report / main.cached_analysis.
+
+================================================================================
+"""
+
+# ===========================
+# IMPORTS
+# ===========================
+
+from pathlib import Path
+import hashlib
+import json
+import os
+import tempfile
+from typing import Dict, Any, Optional
+
+# ===========================
+# CONSTANTS
+# ===========================
+
+CACHE_DIR = Path(__file__).resolve().parent / "Results" / ".cache"
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+HASH_CHUNK = 1 << 20
+
+# ===========================
+# HASHING
+# ===========================
+
+def file_digest(path: Path) -> str:
+    """blake2b of the file's bytes (read in 1 MB chunks); raises FileNotFoundError like the parsers do."""
+    h = hashlib.blake2b(digest_size=20)
+    with Path(path).open("rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def key_of(*parts: Any) -> str:
+    """Cache key for any mix of digests, paths and parameters (their repr is hashed)."""
+    h = hashlib.blake2b(digest_size=20)
+    for part in parts:
+        h.update(repr(part).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+# ===========================
+# STORE
+# ===========================
+
+class ParseCache:
+    """Folder of content-addressed blobs and run entries with LRU eviction by modification time."""
+
+    def __init__(self, cache_dir: Path = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES):
+        self.dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.dir.mkdir(parents=True, exist_ok=True)
+
+    def read(self, name: str) -> Optional[bytes]:
+        path = self.dir / name
+        try:
+            data = path.read_bytes()
+            os.utime(path)   # mark as recently used
+        except OSError:
+            return None
+        return data
+
+    def write(self, name: str, data: bytes) -> None:
+        # write-then-rename, so a concurrent run never reads half a file
+        fd, tmp = tempfile.mkstemp(dir=self.dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self.dir / name)
+        self.evict()
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.read(f"{key}.bin")
+
+    def put(self, key: str, data: bytes) -> None:
+        self.write(f"{key}.bin", data)
+
+    def evict(self) -> None:
+        """Removes least recently used entries until the folder is within max_bytes."""
+        entries = []
+        for p in self.dir.iterdir():
+            if p.suffix in (".bin", ".json"):
+                try:
+                    st = p.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, p))
+        total = sum(size for _, size, _ in entries)
+        for _, size, p in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                p.unlink()
+            except OSError:
+                pass
+            total -= size
+
+    # NO-OP RUN INDEX
+
+    def find_run(self, run_key: str) -> Optional[Dict[str, Any]]:
+        """The recorded outputs of an identical earlier run, if all its report files still exist."""
+        data = self.read(f"{run_key}.run.json")
+        if data is None:
+            return None
+        try:
+            run = json.loads(data.decode("utf-8"))
+        except ValueError:
+            return None
+        if not all(Path(p).is_file() for p in run["outputs"].values() if p):
+            return None
+        return run
+
+    def record_run(self, run_key: str, ts: str, outputs: Dict[str, Optional[Path]], totals: Dict[str, Any]) -> None:
+        run = {"ts": ts, "outputs": {k: str(v) if v else None for k, v in outputs.items()}, "totals": totals}
+        self.write(f"{run_key}.run.json", json.dumps(run, ensure_ascii=False, default=str).encode("utf-8"))
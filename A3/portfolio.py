@@ -0,0 +1,254 @@
+"""
+================================================================================
+MULTI-PROJECT (PORTFOLIO) BATCH RUNNER FOR THE A3 MANAGER SCRIPT
+================================================================================
+
+PURPOSE:
+
+Runs the all-spaces accessibility report (main.run_report) for many buildings or
+design variants in one go, spread over a process pool, and writes one
+consolidated portfolio summary.
+
+MANIFEST (JSON):
+
+ [
+   {"name": "Building A", "desks": "A/A3_analyst_checks_GRP2.txt",
+    "analysis": "A/analysis_summary.txt", "out_dir": "A/Results"},
+   {"name": "Variant B", "ifc": "B/model.ifc", "analysis": "B/analysis_summary.txt", "out_dir": "B/Results"}
+ ]
+
+ Relative paths are resolved against the manifest's folder. "name" defaults to
+ the out_dir name. "ifc" may replace "desks" (IFC extraction mode).
+
+OUTPUT FILES:
+
+ - <out>/portfolio_summary_<timestamp>.txt
+ - <out>/portfolio_summary_<timestamp>.json
+    (per project: PASS/FAIL/UNKNOWN, space counts and building-level BR18 totals;
+    a second run within the same second gets a _2, _3, ... suffix)
+ Every project needs its own out_dir: a manifest where two share one is rejected.
+
+PROJECT VERDICT:
+
+ - FAIL:    any space FAILs, or the reported door width in total is below the
+            BR18 building minimum (BR18_CM_PER_OCCUPANT per occupant)
+ - UNKNOWN: no FAIL, but at least one space is UNKNOWN
+ - PASS:    otherwise
+ A project whose report could not be produced is listed as ERROR and never
+ stops the other projects. If a worker process dies (e.g. out of memory), the
+ shared pool is broken: the projects it had not finished are run again, each
+ in its own process, so only the one that died again is listed as ERROR.
+
+USAGE:
+
+    python A3/portfolio.py projects.json [--jobs N] [--out DIR]
+
+================================================================================
+"""
+
+# ===========================
+# IMPORTS
+# ===========================
+
+from pathlib import Path
+import argparse
+import json
+import os
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, List, Optional
+
+import main
+
+# ===========================
+# MANIFEST
+# ===========================
+
+def load_manifest(path: Path) -> List[Dict[str, Any]]:
+    entries = json.loads(main.read_text(path))
+    if not isinstance(entries, list):
+        raise ValueError(f"Manifest must be a JSON list of projects: {path}")
+    base = path.resolve().parent
+
+    def resolve(value: Optional[str]) -> Optional[str]:
+        if not value:
+            return None
+        p = Path(value)
+        return str(p if p.is_absolute() else base / p)
+
+    projects = []
+    used: Dict[str, str] = {}
+    for i, e in enumerate(entries):
+        out_dir = resolve(e.get("out_dir")) or str(base / f"project_{i + 1}")
+        name = e.get("name") or Path(out_dir).name
+        # reports are named by the second they are written, so projects sharing a folder would overwrite each other
+        folder = os.path.normcase(str(Path(out_dir).resolve()))
+        if folder in used:
+            raise ValueError(f"Manifest entries {used[folder]!r} and {name!r} share out_dir {out_dir}; give each project its own folder: {path}")
+        used[folder] = name
+        projects.append({
+            "name": name,
+            "desks": resolve(e.get("desks")),
+            "analysis": resolve(e.get("analysis")),
+            "ifc": resolve(e.get("ifc")),
+            "out_dir": out_dir,
+        })
+    return projects
+
+# ===========================
+# PER-PROJECT WORKER (RUNS IN A POOL PROCESS)
+# ===========================
+
+def project_verdict(totals: Dict[str, Any]) -> str:
+    if totals.get("spaces_fail"):
+        return "FAIL"
+    if totals.get("door_width_reported_total_cm", 0.0) < totals.get("br18_min_total_door_width_cm", 0.0):
+        return "FAIL"
+    if totals.get("spaces_unknown"):
+        return "UNKNOWN"
+    return "PASS"
+
+def run_project(project: Dict[str, Any]) -> Dict[str, Any]:
+    """One project's report + summary row; any exception becomes an ERROR row."""
+    row = {"name": project["name"], "out_dir": project["out_dir"]}
+    if not project["analysis"] or not (project["desks"] or project["ifc"]):
+        row.update({"verdict": "ERROR", "error": "manifest entry needs 'analysis' and one of 'desks' / 'ifc'"})
+        return row
+    try:
+        res = main.run_report(
+            Path(project["desks"]) if project["desks"] else None,
+            Path(project["analysis"]),
+            ifc_path=Path(project["ifc"]) if project["ifc"] else None,
+            report_dir=Path(project["out_dir"]),
+        )
+    except Exception as e:
+        row.update({"verdict": "ERROR", "error": f"{type(e).__name__}: {e}", "traceback": traceback.format_exc()})
+        return row
+    totals = res["totals"]
+    row.update({
+        "verdict": project_verdict(totals),
+        "report_txt": str(res["txt"]),
+        "report_json": str(res["json"]),
+        "totals": totals,
+    })
+    return row
+
+# ===========================
+# PORTFOLIO
+# ===========================
+
+def error_row(project: Dict[str, Any], e: Exception) -> Dict[str, Any]:
+    return {"name": project["name"], "out_dir": project["out_dir"], "verdict": "ERROR", "error": f"{type(e).__name__}: {e}"}
+
+def run_isolated(projects: List[Dict[str, Any]], indexes: List[int], jobs: Optional[int] = None) -> Dict[int, Dict[str, Any]]:
+    """Runs each project in its own one-process pool, jobs at a time, so a dying process only fails its own project."""
+    rows: Dict[int, Dict[str, Any]] = {}
+    jobs = jobs or os.cpu_count() or 1
+    for start in range(0, len(indexes), jobs):
+        pools = {i: ProcessPoolExecutor(max_workers=1) for i in indexes[start:start + jobs]}
+        try:
+            futures = {i: pool.submit(run_project, projects[i]) for i, pool in pools.items()}
+            for i, fut in futures.items():
+                try:
+                    rows[i] = fut.result()
+                except Exception as e:  # this project's process died (e.g. out of memory)
+                    rows[i] = error_row(projects[i], e)
+        finally:
+            for pool in pools.values():
+                pool.shutdown()
+    return rows
+
+def run_portfolio(projects: List[Dict[str, Any]], jobs: Optional[int] = None) -> Dict[str, Any]:
+    rows: Dict[int, Dict[str, Any]] = {}
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(run_project, p): i for i, p in enumerate(projects)}
+        for fut in as_completed(futures):
+            i = futures[fut]
+            try:
+                rows[i] = fut.result()
+            except BrokenProcessPool:
+                pass  # a worker died: every unfinished project is retried below
+            except Exception as e:
+                rows[i] = error_row(projects[i], e)
+
+    unfinished = [i for i in range(len(projects)) if i not in rows]
+    if unfinished:
+        rows.update(run_isolated(projects, unfinished, jobs))
+
+    ordered = [rows[i] for i in range(len(projects))]
+    portfolio = {"projects": 0, "PASS": 0, "FAIL": 0, "UNKNOWN": 0, "ERROR": 0,
+                 "occupants_total": 0, "br18_min_total_door_width_cm": 0.0, "door_width_reported_total_cm": 0.0}
+    for row in ordered:
+        portfolio["projects"] += 1
+        portfolio[row["verdict"]] += 1
+        t = row.get("totals") or {}
+        portfolio["occupants_total"] += t.get("occupants_total", 0)
+        portfolio["br18_min_total_door_width_cm"] += t.get("br18_min_total_door_width_cm", 0.0)
+        portfolio["door_width_reported_total_cm"] += t.get("door_width_reported_total_cm", 0.0)
+    portfolio["br18_min_total_door_width_cm"] = round(portfolio["br18_min_total_door_width_cm"], 1)
+    portfolio["door_width_reported_total_cm"] = round(portfolio["door_width_reported_total_cm"], 1)
+    return {"generated": main.now_ts(), "portfolio": portfolio, "projects": ordered}
+
+def claim_summary_path(out_dir: Path, ts: str) -> Path:
+    """portfolio_summary_<ts>.txt, or _2, _3, ... when an earlier run in the same second took it (created here, atomically)."""
+    n = 1
+    while True:
+        out_txt = out_dir / f"portfolio_summary_{ts}{'' if n == 1 else f'_{n}'}.txt"
+        try:
+            out_txt.open("x").close()
+            return out_txt
+        except FileExistsError:
+            n += 1
+
+def write_portfolio_summary(summary: Dict[str, Any], out_dir: Path) -> Path:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    ts = summary["generated"]
+    out_txt = claim_summary_path(out_dir, ts)
+    out_json = out_txt.with_suffix(".json")
+    p = summary["portfolio"]
+
+    with out_txt.open("w", encoding="utf-8") as f:
+        f.write("Portfolio accessibility to fire route\n")
+        f.write(f"Generated: {ts}\n\n")
+        f.write("=== Summary ===\n")
+        f.write(f"Projects: {p['projects']}  PASS: {p['PASS']}  FAIL: {p['FAIL']}  UNKNOWN: {p['UNKNOWN']}  ERROR: {p['ERROR']}\n")
+        f.write(f"Total occupants (based on desks): {p['occupants_total']}\n")
+        f.write(f"BR18 minimum total door width required: {p['br18_min_total_door_width_cm']:.1f} cm\n")
+        f.write(f"Total door width reported: {p['door_width_reported_total_cm']:.1f} cm\n\n")
+        f.write("=== Per-project ===\n")
+        for row in summary["projects"]:
+            f.write("\n---\n")
+            f.write(f"Project: {row['name']}\n")
+            f.write(f" Verdict: {row['verdict']}\n")
+            if row["verdict"] == "ERROR":
+                f.write(f" Error: {row['error']}\n")
+                continue
+            t = row["totals"]
+            f.write(f" Spaces: {t['spaces_scanned']} | PASS: {t['spaces_pass']}  FAIL: {t['spaces_fail']}  UNKNOWN: {t['spaces_unknown']}\n")
+            f.write(f" Occupants: {t['occupants_total']} | BR18 min door width: {t['br18_min_total_door_width_cm']:.1f} cm | Reported: {t['door_width_reported_total_cm']:.1f} cm\n")
+            f.write(f" Report: {row['report_txt']}\n")
+
+    out_json.write_text(json.dumps(summary, indent=2, ensure_ascii=False), encoding="utf-8")
+    return out_txt
+
+# ===========================
+# MAIN / CLI
+# ===========================
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Run the A3 accessibility report for every project in a manifest.")
+    parser.add_argument("manifest", type=Path, help="JSON list of {name, desks|ifc, analysis, out_dir}")
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--out", type=Path, default=main.REPORT_DIR, help="folder for the portfolio summary")
+    args = parser.parse_args()
+
+    projects = load_manifest(args.manifest)
+    summary = run_portfolio(projects, jobs=args.jobs)
+    out = write_portfolio_summary(summary, args.out)
+    p = summary["portfolio"]
+    print(f"Portfolio of {p['projects']} project(s): PASS {p['PASS']}, FAIL {p['FAIL']}, UNKNOWN {p['UNKNOWN']}, ERROR {p['ERROR']}")
+    print("Portfolio summary written:", out)
+
+if __name__ == "__main__":
+    main_cli()
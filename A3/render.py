@@ -0,0 +1,215 @@
+"""
+================================================================================
+DEPENDENCY-FREE SVG CHARTS AND HTML REPORT FOR THE A3 MANAGER SCRIPT
+================================================================================
+
+PURPOSE:
+
+Draws the PASS/FAIL/UNKNOWN/NOT_APPLICABLE chart and the per-floor breakdown
+as plain SVG text, and writes a self-contained HTML report (inline CSS and
+SVG, no scripts, no external files) in which every space in the overview
+table links to its reasons. Only the standard library is used; matplotlib is
+needed only when a PNG chart is asked for (see main.create_pass_fail_chart).
+
+HtmlReportSink follows the report sink interface of main.py: write(detail)
+once per space, close(summary) at the end.
+
+================================================================================
+"""
+
+# ===========================
+# IMPORTS
+# ===========================
+
+from pathlib import Path
+import html
+import tempfile
+import shutil
+from typing import Dict, Any
+
+# ===========================
+# CONSTANTS
+# ===========================
+
+VERDICT_ORDER = ("PASS", "FAIL", "UNKNOWN", "NOT_APPLICABLE")
+VERDICT_COLORS = {"PASS": "#2ca02c", "FAIL": "#d62728", "UNKNOWN": "#ff7f0e", "NOT_APPLICABLE": "#7f7f7f"}
+NO_FLOOR = "(no floor)"
+FONT = "font-family=\"DejaVu Sans, Arial, sans-serif\""
+
+# ===========================
+# SVG HELPERS
+# ===========================
+
+def esc(value: Any) -> str:
+    return html.escape(str(value), quote=True)
+
+def nice_step(max_value: float, ticks: int = 5) -> int:
+    """Axis step of 1, 2 or 5 x 10^k giving about `ticks` gridlines."""
+    raw = max(max_value, 1) / ticks
+    magnitude = 1
+    while magnitude * 10 <= raw:
+        magnitude *= 10
+    for factor in (1, 2, 5, 10):
+        if factor * magnitude >= raw:
+            return factor * magnitude
+    return 10 * magnitude
+
+def svg_verdict_chart(counts: Dict[str, int], title: str = "Spaces accessibility verdicts") -> str:
+    """Vertical bar chart of the verdict counts, same layout as the PNG chart."""
+    width, height = 600, 400
+    left, right, top, bottom = 60, 20, 40, 50
+    plot_w, plot_h = width - left - right, height - top - bottom
+    values = [counts.get(v, 0) for v in VERDICT_ORDER]
+    step = nice_step(max(values))
+    y_max = step * max(1, -(-max(values) // step))
+
+    def y(v: float) -> float:
+        return top + plot_h - plot_h * v / y_max
+
+    out = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" viewBox="0 0 {width} {height}" {FONT} font-size="12">',
+           f'<rect width="{width}" height="{height}" fill="#ffffff"/>',
+           f'<text x="{left + plot_w / 2}" y="{top - 15}" text-anchor="middle" font-size="15">{esc(title)}</text>',
+           f'<text transform="translate(16 {top + plot_h / 2}) rotate(-90)" text-anchor="middle">Number of spaces</text>']
+    for tick in range(0, y_max + 1, step):
+        out.append(f'<line x1="{left}" x2="{left + plot_w}" y1="{y(tick):.1f}" y2="{y(tick):.1f}" stroke="#000" stroke-opacity="0.15" stroke-dasharray="4 3"/>')
+        out.append(f'<text x="{left - 6}" y="{y(tick) + 4:.1f}" text-anchor="end">{tick}</text>')
+    slot = plot_w / len(VERDICT_ORDER)
+    for i, (verdict, value) in enumerate(zip(VERDICT_ORDER, values)):
+        x = left + i * slot + slot * 0.1
+        out.append(f'<rect x="{x:.1f}" y="{y(value):.1f}" width="{slot * 0.8:.1f}" height="{plot_h - (y(value) - top):.1f}" fill="{VERDICT_COLORS[verdict]}"><title>{verdict}: {value}</title></rect>')
+        out.append(f'<text x="{x + slot * 0.4:.1f}" y="{y(value) - 4:.1f}" text-anchor="middle" font-size="11">{value}</text>')
+        out.append(f'<text x="{x + slot * 0.4:.1f}" y="{top + plot_h + 18}" text-anchor="middle">{verdict}</text>')
+    out.append(f'<rect x="{left}" y="{top}" width="{plot_w}" height="{plot_h}" fill="none" stroke="#000"/>')
+    out.append("</svg>")
+    return "\n".join(out)
+
+def svg_floor_chart(floor_counts: Dict[str, Dict[str, int]], title: str = "Verdicts per floor") -> str:
+    """Horizontal stacked bars, one per floor, split by verdict."""
+    row_h, label_w, bar_w, top = 26, 160, 400, 56
+    floors = sorted(floor_counts)
+    width, height = label_w + bar_w + 60, top + row_h * max(1, len(floors)) + 10
+    longest = max([sum(c.values()) for c in floor_counts.values()] or [1])
+
+    out = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" viewBox="0 0 {width} {height}" {FONT} font-size="12">',
+           f'<rect width="{width}" height="{height}" fill="#ffffff"/>',
+           f'<text x="{width / 2}" y="20" text-anchor="middle" font-size="15">{esc(title)}</text>']
+    x = label_w
+    for verdict in VERDICT_ORDER:
+        out.append(f'<rect x="{x}" y="30" width="10" height="10" fill="{VERDICT_COLORS[verdict]}"/>')
+        out.append(f'<text x="{x + 14}" y="39" font-size="11">{verdict}</text>')
+        x += 14 + 7 * len(verdict) + 16
+    for row, floor in enumerate(floors):
+        y = top + row * row_h
+        counts = floor_counts[floor]
+        out.append(f'<text x="{label_w - 8}" y="{y + row_h / 2 + 4}" text-anchor="end">{esc(floor)}</text>')
+        x = float(label_w)
+        for verdict in VERDICT_ORDER:
+            n = counts.get(verdict, 0)
+            if not n:
+                continue
+            w = bar_w * n / longest
+            out.append(f'<rect x="{x:.1f}" y="{y + 4}" width="{w:.1f}" height="{row_h - 8}" fill="{VERDICT_COLORS[verdict]}"><title>{esc(floor)} {verdict}: {n}</title></rect>')
+            if w >= 18:
+                out.append(f'<text x="{x + w / 2:.1f}" y="{y + row_h / 2 + 4}" text-anchor="middle" font-size="11" fill="#fff">{n}</text>')
+            x += w
+        out.append(f'<text x="{x + 6:.1f}" y="{y + row_h / 2 + 4}" font-size="11">{sum(counts.values())}</text>')
+    out.append("</svg>")
+    return "\n".join(out)
+
+def write_svg(svg: str, out_path: Path) -> Path:
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    out_path.write_text(svg, encoding="utf-8")
+    return out_path
+
+# ===========================
+# HTML REPORT SINK
+# ===========================
+
+HTML_STYLE = """
+body { font-family: Arial, sans-serif; margin: 2em; color: #222; }
+table { border-collapse: collapse; margin: 1em 0; }
+th, td { border: 1px solid #ccc; padding: 3px 8px; text-align: left; font-size: 13px; }
+th { background: #f0f0f0; }
+.v { color: #fff; padding: 1px 6px; border-radius: 3px; font-size: 12px; }
+.PASS { background: #2ca02c; } .FAIL { background: #d62728; }
+.UNKNOWN { background: #ff7f0e; } .NOT_APPLICABLE { background: #7f7f7f; }
+section { border-top: 1px solid #ddd; padding: 0.4em 0; }
+section h3 { margin: 0.3em 0; font-size: 15px; }
+.charts svg { margin-right: 2em; vertical-align: top; }
+"""
+
+class HtmlReportSink:
+    """Self-contained HTML report; the overview rows and the per-space sections are spooled to disk."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.rows = tempfile.TemporaryFile("w+", encoding="utf-8", dir=path.parent)
+        self.sections = tempfile.TemporaryFile("w+", encoding="utf-8", dir=path.parent)
+        self.floor_counts: Dict[str, Dict[str, int]] = {}
+        self.count = 0
+
+    def write(self, d: Dict[str, Any]):
+        self.count += 1
+        anchor = f"space-{self.count}"
+        verdict = d["verdict"]
+        floor = d.get("floor") or NO_FLOOR
+        counts = self.floor_counts.setdefault(floor, {})
+        counts[verdict] = counts.get(verdict, 0) + 1
+
+        self.rows.write(f'<tr><td><a href="#{anchor}">{esc(d["space_id"])}</a></td><td>{esc(d.get("title"))}</td><td>{esc(floor)}</td>'
+                        f'<td>{d["n_desks"]}</td><td>{esc(d["n_doors_reported"])}</td><td>{esc(d["total_door_width_cm_reported"])}</td>'
+                        f'<td><span class="v {verdict}">{verdict}</span></td></tr>\n')
+        reasons = "".join(f"<li>{esc(r)}</li>" for r in d["reasons"])
+        self.sections.write(f'<section id="{anchor}"><h3>{esc(d["space_id"])} ({esc(d.get("title"))}) <span class="v {verdict}">{verdict}</span></h3>\n'
+                            f'<p>Floor: {esc(d["floor"])}, Area: {esc(d["area_m2"])}, Height: {esc(d["height_m"])} | '
+                            f'Desks: {d["n_desks"]} | Doors reported: {esc(d["n_doors_reported"])} | Total door width (cm): {esc(d["total_door_width_cm_reported"])} | '
+                            f'Desk-to-door ratio (cm): {esc(d["desk_to_door_ratio_cm"])}</p>\n'
+                            f'<ul>{reasons}</ul>\n<p><b>Statement:</b> {esc(d.get("fire_route_statement"))}</p></section>\n')
+
+    def close(self, summary: Dict[str, Any]):
+        totals = summary["totals"]
+        counts = {"PASS": totals["spaces_pass"], "FAIL": totals["spaces_fail"],
+                  "UNKNOWN": totals["spaces_unknown"], "NOT_APPLICABLE": totals["spaces_not_applicable"]}
+        with self.path.open("w", encoding="utf-8") as f:
+            f.write(f'<!DOCTYPE html>\n<html lang="en"><head><meta charset="utf-8">\n'
+                    f'<title>All-spaces accessibility to fire route {esc(summary["ts"])}</title>\n<style>{HTML_STYLE}</style></head><body>\n')
+            f.write(f'<h1>All-spaces accessibility to fire route</h1>\n<p>Generated: {esc(summary["ts"])}<br>'
+                    f'Source: {esc(summary["source_path"])}<br>Reference analysis: {esc(summary["analysis_path"])}</p>\n')
+            if summary["warnings"]:
+                f.write("<h2>Notes / parsing warnings</h2>\n<ul>" + "".join(f"<li>{esc(w)}</li>" for w in summary["warnings"]) + "</ul>\n")
+
+            f.write("<h2>Summary</h2>\n<table>\n")
+            for label, value in (("Spaces scanned", totals["spaces_scanned"]), ("Spaces with desks", totals["spaces_with_desks"]),
+                                 ("Total desks (sum)", totals["desks_total"]), ("Total occupants (based on desks)", totals["occupants_total"]),
+                                 (f"BR18 minimum total door width required ({summary['cm_per_occupant']:.1f} cm per occupant)", f"{totals['br18_min_total_door_width_cm']:.1f} cm"),
+                                 ("PASS / FAIL / UNKNOWN", f"{totals['spaces_pass']} / {totals['spaces_fail']} / {totals['spaces_unknown']}")):
+                f.write(f"<tr><th>{esc(label)}</th><td>{esc(value)}</td></tr>\n")
+            f.write("</table>\n")
+
+            f.write('<div class="charts">\n' + svg_verdict_chart(counts) + "\n" + svg_floor_chart(self.floor_counts) + "\n</div>\n")
+            f.write("<h2>Per floor</h2>\n<table>\n<tr><th>Floor</th>" + "".join(f"<th>{v}</th>" for v in VERDICT_ORDER) + "<th>Total</th></tr>\n")
+            for floor in sorted(self.floor_counts):
+                c = self.floor_counts[floor]
+                f.write(f"<tr><td>{esc(floor)}</td>" + "".join(f"<td>{c.get(v, 0)}</td>" for v in VERDICT_ORDER) + f"<td>{sum(c.values())}</td></tr>\n")
+            f.write("</table>\n")
+
+            f.write("<h2>Spaces</h2>\n<table>\n<tr><th>Space</th><th>Title</th><th>Floor</th><th>Desks</th><th>Doors</th><th>Door width (cm)</th><th>Verdict</th></tr>\n")
+            for spool in (self.rows, self.sections):
+                spool.seek(0)
+            shutil.copyfileobj(self.rows, f)
+            f.write("</table>\n<h2>Per-space details</h2>\n")
+            shutil.copyfileobj(self.sections, f)
+            self.rows.close()
+            self.sections.close()
+
+            if summary["desks_outside"]:
+                f.write("<h2>Desks not in any IfcSpace</h2>\n<ul>")
+                for item in summary["desks_outside"]:
+                    assigned = f" &rarr; space {esc(item['assigned_to'])} ({esc(item.get('assigned_by'))}, {esc(item.get('distance_m'))} m)" \
+                        if item.get("assigned_to") else ""
+                    f.write(f"<li>Desk: {esc(item.get('desk'))} GlobalId: {esc(item.get('globalid'))}{assigned}</li>")
+                f.write("</ul>\n")
+            f.write("</body></html>\n")
+
+    def floor_chart(self) -> str:
+        return svg_floor_chart(self.floor_counts)
@@ -0,0 +1,385 @@
+"""
+================================================================================
+LOCAL QUERY SERVICE (HTTP/JSON) FOR THE A3 MANAGER SCRIPT
+================================================================================
+
+PURPOSE:
+
+Keeps the parsed space records and their verdicts in memory and answers
+questions such as "what is the verdict of space X and why?" over HTTP, so
+dashboards and model-checker plugins do not have to run main.py for every
+question. The inputs are polled and reloaded when they change: the text
+reports incrementally (see watch.IncrementalReport), an IFC model by
+re-reading it. One asyncio event loop serves all connections (keep-alive
+supported); answers are cached until the next reload.
+
+ENDPOINTS (JSON):
+
+ GET  /summary               totals, loaded timestamp, version, inputs
+ GET  /spaces                [?verdict=FAIL][&floor=Level 3]  space id, title, floor, verdict
+ GET  /spaces/<id>           one space, same fields as the JSON report's "details"
+                             (a number also finds "Name:<number>" ids)
+ GET  /floors                verdict and desk counts per floor
+ GET  /floors/<name>         one floor's counts and its spaces (id, title, verdict)
+ GET  /desks-outside         desks not in any IfcSpace
+ GET  /health                {"status": "ok", "version", "spaces"}
+ POST /reload                check the inputs now; returns the change (if any)
+
+USAGE:
+
+    python A3/serve.py [--desks FILE] [--analysis FILE] [--port 8765] [--interval SECONDS]
+    python A3/serve.py --ifc model.ifc [--analysis FILE] [--port 8765]
+
+ Binds to 127.0.0.1 unless --host is given.
+
+================================================================================
+"""
+
+# ===========================
+# IMPORTS
+# ===========================
+
+from pathlib import Path
+import argparse
+import asyncio
+import json
+import time
+from http import HTTPStatus
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import urlsplit, unquote, parse_qs
+
+import main
+import render
+import watch
+
+# ===========================
+# CONSTANTS
+# ===========================
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+POLL_INTERVAL_S = 1.0
+KEEPALIVE_TIMEOUT_S = 30.0
+RESPONSE_CACHE_SIZE = 4096   # cached answers per version; cleared when full
+MAX_BODY_BYTES = 64 * 1024   # larger request bodies are refused (413)
+
+# ===========================
+# IFC MODEL STATE
+# ===========================
+
+class IfcReport(watch.IncrementalReport):
+    """
+    IncrementalReport over an IFC model instead of the GRP02 text report. Space
+    records and fire routes come from the model, so a change to either file
+    re-decides every space.
+    """
+
+    def __init__(self, ifc_path: Path, analysis_path: Path,
+                 door_cm_per_desk: Optional[float] = None, cm_per_occupant: Optional[float] = None):
+        super().__init__(ifc_path, analysis_path, door_cm_per_desk, cm_per_occupant)
+        self.ifc: Optional[Dict[str, Any]] = None
+
+    def add_routes(self):
+        if self.ifc is not None:
+            self.analysis["routes"], _ = main.load_ifc_routes(self.desks_path, self.analysis, self.ifc)
+
+    def reload_desks(self) -> set:
+        self.stamps[self.desks_path] = watch.file_stamp(self.desks_path)
+        self.ifc = main.open_ifc(self.desks_path)
+        spaces, self.desks_outside, _ = main.load_ifc_spaces(self.desks_path, self.ifc)
+        dirty = set(self.spaces) | set(spaces)
+        self.spaces = spaces
+        self.add_routes()
+        return dirty
+
+    def reload_analysis(self) -> set:
+        self.stamps[self.analysis_path] = watch.file_stamp(self.analysis_path)
+        self.analysis, _ = main.parse_analysis_summary(self.analysis_path)
+        self.add_routes()
+        return set(self.spaces)
+
+# ===========================
+# QUERIES
+# ===========================
+
+class Snapshot:
+    """
+    One version of the report as it is served: the verdicts, totals and floor
+    index, copied out of the report during a reload. Its data never changes;
+    only the number index and the answer cache are filled in lazily.
+    """
+
+    def __init__(self, report: watch.IncrementalReport, version: int = 0, loaded: Optional[str] = None):
+        self.version = version
+        self.loaded = loaded
+        self.evaluated: Dict[str, Tuple[main.SpaceRecord, main.SpaceVerdict]] = dict(report.evaluated)
+        self.totals = report.aggregate()
+        self.desks_outside = list(report.desks_outside)
+        self.desks_path, self.analysis_path = str(report.desks_path), str(report.analysis_path)
+        self.cache: Dict[Tuple[str, str], Tuple[int, bytes]] = {}
+        self.by_number: Optional[Dict[str, Optional[str]]] = None
+        self.by_floor: Dict[str, List[str]] = {}
+        self.floor_totals: Dict[str, Dict[str, int]] = {}
+        self.index_floors()
+
+    # ---------- INDEXES ----------
+
+    def lookup(self, sid: str) -> Optional[str]:
+        if sid in self.evaluated:
+            return sid
+        if self.by_number is None:
+            by_number: Dict[str, Optional[str]] = {}
+            for key in self.evaluated:
+                for number in main.ID_DIGITS_RE.findall(key):
+                    by_number[number] = key if number not in by_number else None
+            self.by_number = by_number
+        return self.by_number.get(sid)
+
+    def index_floors(self):
+        """Space ids and verdict/desk counts per floor, built during the reload rather than by the first query."""
+        for sid in sorted(self.evaluated, key=str):
+            info, result = self.evaluated[sid]
+            floor = info.floor or render.NO_FLOOR
+            counts = self.floor_totals.get(floor)
+            if counts is None:
+                counts = self.floor_totals[floor] = {"spaces": 0, "desks": 0, **{v: 0 for v in render.VERDICT_ORDER}}
+                self.by_floor[floor] = []
+            self.by_floor[floor].append(sid)
+            counts["spaces"] += 1
+            counts[result.verdict] += 1
+            counts["desks"] += info.n_desks or 0
+
+    def brief(self, sid: str) -> Dict[str, Any]:
+        info, result = self.evaluated[sid]
+        return {"space_id": sid, "title": info.title, "floor": info.floor, "verdict": result.verdict}
+
+    def detail(self, sid: str) -> Dict[str, Any]:
+        info, result = self.evaluated[sid]
+        return main.space_detail(sid, info, result.verdict, result.reasons(), result.statement)
+
+    # ---------- ANSWERS ----------
+
+    def answer(self, target: str) -> Tuple[int, bytes]:
+        """(HTTP status, JSON body) for one GET; cached for the life of this version."""
+        hit = self.cache.get(("GET", target))
+        if hit is None:
+            hit = encode(*self.get(target))
+            if len(self.cache) >= RESPONSE_CACHE_SIZE:
+                self.cache.clear()
+            self.cache[("GET", target)] = hit
+        return hit
+
+    def get(self, target: str) -> Tuple[int, Any]:
+        url = urlsplit(target)
+        parts = [unquote(p) for p in url.path.split("/") if p]
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        evaluated = self.evaluated
+
+        if parts == ["health"]:
+            return HTTPStatus.OK, {"status": "ok", "version": self.version, "spaces": len(evaluated)}
+        if parts in ([], ["summary"]):
+            return HTTPStatus.OK, {"loaded": self.loaded, "version": self.version, "totals": self.totals,
+                                   "desks_path": self.desks_path, "analysis_path": self.analysis_path,
+                                   "desks_outside": len(self.desks_outside)}
+        if parts == ["spaces"]:
+            verdict, floor = params.get("verdict"), params.get("floor")
+            sids = self.by_floor.get(floor, []) if floor is not None else sorted(evaluated, key=str)
+            if verdict is not None:
+                sids = [sid for sid in sids if evaluated[sid][1].verdict == verdict.upper()]
+            return HTTPStatus.OK, {"version": self.version, "count": len(sids), "spaces": [self.brief(sid) for sid in sids]}
+        if len(parts) == 2 and parts[0] == "spaces":
+            sid = self.lookup(parts[1])
+            if sid is None:
+                return HTTPStatus.NOT_FOUND, {"error": f"space {parts[1]} not found"}
+            return HTTPStatus.OK, {"version": self.version, **self.detail(sid)}
+        if parts == ["floors"]:
+            return HTTPStatus.OK, {"version": self.version,
+                                   "floors": self.floor_totals}
+        if len(parts) == 2 and parts[0] == "floors":
+            sids = self.by_floor.get(parts[1])
+            if sids is None:
+                return HTTPStatus.NOT_FOUND, {"error": f"floor {parts[1]} not found"}
+            return HTTPStatus.OK, {"version": self.version, "floor": parts[1], "counts": self.floor_totals[parts[1]],
+                                   "spaces": [self.brief(sid) for sid in sids]}
+        if parts == ["desks-outside"]:
+            return HTTPStatus.OK, {"version": self.version, "desks_outside": self.desks_outside}
+        return HTTPStatus.NOT_FOUND, {"error": "not found"}
+
+class QueryState:
+    """
+    The report and the snapshot being served. A reload runs in a worker thread
+    (the report is only touched there, one reload at a time) and builds a new
+    snapshot; the event loop then swaps it in, so queries never wait for a
+    reload and never see a half-updated version.
+    """
+
+    def __init__(self, report: watch.IncrementalReport):
+        self.report = report
+        self.snapshot = Snapshot(report)
+        self.reloading: Optional[asyncio.Lock] = None
+
+    @property
+    def version(self) -> int:
+        return self.snapshot.version
+
+    def rebuild(self) -> Optional[Tuple[Dict[str, Any], Snapshot]]:
+        """Runs in the worker thread: reloads changed inputs and snapshots the result (None when nothing changed)."""
+        delta = self.report.refresh()
+        if delta is None:
+            return None
+        return delta, Snapshot(self.report, self.snapshot.version + 1, delta["generated"])
+
+    async def reload(self) -> Optional[Dict[str, Any]]:
+        """Reloads off the event loop and swaps in the new snapshot; the old one keeps answering meanwhile."""
+        if self.reloading is None:
+            self.reloading = asyncio.Lock()
+        async with self.reloading:
+            built = await asyncio.get_running_loop().run_in_executor(None, self.rebuild)
+            if built is None:
+                return None
+            delta, self.snapshot = built
+            return delta
+
+    async def answer(self, method: str, target: str) -> Tuple[int, bytes]:
+        """(HTTP status, JSON body) for one request."""
+        if method == "POST":
+            if urlsplit(target).path.rstrip("/") != "/reload":
+                return encode(HTTPStatus.NOT_FOUND, {"error": "not found"})
+            delta = await self.reload()
+            return encode(HTTPStatus.OK, {"changed": delta is not None, "version": self.version, "delta": delta})
+        if method not in ("GET", "HEAD"):
+            return encode(HTTPStatus.METHOD_NOT_ALLOWED, {"error": f"method {method} not allowed"})
+        return self.snapshot.answer(target)
+
+def encode(status: int, body: Any) -> Tuple[int, bytes]:
+    return int(status), json.dumps(body, ensure_ascii=False, default=str).encode("utf-8")
+
+# ===========================
+# HTTP
+# ===========================
+
+def http_response(status: int, body: bytes, keep_alive: bool, head_only: bool = False) -> bytes:
+    head = (f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode("latin-1") + (b"" if head_only else body)
+
+def body_length(headers: Dict[str, str]) -> Tuple[Optional[int], Optional[Tuple[int, bytes]]]:
+    """(length of the request body, None), or (None, error answer) when it cannot or should not be read."""
+    if "transfer-encoding" in headers:
+        return None, encode(HTTPStatus.BAD_REQUEST, {"error": "Transfer-Encoding is not supported"})
+    value = headers.get("content-length", "0")
+    if not value.isdigit():
+        return None, encode(HTTPStatus.BAD_REQUEST, {"error": f"bad Content-Length: {value!r}"})
+    length = int(value)
+    if length > MAX_BODY_BYTES:
+        return None, encode(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": f"request body over {MAX_BODY_BYTES} bytes"})
+    return length, None
+
+async def handle_client(state: QueryState, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """Answers requests on one connection until the client closes it, asks to, or stays idle too long."""
+    try:
+        while True:
+            try:
+                head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEPALIVE_TIMEOUT_S)
+            except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                break
+            except asyncio.LimitOverrunError:
+                writer.write(http_response(*encode(HTTPStatus.BAD_REQUEST, {"error": "request head too large"}), False))
+                break
+            request_line, *header_lines = head.decode("latin-1").split("\r\n")
+            try:
+                method, target, version = request_line.split(" ")
+            except ValueError:
+                writer.write(http_response(*encode(HTTPStatus.BAD_REQUEST, {"error": "bad request line"}), False))
+                break
+            headers = {}
+            for line in header_lines:
+                name, _, value = line.partition(":")
+                if name:
+                    headers[name.strip().lower()] = value.strip()
+            length, error = body_length(headers)
+            if error is not None:   # the body cannot be skipped, so the connection is closed after the answer
+                writer.write(http_response(*error, False))
+                break
+            if length:
+                await reader.readexactly(length)   # request bodies are not used
+            keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+            try:
+                status, body = await state.answer(method.upper(), target)
+            except Exception as e:
+                status, body = encode(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"{type(e).__name__}: {e}"})
+            writer.write(http_response(status, body, keep_alive, method.upper() == "HEAD"))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+async def reload_loop(state: QueryState, interval: float):
+    """Polls the inputs; a failed reload keeps serving the last good snapshot."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            delta = await state.reload()
+        except Exception as e:
+            print(f"Reload failed, still serving version {state.version}:", e)
+            continue
+        if delta is not None:
+            t = delta["totals"]
+            print(f"[{delta['generated']}] reloaded ({delta['reevaluated']} space(s) re-decided in {delta['seconds'] * 1000:.1f} ms) "
+                  f"-> version {state.version}: PASS {t['spaces_pass']}  FAIL {t['spaces_fail']}  UNKNOWN {t['spaces_unknown']}")
+
+async def serve(state: QueryState, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, interval: float = POLL_INTERVAL_S,
+                started: Optional[asyncio.Future] = None):
+    """Loads the inputs, then serves until cancelled. started (if given) gets the bound (host, port)."""
+    t0 = time.perf_counter()
+    for path in (state.report.desks_path, state.report.analysis_path):
+        if not path.is_file():
+            raise FileNotFoundError(path)
+    await state.reload()
+    server = await asyncio.start_server(lambda r, w: handle_client(state, r, w), host, port)
+    bound = server.sockets[0].getsockname()[:2]
+    t = state.snapshot.totals
+    print(f"Loaded {t['spaces_scanned']} space(s) in {time.perf_counter() - t0:.2f} s — PASS: {t['spaces_pass']}  "
+          f"FAIL: {t['spaces_fail']}  UNKNOWN: {t['spaces_unknown']}")
+    print(f"Serving on http://{bound[0]}:{bound[1]}/ (Ctrl+C to stop)")
+    if started is not None:
+        started.set_result(bound)
+    async with server:
+        await asyncio.gather(server.serve_forever(), reload_loop(state, interval))
+
+# ===========================
+# MAIN / CLI
+# ===========================
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Serve A3 space verdicts over local HTTP/JSON, reloading when the inputs change.")
+    parser.add_argument("--desks", type=Path, default=main.DESK_TXT, help="GRP02 desk report (TXT)")
+    parser.add_argument("--analysis", type=Path, default=main.ANALYSIS_SUMMARY_TXT, help="GRP04 analysis_summary (TXT)")
+    parser.add_argument("--ifc", type=Path, default=None, help="read spaces from this IFC model instead of --desks (with fire routes)")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"address to bind (default {DEFAULT_HOST}, local only)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port (0 = any free port)")
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL_S, help="seconds between input file checks")
+    parser.add_argument("--door-cm-per-desk", type=float, default=None)
+    parser.add_argument("--cm-per-occupant", type=float, default=None)
+    args = parser.parse_args()
+
+    if args.ifc is not None:
+        report = IfcReport(args.ifc, args.analysis, args.door_cm_per_desk, args.cm_per_occupant)
+    else:
+        report = watch.IncrementalReport(args.desks, args.analysis, args.door_cm_per_desk, args.cm_per_occupant)
+    try:
+        asyncio.run(serve(QueryState(report), args.host, args.port, args.interval))
+    except FileNotFoundError as e:
+        print("Input file not found:", e)
+    except RuntimeError as e:
+        print("Error:", e)
+    except KeyboardInterrupt:
+        print("\nStopped.")
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,139 @@
+"""
+================================================================================
+SPATIAL INDEX OF SPACE FOOTPRINTS (UNIFORM GRID PER STOREY)
+================================================================================
+
+PURPOSE:
+
+Finds the space that contains a point (a desk placement), or the nearest
+space within a tolerance, without testing every space: each storey's space
+footprints are bucketed in a uniform grid, and a lookup only tests the
+footprints in the point's cell (and in the cells within the tolerance).
+
+Footprints are 2D polygons in metres; reading them from the IFC model is
+done in main.py (see main.assign_orphan_desks). Only the standard library is
+used.
+
+================================================================================
+"""
+
+# ===========================
+# IMPORTS
+# ===========================
+
+import math
+from typing import Dict, Any, List, Tuple, Optional, Hashable
+
+Point = Tuple[float, float]
+
+# ===========================
+# CONSTANTS
+# ===========================
+
+MIN_CELL_M = 1.0   # grid cells are never smaller than this, whatever the room sizes
+
+# ===========================
+# POLYGON HELPERS
+# ===========================
+
+def polygon_area(poly: List[Point]) -> float:
+    return abs(sum(x0 * y1 - x1 * y0 for (x0, y0), (x1, y1) in zip(poly, poly[1:] + poly[:1]))) / 2.0
+
+def point_in_polygon(x: float, y: float, poly: List[Point]) -> bool:
+    """Even-odd ray casting; points on an edge may fall either way (the nearest-space pass covers them)."""
+    inside = False
+    x0, y0 = poly[-1]
+    for x1, y1 in poly:
+        if (y1 > y) != (y0 > y) and x < x0 + (y - y0) * (x1 - x0) / (y1 - y0):
+            inside = not inside
+        x0, y0 = x1, y1
+    return inside
+
+def distance_to_polygon(x: float, y: float, poly: List[Point]) -> float:
+    """Distance from the point to the polygon's outline."""
+    best = math.inf
+    x0, y0 = poly[-1]
+    for x1, y1 in poly:
+        dx, dy = x1 - x0, y1 - y0
+        length2 = dx * dx + dy * dy
+        t = 0.0 if length2 == 0 else max(0.0, min(1.0, ((x - x0) * dx + (y - y0) * dy) / length2))
+        best = min(best, math.hypot(x - (x0 + t * dx), y - (y0 + t * dy)))
+        x0, y0 = x1, y1
+    return best
+
+# ===========================
+# GRID
+# ===========================
+
+class FootprintGrid:
+    """
+    Footprints of one storey in a uniform grid. Each footprint is listed in every
+    cell its bounding box overlaps; the cell size defaults to the median footprint
+    size, so a room covers a few cells and a cell holds a few rooms.
+    """
+
+    def __init__(self, footprints: List[Tuple[Hashable, List[Point]]], cell_m: Optional[float] = None, elevation: Optional[float] = None):
+        self.elevation = elevation
+        self.items: List[Tuple[Hashable, List[Point], Tuple[float, float, float, float], float]] = []
+        for key, poly in footprints:
+            if len(poly) < 3:
+                continue
+            xs, ys = [p[0] for p in poly], [p[1] for p in poly]
+            self.items.append((key, poly, (min(xs), min(ys), max(xs), max(ys)), polygon_area(poly)))
+        if cell_m is None:
+            sizes = sorted(max(b[2] - b[0], b[3] - b[1]) for _, _, b, _ in self.items)
+            cell_m = sizes[len(sizes) // 2] if sizes else MIN_CELL_M
+        self.cell = max(cell_m, MIN_CELL_M)
+        self.cells: Dict[Tuple[int, int], List[int]] = {}
+        for n, (_, _, (x0, y0, x1, y1), _) in enumerate(self.items):
+            for i in range(self.cell_of(x0), self.cell_of(x1) + 1):
+                for j in range(self.cell_of(y0), self.cell_of(y1) + 1):
+                    self.cells.setdefault((i, j), []).append(n)
+
+    def cell_of(self, v: float) -> int:
+        return math.floor(v / self.cell)
+
+    def candidates(self, x: float, y: float, rings: int) -> List[int]:
+        ci, cj = self.cell_of(x), self.cell_of(y)
+        found = set()
+        for i in range(ci - rings, ci + rings + 1):
+            for j in range(cj - rings, cj + rings + 1):
+                found.update(self.cells.get((i, j), ()))
+        return sorted(found)
+
+    def locate(self, x: float, y: float, tolerance: float = 0.0) -> Optional[Tuple[Hashable, float]]:
+        """
+        (key, 0.0) of the footprint containing the point (the smallest one if they
+        overlap), else (key, distance) of the nearest footprint within tolerance,
+        else None.
+        """
+        containing = [n for n in self.candidates(x, y, 0)
+                      if self.items[n][2][0] <= x <= self.items[n][2][2] and self.items[n][2][1] <= y <= self.items[n][2][3]
+                      and point_in_polygon(x, y, self.items[n][1])]
+        if containing:
+            return self.items[min(containing, key=lambda n: self.items[n][3])][0], 0.0
+        if tolerance <= 0:
+            return None
+        best = None
+        for n in self.candidates(x, y, math.ceil(tolerance / self.cell)):
+            d = distance_to_polygon(x, y, self.items[n][1])
+            if d <= tolerance and (best is None or d < best[1]):
+                best = (self.items[n][0], d)
+        return best
+
+class StoreyIndex:
+    """One FootprintGrid per storey; desks are only matched against spaces of their own storey."""
+
+    def __init__(self, footprints: Dict[Any, List[Tuple[Hashable, List[Point]]]], elevations: Optional[Dict[Any, float]] = None,
+                 cell_m: Optional[float] = None):
+        elevations = elevations or {}
+        self.grids = {storey: FootprintGrid(items, cell_m, elevations.get(storey)) for storey, items in footprints.items()}
+
+    def storey_at(self, z: float) -> Any:
+        """The storey with the highest elevation at or below z (for desks not contained in a storey)."""
+        below = [(g.elevation, storey) for storey, g in self.grids.items() if g.elevation is not None and g.elevation <= z]
+        return max(below, key=lambda e: e[0])[1] if below else None
+
+    def locate(self, storey: Any, x: float, y: float, tolerance: float = 0.0) -> Optional[Tuple[Hashable, float]]:
+        grid = self.grids.get(storey)
+        return grid.locate(x, y, tolerance) if grid is not None else None
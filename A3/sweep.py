@@ -0,0 +1,261 @@
+"""
+================================================================================
+VECTORIZED VERDICTS AND BR18 THRESHOLD WHAT-IF SWEEPS
+================================================================================
+
+PURPOSE:
+
+main.decide_verdict evaluates one space dict at a time. This module holds the
+desk counts, door counts and door widths of all spaces in NumPy columns and
+computes the same verdicts in bulk, for one threshold or for a whole grid of
+DOOR_CM_PER_DESK values at once. For every threshold the sweep reports the
+PASS/FAIL/UNKNOWN/NOT_APPLICABLE counts and which spaces flip compared with
+the current default.
+
+The building-level BR18 check (total reported door width against desks x
+BR18_CM_PER_OCCUPANT) is swept the same way: for every cm-per-occupant value
+the sweep reports the required total width and the project verdict
+(portfolio.project_verdict) at each per-desk threshold.
+
+At the default threshold the verdicts are identical to main.decide_verdict.
+Without NumPy the sweep falls back to calling main.evaluate_space per space.
+
+OUTPUT FILES:
+
+ - A3/Results/threshold_sweep_<timestamp>.json
+
+USAGE:
+
+    python A3/sweep.py --thresholds 0.5:3:0.25
+    python A3/sweep.py --thresholds 0.8,1,1.2,1.5 [--desks FILE | --ifc FILE] [--analysis FILE]
+    python A3/sweep.py --thresholds 0.8,1,1.5 --occupant-thresholds 0.8:1.5:0.1
+
+================================================================================
+"""
+
+# ===========================
+# IMPORTS
+# ===========================
+
+from pathlib import Path
+import argparse
+import json
+from typing import Dict, Any, List, Optional
+
+import main
+import portfolio
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except Exception:
+    NUMPY_AVAILABLE = False
+
+# ===========================
+# CONSTANTS
+# ===========================
+
+VERDICTS = ("PASS", "FAIL", "UNKNOWN", "NOT_APPLICABLE")
+PASS, FAIL, UNKNOWN, NOT_APPLICABLE = range(4)
+SWEEP_CHUNK_CELLS = 20_000_000   # thresholds x spaces evaluated per broadcast chunk
+
+# ===========================
+# COLUMNAR SPACE DATA
+# ===========================
+
+def space_columns(parsed_spaces: Dict[str, main.SpaceRecord]) -> Dict[str, Any]:
+    """
+    Space records -> columns:
+     - "ids":        space ids (list, same order as the arrays)
+     - "n_desks":    int64
+     - "n_doors":    int64, -1 where not reported
+     - "total_door": float64 cm, NaN where not reported
+    """
+    ids = list(parsed_spaces)
+    recs = [parsed_spaces[sid] for sid in ids]
+    n_doors = [r.get("n_doors_reported") for r in recs]
+    total = [r.get("total_door_width_cm_reported") for r in recs]
+    return {
+        "ids": ids,
+        "n_desks": np.fromiter(((r.get("n_desks") or 0) for r in recs), dtype=np.int64, count=len(recs)),
+        "n_doors": np.fromiter((-1 if d is None else d for d in n_doors), dtype=np.int64, count=len(recs)),
+        "total_door": np.fromiter((np.nan if t is None else t for t in total), dtype=np.float64, count=len(recs)),
+    }
+
+def columnar_verdicts(cols: Dict[str, Any], door_cm_per_desk: float) -> "np.ndarray":
+    """
+    Verdict code per space (index into VERDICTS); same decision table as main.decide_verdict:
+     - no desks                     -> NOT_APPLICABLE
+     - door width reported          -> PASS if width >= desks * door_cm_per_desk else FAIL
+     - no width, doors reported > 0 -> PASS
+     - no width, 0 doors reported   -> FAIL
+     - nothing reported             -> UNKNOWN
+    """
+    return verdict_grid(cols, np.array([door_cm_per_desk], dtype=np.float64))[0]
+
+def verdict_grid(cols: Dict[str, Any], thresholds: "np.ndarray") -> "np.ndarray":
+    """Verdict codes for every (threshold, space) pair, shape (len(thresholds), n_spaces)."""
+    n = cols["n_desks"]
+    total = cols["total_door"]
+    n_doors = cols["n_doors"]
+    has_total = ~np.isnan(total)
+
+    # threshold-independent part
+    base = np.full(n.shape, UNKNOWN, dtype=np.int8)
+    base[n_doors > 0] = PASS
+    base[n_doors == 0] = FAIL
+    no_desks = n == 0
+
+    grid = np.empty((len(thresholds), len(n)), dtype=np.int8)
+    rows = max(1, SWEEP_CHUNK_CELLS // max(1, len(n)))
+    for start in range(0, len(thresholds), rows):
+        t = thresholds[start:start + rows, None]
+        ok = total[None, :] >= n[None, :] * t    # NaN compares False, masked out below
+        chunk = np.where(has_total[None, :], np.where(ok, PASS, FAIL), base[None, :]).astype(np.int8)
+        chunk[:, no_desks] = NOT_APPLICABLE
+        grid[start:start + rows] = chunk
+    return grid
+
+# ===========================
+# SWEEP
+# ===========================
+
+def summarize(ids: List[str], codes, default_codes, threshold: float) -> Dict[str, Any]:
+    """Counts per verdict and the spaces whose verdict differs from default_codes."""
+    if NUMPY_AVAILABLE and isinstance(codes, np.ndarray):
+        counts = dict(zip(VERDICTS, np.bincount(codes, minlength=len(VERDICTS)).tolist()))
+        changed = codes != default_codes
+        to_fail = [ids[i] for i in np.flatnonzero(changed & (codes == FAIL))]
+        to_pass = [ids[i] for i in np.flatnonzero(changed & (codes == PASS))]
+    else:
+        counts = {v: 0 for v in VERDICTS}
+        to_fail, to_pass = [], []
+        for sid, c, d in zip(ids, codes, default_codes):
+            counts[VERDICTS[c]] += 1
+            if c != d and c == FAIL:
+                to_fail.append(sid)
+            elif c != d and c == PASS:
+                to_pass.append(sid)
+    return {"door_cm_per_desk": threshold, "counts": counts,
+            "flipped_to_fail": sorted(to_fail), "flipped_to_pass": sorted(to_pass)}
+
+def building_totals(parsed_spaces: Dict[str, main.SpaceRecord]) -> Dict[str, Any]:
+    """Desks and reported door width summed over all spaces, as in the report totals."""
+    desks = sum((rec.get("n_desks") or 0) for rec in parsed_spaces.values())
+    width = sum((rec.get("total_door_width_cm_reported") or 0.0) for rec in parsed_spaces.values())
+    return {"desks_total": desks, "door_width_reported_total_cm": round(width, 1)}
+
+def sweep_occupant_thresholds(building: Dict[str, Any], door_rows: List[Dict[str, Any]],
+                              occupant_thresholds: List[float]) -> List[Dict[str, Any]]:
+    """
+    Building-level BR18 minimum and project verdict for every cm-per-occupant value;
+    the project verdict is given for every per-desk row in door_rows.
+    """
+    out = []
+    for t in occupant_thresholds:
+        required = round(building["desks_total"] * t, 1)
+        verdicts = []
+        for row in door_rows:
+            totals = {"spaces_fail": row["counts"]["FAIL"], "spaces_unknown": row["counts"]["UNKNOWN"],
+                      "door_width_reported_total_cm": building["door_width_reported_total_cm"],
+                      "br18_min_total_door_width_cm": required}
+            verdicts.append({"door_cm_per_desk": row["door_cm_per_desk"], "project_verdict": portfolio.project_verdict(totals)})
+        out.append({"cm_per_occupant": t, "br18_min_total_door_width_cm": required,
+                    "building_ok": building["door_width_reported_total_cm"] >= required, "project_verdicts": verdicts})
+    return out
+
+def sweep_thresholds(parsed_spaces: Dict[str, main.SpaceRecord], analysis: Dict[str, Any], thresholds: List[float],
+                     default: Optional[float] = None, occupant_thresholds: Optional[List[float]] = None,
+                     default_occupant: Optional[float] = None) -> Dict[str, Any]:
+    """
+    PASS/FAIL counts and flipped spaces (vs. the default threshold) for every per-desk
+    threshold in one pass, and the building-level check for every cm-per-occupant value
+    (the default one always included).
+    """
+    default = main.DOOR_CM_PER_DESK if default is None else default
+    default_occupant = main.BR18_CM_PER_OCCUPANT if default_occupant is None else default_occupant
+    grid_values = [default] + [float(t) for t in thresholds]
+
+    if NUMPY_AVAILABLE:
+        cols = space_columns(parsed_spaces)
+        ids = cols["ids"]
+        grid = verdict_grid(cols, np.asarray(grid_values, dtype=np.float64))
+        engine = "numpy"
+    else:
+        ids = list(parsed_spaces)
+        code = {v: i for i, v in enumerate(VERDICTS)}
+        grid = [[code[main.evaluate_space(parsed_spaces[sid], analysis, t).verdict] for sid in ids] for t in grid_values]
+        engine = "python"
+
+    default_codes = grid[0]
+    default_row = summarize(ids, default_codes, default_codes, default)
+    rows = [summarize(ids, codes, default_codes, t) for t, codes in zip(grid_values[1:], grid[1:])]
+    building = building_totals(parsed_spaces)
+    occupant_rows = sweep_occupant_thresholds(building, [default_row] + rows,
+                                              [default_occupant] + [float(t) for t in occupant_thresholds or ()])
+    return {
+        "engine": engine,
+        "spaces": len(ids),
+        "default_door_cm_per_desk": default,
+        "default_cm_per_occupant": default_occupant,
+        "building": building,
+        "default": default_row,
+        "sweep": rows,
+        "default_occupant": occupant_rows[0],
+        "occupant_sweep": occupant_rows[1:],
+    }
+
+def parse_thresholds(text: str) -> List[float]:
+    """'0.8,1,1.5' or 'start:stop:step' (stop inclusive)."""
+    if ":" in text:
+        start, stop, step = (float(x) for x in text.split(":"))
+        out, i = [], 0
+        while start + i * step <= stop + 1e-9:
+            out.append(round(start + i * step, 10))
+            i += 1
+        return out
+    return [float(x) for x in text.split(",") if x.strip()]
+
+# ===========================
+# MAIN / CLI
+# ===========================
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="What-if sweep of the per-desk and building-level BR18 door width thresholds.")
+    parser.add_argument("--thresholds", default="", help="cm per desk: '0.8,1,1.5' or 'start:stop:step'")
+    parser.add_argument("--occupant-thresholds", default="", help="cm per occupant (building level), same forms")
+    parser.add_argument("--desks", type=Path, default=main.DESK_TXT)
+    parser.add_argument("--analysis", type=Path, default=main.ANALYSIS_SUMMARY_TXT)
+    parser.add_argument("--ifc", type=Path, default=None)
+    args = parser.parse_args()
+    if not (args.thresholds or args.occupant_thresholds):
+        parser.error("give --thresholds and/or --occupant-thresholds")
+
+    if args.ifc is not None:
+        parsed_spaces, _, _ = main.load_ifc_spaces(args.ifc)
+    else:
+        parsed_spaces, _, _ = main.load_desk_report(args.desks)
+    analysis, _ = main.parse_analysis_summary(args.analysis)
+
+    result = sweep_thresholds(parsed_spaces, analysis, parse_thresholds(args.thresholds),
+                              occupant_thresholds=parse_thresholds(args.occupant_thresholds))
+    out = main.REPORT_DIR / f"threshold_sweep_{main.now_ts()}.json"
+    out.write_text(json.dumps(result, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    print(f"{'cm/desk':>8} {'PASS':>6} {'FAIL':>6} {'UNKNOWN':>8} {'flips':>6}")
+    for row in [result["default"]] + result["sweep"]:
+        c = row["counts"]
+        flips = len(row["flipped_to_fail"]) + len(row["flipped_to_pass"])
+        print(f"{row['door_cm_per_desk']:>8g} {c['PASS']:>6} {c['FAIL']:>6} {c['UNKNOWN']:>8} {flips:>6}")
+
+    building = result["building"]
+    print(f"\nBuilding: {building['desks_total']} desks, {building['door_width_reported_total_cm']:.1f} cm door width reported")
+    desk_values = [row["door_cm_per_desk"] for row in [result["default"]] + result["sweep"]]
+    print(f"{'cm/occ':>8} {'min cm':>10} " + " ".join(f"{t:>8g}" for t in desk_values))
+    for row in [result["default_occupant"]] + result["occupant_sweep"]:
+        verdicts = " ".join(f"{v['project_verdict']:>8}" for v in row["project_verdicts"])
+        print(f"{row['cm_per_occupant']:>8g} {row['br18_min_total_door_width_cm']:>10.1f} {verdicts}")
+    print("Sweep written:", out)
+
+if __name__ == "__main__":
+    main_cli()
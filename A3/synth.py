@@ -0,0 +1,247 @@
+"""
+================================================================================
+SYNTHETIC GRP02 DESK REPORTS AND GRP04 ANALYSIS SUMMARIES
+================================================================================
+
+PURPOSE:
+
+Writes realistic analyst input files of any size (10^2 .. 10^6 spaces) so the
+A3 pipeline can be benchmarked and stress-tested beyond the two checked-in
+files. Output is deterministic for a given seed.
+
+Spaces are generated one at a time (iter_spaces) and written as they are made;
+a writer that needs a total up front makes another pass over the same seed
+instead of keeping the spaces, so memory does not grow with the space count.
+
+DESK REPORT (same layout as A3_analyst_checks_GRP2.txt):
+
+ - preamble with the Arbejdstilsynet / BR18 guidelines and desk totals
+ - one 'Space:' block per space with desks; about 1 in 8 blocks varies from
+   the usual layout: door widths in mm, m or with a decimal comma, a
+   "Total door width external" label, missing door count / width / floor
+   lines, "N/A" values, no door lines at all, an extra unrecognised label
+ - ==== SPACES WITH NO DESKS ==== and ==== DESKS NOT IN ANY 'IfcSpace' ====
+
+ANALYSIS SUMMARY (same layout as analysis_summary_<ts>.txt):
+
+ - requirements preamble, then the tab-separated category table whose failing
+   IDs and reasons are quoted multi-line cells; about 2% of the spaces and
+   some corridor / stair elements are listed as failing, stair flights with
+   "Run a:b" suffixes
+
+USAGE:
+
+    python A3/synth.py --spaces 100000 --out DIR [--seed N]
+
+================================================================================
+"""
+
+# ===========================
+# IMPORTS
+# ===========================
+
+from pathlib import Path
+import argparse
+import random
+from typing import Dict, Any, Iterator, List
+
+# ===========================
+# CONSTANTS
+# ===========================
+
+DESK_SPACE_NAMES = ["Office", "Office", "Office", "Student space", "Meeting room", "Open office"]
+NO_DESK_SPACE_NAMES = ["Hallway", "Meeting room", "Toilets", "Elevator", "Tech", "Sofa area", "Stair", "Printer room", "Cafe kitchen"]
+FLOORS = [f"Level {i}" for i in range(0, 9)]
+NO_DESKS_SHARE = 0.6       # share of all spaces that have no desks (checked-in report: 87 of 139)
+DESKS_OUTSIDE_SHARE = 0.2  # desks outside any space, per space with desks
+VARIANT_SHARE = 0.12       # blocks that deviate from the usual layout
+FAIL_SHARE = 0.02          # spaces listed as failing in the GRP04 table
+
+DESK_PREAMBLE = """I have analysed desks in the office spaces in the ifc model.
+I have done so in accordance to 'Arbejdstilsynet' the governmental body regulating working spaces.
+Guidelines from Arbejdstilsynet:
+ - The height to the ceiling in the office space must be at least 2.5 meters.
+ - The floor area must be at least 7 m2.
+ - There must be 12 m3 of air in the work space per person.
+ - Length of desks should be 117 cm.
+ - Link to guidelines: https://regler.at.dk/at-vejledninger/arbejdspladsens-indretning-inventar-a-1-15/
+
+Also for some guidelines I have used BR18 as reference.
+ - There should at least 1 cm of door width per occupant/ per desk
+ - Link to BR18: https://bygningsreglementet.dk/
+
+"""
+
+ANALYSIS_PREAMBLE = [
+    "Requirements",
+    "- Doors: clear opening width ≥ 800 mm",
+    "- Corridors: clear width ≥ 1300 mm AND must link to a stair via a door/opening",
+    "- Stairs: clear flight width ≥ 1000 mm",
+    "- Stair flights: must be enclosed by 4 walls (left, right, top, bottom)",
+    "",
+]
+
+GLOBALID_CHARS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz_$"
+
+# ===========================
+# SPACES
+# ===========================
+
+def iter_spaces(n_spaces: int, seed: int = 0) -> Iterator[Dict[str, Any]]:
+    """
+    Plain per-space values (id, name, floor, desks, doors, door width, area, height)
+    for n_spaces spaces, one at a time; every call with the same seed yields the same spaces.
+    """
+    rng = random.Random(seed)
+    sid = 1133158
+    for _ in range(n_spaces):
+        sid += rng.randint(1, 40)
+        has_desks = rng.random() >= NO_DESKS_SHARE
+        n_doors = rng.choice((0, 1, 1, 1, 1, 2, 2, 3)) if has_desks else 0
+        yield {
+            "id": sid,
+            "name": rng.choice(DESK_SPACE_NAMES if has_desks else NO_DESK_SPACE_NAMES),
+            "floor": rng.choice(FLOORS),
+            "n_desks": rng.randint(1, 14) if has_desks else 0,
+            "n_doors": n_doors,
+            "door_width_cm": round(sum(rng.choice((78.8, 88.8, 98.8, 118.8)) for _ in range(n_doors)), 1),
+            "area": round(rng.uniform(8.0, 120.0), 2),
+            "height": rng.choice((2.5, 2.8, 2.8, 3.0, 3.2)),
+        }
+
+def space_block(s: Dict[str, Any], rng: random.Random) -> str:
+    n, width = s["n_desks"], s["door_width_cm"]
+    lines = [f"Space: {s['name']}:{s['id']}",
+             f"  - No. of desks in this space: {n}",
+             f"  - Floor: {s['floor']}",
+             f"  - Height of space: {s['height']} m",
+             f"  - Area: {s['area']} m2",
+             f"  - Volume per desk: {round(s['area'] * s['height'] / n, 2)} m3",
+             f"  - Area per desk: {round(s['area'] / n, 2)} m2",
+             "  - Length of desk: N/A mm",
+             f"  - No. of doors: {s['n_doors']}",
+             f"  - Total door width (internal): {width} cm",
+             f"  - Desk to door width ratio: {round(width / n, 1)} cm"]
+    if rng.random() < VARIANT_SHARE:
+        variant = rng.randrange(9)
+        if variant == 0:
+            lines[9] = f"  - Total door width (internal): {round(width * 10)} mm"
+        elif variant == 1:
+            lines[9] = f"  - Total door width (internal): {round(width / 100, 3)} m"
+        elif variant == 2:
+            lines[9] = f"  - Total door width (internal): {str(width).replace('.', ',')} cm"
+        elif variant == 3:
+            lines[9] = f"  - Total door width external: {width} cm"
+        elif variant == 4:
+            del lines[8]           # no door count
+        elif variant == 5:
+            del lines[9:]          # no width, no ratio
+        elif variant == 6:
+            del lines[8:]          # no door evidence at all
+        elif variant == 7:
+            lines[2] = "  - Floor: "
+            lines[8] = "  - No. of doors: N/A"
+        else:
+            lines.insert(7, f"  - Window area: {round(s['area'] / 8, 2)} m2")
+    return "\n".join(lines)
+
+def globalid(rng: random.Random) -> str:
+    return "".join(rng.choice(GLOBALID_CHARS) for _ in range(22))
+
+# ===========================
+# WRITERS (STREAMING, ONE SPACE AT A TIME)
+# ===========================
+
+def write_desk_report(path: Path, n_spaces: int, seed: int = 0) -> Path:
+    # pass 1: the totals in the preamble; passes 2 and 3: the two sections
+    n_with_desks = desks_total = 0
+    last_id = None
+    for s in iter_spaces(n_spaces, seed):
+        if s["n_desks"]:
+            n_with_desks += 1
+            desks_total += s["n_desks"]
+        last_id = s["id"]
+    rng = random.Random(seed + 1)
+    n_outside = int(n_with_desks * DESKS_OUTSIDE_SHARE)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as f:
+        f.write(DESK_PREAMBLE)
+        f.write(f"Total of desks in spaces: {desks_total}\n")
+        f.write(f"Total of desks outside spaces: {n_outside}\n\n")
+        for s in iter_spaces(n_spaces, seed):
+            if s["n_desks"]:
+                f.write(space_block(s, rng))
+                f.write("\n\n")
+        f.write("\n==================== SPACES WITH NO DESKS ====================\n")
+        for s in iter_spaces(n_spaces, seed):
+            if not s["n_desks"]:
+                f.write(f"  - {s['name']}:{s['id']}\n")
+        f.write("\n\n================ DESKS NOT IN ANY 'IfcSpace' ================\n")
+        desk_id = last_id + 1000 if last_id is not None else 1000
+        for _ in range(n_outside):
+            desk_id += rng.randint(1, 5)
+            f.write(f"  - Desk: {desk_id}  (GlobalId: {globalid(rng)})\n")
+    return path
+
+def quoted_cell(lines: List[str]) -> str:
+    if not lines:
+        return ""
+    return "\"" + "\n".join(lines) + "\"" if len(lines) > 1 else lines[0]
+
+def write_analysis_summary(path: Path, n_spaces: int, seed: int = 0) -> Path:
+    rng = random.Random(seed + 2)
+    n_fail = max(1, int(n_spaces * FAIL_SHARE))
+    # sampling positions draws the same numbers as sampling a list of the spaces
+    positions = rng.sample(range(n_spaces), min(n_fail, n_spaces))
+    wanted = set(positions)
+    ids_at = {i: s["id"] for i, s in enumerate(iter_spaces(n_spaces, seed)) if i in wanted}
+    failing = [ids_at[i] for i in positions]
+    corridors = failing[: len(failing) // 2]
+    stairs = failing[len(failing) // 2:]
+
+    flight_ids, flight_reasons = [], []
+    for sid in stairs:
+        runs = rng.choice((1, 1, 2, 4))
+        for r in range(1, runs + 1):
+            flight_ids.append(f"{sid} Run {rng.randint(1, 3)}" + (f":{r}" if r > 1 else ""))
+            flight_reasons.append(f"sides_covered={rng.randint(0, 3)}/4")
+
+    rows = [
+        ("Doors", rng.randint(n_spaces, 2 * n_spaces + 1), [], []),
+        ("Corridors", rng.randint(1, n_spaces // 5 + 2), [str(i) for i in corridors],
+         ["Does not link to stairs via doors/openings"] * len(corridors)),
+        ("Stairs (width)", rng.randint(1, n_spaces // 20 + 2), [], []),
+        ("Stair flights (4-wall enclosure)", rng.randint(1, n_spaces // 20 + 2), flight_ids, flight_reasons),
+    ]
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8", newline="\n") as f:
+        for line in ANALYSIS_PREAMBLE:
+            f.write(line + "\t\t\t\t\n")
+        f.write("Category\tPassing count\tFailing count\tFailing element ID's\tReason for failure\n")
+        for name, passing, ids, reasons in rows:
+            f.write(f"{name}\t{passing}\t{len(ids)}\t{quoted_cell(ids)}\t{quoted_cell(reasons)}\n")
+    return path
+
+def write_inputs(out_dir: Path, n_spaces: int, seed: int = 0) -> Dict[str, Path]:
+    """Writes desks_<n>.txt and analysis_<n>.txt into out_dir; returns {"desks", "analysis"}."""
+    return {
+        "desks": write_desk_report(out_dir / f"desks_{n_spaces}_{seed}.txt", n_spaces, seed),
+        "analysis": write_analysis_summary(out_dir / f"analysis_{n_spaces}_{seed}.txt", n_spaces, seed),
+    }
+
+# ===========================
+# MAIN / CLI
+# ===========================
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Write synthetic GRP02 desk reports and GRP04 analysis summaries.")
+    parser.add_argument("--spaces", type=int, required=True, help="number of spaces (with and without desks)")
+    parser.add_argument("--out", type=Path, required=True, help="output folder")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    paths = write_inputs(args.out, args.spaces, args.seed)
+    print("Desk report written:", paths["desks"])
+    print("Analysis summary written:", paths["analysis"])
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,7 @@
+# The A3 scripts import each other by bare name (main, render, watch, ...), as when run
+# from the A3 folder; put A3 first so "main" is A3/main.py, not the repository's main.py.
+import sys
+from pathlib import Path
+
+A3_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(A3_DIR))
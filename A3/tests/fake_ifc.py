@@ -0,0 +1,66 @@
+# A small stand-in for the parts of the ifcopenshell model API that main.py uses
+# (by_type / by_id / by_guid, entity attributes, is_a, id()), so the IFC code
+# paths can be tested on hand-built models without ifcopenshell installed.
+import types
+
+# entity type -> supertypes that by_type() / is_a() also match
+SUPERTYPES = {
+    "IfcFurniture": ("IfcFurnishingElement",),
+    "IfcQuantityLength": ("IfcPhysicalSimpleQuantity",),
+    "IfcQuantityArea": ("IfcPhysicalSimpleQuantity",),
+}
+
+class Entity:
+    def __init__(self, model, step_id, ifc_type, attrs):
+        self._model, self._id, self._type = model, step_id, ifc_type
+        self.__dict__.update(attrs)
+
+    def __getattr__(self, name):   # unset attributes read as None, like optional IFC attributes
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return None
+
+    def id(self):
+        return self._id
+
+    def is_a(self, ifc_type=None):
+        if ifc_type is None:
+            return self._type
+        return ifc_type == self._type or ifc_type in SUPERTYPES.get(self._type, ())
+
+class Model:
+    def __init__(self):
+        self.entities = []
+
+    def add(self, ifc_type, **attrs):
+        el = Entity(self, len(self.entities) + 1, ifc_type, attrs)
+        self.entities.append(el)
+        return el
+
+    def by_type(self, ifc_type):
+        return [el for el in self.entities if el.is_a(ifc_type)]
+
+    def by_id(self, step_id):
+        return self.entities[step_id - 1]
+
+    def by_guid(self, guid):
+        for el in self.entities:
+            if el.GlobalId == guid:
+                return el
+        raise RuntimeError(f"Instance #{guid} not found")
+
+def placement_at(x, y, z=0.0):
+    """An ObjectPlacement stand-in: the 4x4 matrix get_local_placement returns for it."""
+    return [[1.0, 0.0, 0.0, x], [0.0, 1.0, 0.0, y], [0.0, 0.0, 1.0, z], [0.0, 0.0, 0.0, 1.0]]
+
+# the ifcopenshell module as main.py uses it: metre units, placements given as matrices
+IFCOPENSHELL = types.SimpleNamespace(util=types.SimpleNamespace(
+    unit=types.SimpleNamespace(calculate_unit_scale=lambda model, unit_type="LENGTHUNIT": 1.0),
+    placement=types.SimpleNamespace(get_local_placement=lambda placement: placement,
+                                    get_axis2placement=lambda position: position),
+))
+
+def opened(model):
+    """The {"model", "index", "ifcopenshell"} dict open_ifc returns, for a fake model."""
+    import main
+    return {"model": model, "index": main.build_ifc_index(model), "ifcopenshell": IFCOPENSHELL}
@@ -0,0 +1,45 @@
+import main
+from fake_ifc import Model, opened, placement_at
+
+DESKS_OUTSIDE = """================ DESKS NOT IN ANY 'IfcSpace' ================
+  - Desk: 1212429  (GlobalId: desk-inside)
+  - Desk: 1212430  (GlobalId: desk-nearby)
+  - Desk: 1212431  (GlobalId: desk-far)
+"""
+
+def office_model(space_name):
+    """A 4 m x 3 m office centred at (10, 10) on Level 3, and three desks contained in the storey only."""
+    model = Model()
+    storey = model.add("IfcBuildingStorey", Name="Level 3")
+    outline = model.add("IfcRectangleProfileDef", XDim=4.0, YDim=3.0)
+    solid = model.add("IfcExtrudedAreaSolid", SweptArea=outline)
+    shape = model.add("IfcProductDefinitionShape", Representations=[model.add("IfcShapeRepresentation", Items=[solid])])
+    office = model.add("IfcSpace", Name=space_name, Representation=shape, ObjectPlacement=placement_at(10.0, 10.0))
+    desks = [model.add("IfcFurniture", Name="Desk", GlobalId=guid, ObjectPlacement=placement_at(x, y))
+             for guid, x, y in (("desk-inside", 10.5, 10.2), ("desk-nearby", 12.3, 10.0), ("desk-far", 20.0, 20.0))]
+    model.add("IfcRelAggregates", RelatingObject=storey, RelatedObjects=[office])
+    model.add("IfcRelContainedInSpatialStructure", RelatingStructure=storey, RelatedElements=desks)
+    return model
+
+def text_report():
+    office = main.parse_space_block("Space: Office:1158149\n  - No. of desks in this space: 2\n"
+                                    "  - No. of doors: 1\n  - Total door width: 90 cm")
+    outside = [main.parse_desk_outside_line(ln) for ln in DESKS_OUTSIDE.splitlines()[1:]]
+    return {office.space_id: office}, outside
+
+def test_assign_against_text_report():
+    spaces, outside = text_report()
+    added, warnings = main.assign_orphan_desks(opened(office_model("Office:1158149")), spaces, outside, 0.5)
+
+    assert added == {"1158149": 2}
+    assert spaces["1158149"].n_desks == 4 and spaces["1158149"].desk_to_door_ratio_cm == 22.5
+    assert [(d.get("assigned_to"), d.get("assigned_by")) for d in outside] == [
+        ("1158149", "contained"), ("1158149", "nearest"), (None, None)]
+    assert outside[1]["distance_m"] == 0.3
+    assert warnings[0].startswith("2 of 3 desk(s)")
+
+def test_no_model_space_matching_the_report_is_reported():
+    spaces, outside = text_report()
+    added, warnings = main.assign_orphan_desks(opened(office_model("Office")), spaces, outside, 0.5)
+    assert added == {} and spaces["1158149"].n_desks == 2
+    assert any("None of the 1 IfcSpace(s) in the model matches" in w for w in warnings)
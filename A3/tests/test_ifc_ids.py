@@ -0,0 +1,28 @@
+from pathlib import Path
+
+import main
+from fake_ifc import Model, opened
+
+def test_ifc_space_ids_match_text_report_ids():
+    model = Model()
+    storey = model.add("IfcBuildingStorey", Name="Level 3")
+    office = model.add("IfcSpace", Name="Office:1158149")
+    corridor = model.add("IfcSpace", Name="1220218", LongName="Corridor")
+    store = model.add("IfcSpace", Name="Store", LongName="Storage room")
+    twin = model.add("IfcSpace", Name="Office 1158149")   # same number as office
+    desk = model.add("IfcFurniture", Name="Desk 160", GlobalId="desk-1")
+    model.add("IfcRelContainedInSpatialStructure", RelatingStructure=office, RelatedElements=[desk])
+    model.add("IfcRelAggregates", RelatingObject=storey, RelatedObjects=[office, corridor, store, twin])
+
+    spaces, _, warnings = main.load_ifc_spaces(Path("model.ifc"), opened(model))
+
+    text = main.parse_space_block("Space: Office:1158149\n  - No. of desks in this space: 1")
+    assert text.space_id == "1158149" and spaces["1158149"].title == text.title
+    assert spaces["1220218"].title == "Corridor:1220218"
+    assert str(store.id()) in spaces and str(twin.id()) in spaces   # no number / number taken: STEP id
+    assert any("repeat the number" in w for w in warnings)
+
+    # the GRP04 id fallback now finds the space in --ifc mode too
+    analysis = {"fail_ids": {"1158149"}}
+    assert main.evaluate_space(spaces["1158149"], analysis).statement == main.STATEMENT_ANALYSIS_FAILING
+    assert main.evaluate_space(text, analysis).statement == main.STATEMENT_ANALYSIS_FAILING
@@ -0,0 +1,52 @@
+import mmap
+
+import pytest
+
+import main
+import synth
+
+GIANT_ID = "4242001"
+
+def report_with_giant_block(tmp_path, newline="\n"):
+    """A synthetic report plus one 'Space:' block spanning several nominal cut offsets, and a duplicated space."""
+    path = synth.write_inputs(tmp_path, 600, seed=3)["desks"]
+    text = path.read_text(encoding="utf-8")
+    blocks_end = text.index("==================== SPACES WITH NO DESKS")
+    middle = text.index("Space:", len(text) // 4)
+    first = text[text.index("Space:"):text.index("\n", text.index("Space:"))]
+    giant = "\n".join([f"Space: Open office:{GIANT_ID}", "  - No. of desks in this space: 40", "  - Floor: Level 7"]
+                      + [f"  - Note {i}: desk row {i} along the facade" for i in range(6000)]
+                      + ["  - No. of doors: 2", "  - Total door width (internal): 177.6 cm"]) + "\n\n"
+    duplicate = first + "\n  - No. of desks in this space: 99\n  - No. of doors: 0\n\n"   # later block wins
+    text = text[:middle] + giant + text[middle:blocks_end] + duplicate + text[blocks_end:]
+    out = tmp_path / "desks_giant.txt"
+    out.write_bytes(text.replace("\n", newline).encode("utf-8"))
+    return out
+
+@pytest.mark.parametrize("newline", ["\n", "\r\n"])
+@pytest.mark.parametrize("jobs", [2, 3, 5])
+def test_parallel_parse_equals_sequential(tmp_path, monkeypatch, jobs, newline):
+    path = report_with_giant_block(tmp_path, newline)
+    data = path.read_bytes()
+    start = data.index(f"Space: Open office:{GIANT_ID}".encode())
+    end = data.index(b"Space:", start + 1)
+    n_chunks = jobs * main.CHUNKS_PER_JOB
+    step = len(data) // n_chunks
+
+    with path.open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        chunks = main.plan_chunks(mm, n_chunks)
+    assert len(chunks) > 1
+    assert any(start < k * step < end for k in range(1, n_chunks)), "the giant block should straddle a nominal cut"
+    assert not any(start < a < end for a, _, _ in chunks), "cuts are moved to the next 'Space:' line"
+    assert [c[0] for c in chunks[1:]] == [c[1] for c in chunks[:-1]] and chunks[-1][1] == len(data)
+
+    monkeypatch.setattr(main, "PARALLEL_MIN_BYTES", 0)
+    sequential = main.load_desk_report(path, jobs=1)
+    parallel = main.load_desk_report(path, jobs=jobs)
+
+    spaces, desks_outside, warnings = sequential
+    assert list(parallel[0].items()) == list(spaces.items())
+    assert parallel[1] == desks_outside
+    assert parallel[2] == warnings
+    assert spaces[GIANT_ID]["n_desks"] == 40
+    assert desks_outside and any(r["n_desks"] == 99 for r in spaces.values())
@@ -0,0 +1,58 @@
+import json
+import multiprocessing
+import os
+
+import pytest
+
+import main
+import portfolio
+
+run_report = main.run_report
+
+def run_report_or_die(txt_path, analysis_path, **kwargs):
+    """run_report, except that the process dies outright for a project named crash.txt."""
+    if txt_path is not None and txt_path.name == "crash.txt":
+        os._exit(1)
+    return run_report(txt_path, analysis_path, **kwargs)
+
+def project(name, desks, tmp_path):
+    return {"name": name, "desks": str(desks), "analysis": str(main.ANALYSIS_SUMMARY_TXT),
+            "ifc": None, "out_dir": str(tmp_path / name)}
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != "fork",
+                    reason="the crashing stand-in for run_report reaches the workers only when they are forked")
+def test_dead_worker_only_fails_its_own_project(tmp_path, monkeypatch):
+    crash = tmp_path / "crash.txt"
+    crash.write_text("")
+    projects = [project(f"p{i}", main.DESK_TXT, tmp_path) for i in range(4)]
+    projects.insert(2, project("dies", crash, tmp_path))
+    expected = portfolio.run_project(projects[0])
+    assert expected["verdict"] in ("PASS", "FAIL", "UNKNOWN")
+
+    monkeypatch.setattr(main, "run_report", run_report_or_die)
+    summary = portfolio.run_portfolio(projects, jobs=2)
+
+    rows = summary["projects"]
+    assert [r["name"] for r in rows] == [p["name"] for p in projects]
+    assert rows[2]["verdict"] == "ERROR"
+    for row in rows[:2] + rows[3:]:
+        assert row["verdict"] == expected["verdict"]
+        assert row["totals"]["spaces_scanned"] == expected["totals"]["spaces_scanned"]
+    assert summary["portfolio"]["ERROR"] == 1
+
+def test_manifest_rejects_shared_out_dir(tmp_path):
+    manifest = tmp_path / "projects.json"
+    manifest.write_text(json.dumps([{"name": "A", "desks": "a.txt", "analysis": "s.txt", "out_dir": "out"},
+                                    {"name": "B", "desks": "b.txt", "analysis": "s.txt", "out_dir": "./out/"}]))
+    with pytest.raises(ValueError, match="share out_dir"):
+        portfolio.load_manifest(manifest)
+
+def test_summaries_written_in_the_same_second_do_not_overwrite(tmp_path):
+    summaries = [{"generated": "20260101_120000", "projects": [],
+                  "portfolio": {"projects": n, "PASS": 0, "FAIL": 0, "UNKNOWN": 0, "ERROR": 0, "occupants_total": 0,
+                                "br18_min_total_door_width_cm": 0.0, "door_width_reported_total_cm": 0.0}}
+                 for n in (0, 1, 2)]
+    paths = [portfolio.write_portfolio_summary(s, tmp_path) for s in summaries]
+    assert [p.name for p in paths] == ["portfolio_summary_20260101_120000.txt", "portfolio_summary_20260101_120000_2.txt",
+                                       "portfolio_summary_20260101_120000_3.txt"]
+    assert [json.loads(p.with_suffix(".json").read_text())["portfolio"]["projects"] for p in paths] == [0, 1, 2]
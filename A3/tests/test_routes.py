@@ -0,0 +1,46 @@
+from pathlib import Path
+
+import main
+from fake_ifc import Model, opened
+
+def corridor_model():
+    """Office 1158149 -> door -> Corridor 1220218 -> stair; office 1158150 -> door -> stair directly."""
+    model = Model()
+    stair = model.add("IfcStair", Tag="900")
+    office = model.add("IfcSpace", Name="Office:1158149")
+    corridor = model.add("IfcSpace", Name="1220218", LongName="Corridor")
+    side_office = model.add("IfcSpace", Name="Office:1158150")
+    for space, other, tag in ((office, corridor, "5001"), (side_office, stair, "5003")):
+        door = model.add("IfcDoor", Tag=tag)
+        model.add("IfcRelSpaceBoundary", RelatingSpace=space, RelatedBuildingElement=door)
+        if other.is_a("IfcSpace"):
+            model.add("IfcRelSpaceBoundary", RelatingSpace=other, RelatedBuildingElement=door)
+        else:
+            model.add("IfcRelSpaceBoundary", RelatingSpace=space, RelatedBuildingElement=other)
+    model.add("IfcRelSpaceBoundary", RelatingSpace=corridor, RelatedBuildingElement=stair)
+    return model
+
+def text_space(number):
+    return main.parse_space_block(f"Space: Office:{number}\n  - No. of desks in this space: 2\n"
+                                  "  - No. of doors: 1\n  - Total door width: 90 cm")
+
+def test_failing_corridor_on_route_decides_text_report_space():
+    ifc = opened(corridor_model())
+    analysis = {"fail_ids": {"1220218"}}
+    spaces = {sid: text_space(sid) for sid in ("1158149", "1158150")}
+    analysis["routes"], warnings = main.load_ifc_routes(Path("model.ifc"), analysis, ifc, spaces)
+    assert warnings == []
+
+    route = main.find_route(analysis["routes"], "1158149", main.space_check_ids("1158149"))
+    assert route["reachable"] and route["failing"] == ["1220218"]
+    assert route["route"][:3] == ["Office:1158149", "Door:5001", "Corridor:1220218"]
+
+    blocked = main.evaluate_space(spaces["1158149"], analysis)
+    assert blocked.verdict == "PASS" and blocked.statement == main.STATEMENT_ANALYSIS_FAILING
+    assert main.evaluate_space(spaces["1158150"], analysis).statement == main.STATEMENT_PASS
+
+def test_routes_matching_nothing_are_reported():
+    ifc = opened(corridor_model())
+    _, warnings = main.load_ifc_routes(Path("model.ifc"), {"fail_ids": {"42"}}, ifc, ["1234567"])
+    assert any("None of the 1 report space(s)" in w for w in warnings)
+    assert any("None of the 1 GRP04 failing ID(s)" in w for w in warnings)
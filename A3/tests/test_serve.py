@@ -0,0 +1,116 @@
+import asyncio
+import json
+import shutil
+import time
+
+import main
+import serve
+import watch
+
+SPACE_ID = "1158167"
+
+def copy_inputs(tmp_path):
+    desks = tmp_path / "desks.txt"
+    analysis = tmp_path / "analysis.txt"
+    shutil.copyfile(main.DESK_TXT, desks)
+    shutil.copyfile(main.ANALYSIS_SUMMARY_TXT, analysis)
+    return desks, analysis
+
+async def request(port, raw: bytes):
+    """Sends one raw request and returns (status, JSON body); the server is asked to close afterwards."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        writer.write(raw)
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), 10)
+    finally:
+        writer.close()
+        await writer.wait_closed()
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split(b" ")[1]), json.loads(body) if body else None
+
+def get(port, path, method="GET"):
+    return request(port, f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n".encode())
+
+async def start(state):
+    """serve() on an ephemeral port, without polling; returns (task, port)."""
+    started = asyncio.get_running_loop().create_future()
+    task = asyncio.create_task(serve.serve(state, "127.0.0.1", 0, 3600, started))
+    await asyncio.wait({started, task}, timeout=30, return_when=asyncio.FIRST_COMPLETED)
+    if task.done():
+        task.result()
+    return task, started.result()[1]
+
+async def stop(task):
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+def run(tmp_path, scenario):
+    desks, analysis = copy_inputs(tmp_path)
+    state = serve.QueryState(watch.IncrementalReport(desks, analysis))
+
+    async def body():
+        task, port = await start(state)
+        try:
+            await scenario(state, port, analysis)
+        finally:
+            await stop(task)
+
+    asyncio.run(body())
+
+def test_queries(tmp_path):
+    async def scenario(state, port, analysis):
+        status, summary = await get(port, "/summary")
+        assert status == 200 and summary["version"] == 1
+        assert summary["totals"]["spaces_scanned"] == len(state.snapshot.evaluated) > 0
+        status, space = await get(port, f"/spaces/{SPACE_ID}")
+        assert status == 200 and space["space_id"] == SPACE_ID and space["verdict"] in ("PASS", "FAIL", "UNKNOWN")
+        status, _ = await get(port, "/spaces/does-not-exist")
+        assert status == 404
+
+    run(tmp_path, scenario)
+
+def test_bad_requests(tmp_path):
+    async def scenario(state, port, analysis):
+        for length, expected in (("abc", 400), ("-1", 400), ("", 400), (str(serve.MAX_BODY_BYTES + 1), 413)):
+            raw = f"POST /reload HTTP/1.1\r\nHost: localhost\r\nContent-Length: {length}\r\n\r\n".encode()
+            status, body = await request(port, raw)
+            assert status == expected and "error" in body, length
+        status, _ = await request(port, b"not an http request\r\n\r\n")
+        assert status == 400
+        status, _ = await get(port, "/health", method="DELETE")
+        assert status == 405
+        status, health = await get(port, "/health")   # still serving
+        assert status == 200 and health["status"] == "ok"
+
+    run(tmp_path, scenario)
+
+def test_reload_swaps_version_without_blocking_queries(tmp_path):
+    async def scenario(state, port, analysis):
+        _, before = await get(port, f"/spaces/{SPACE_ID}")
+        status, unchanged = await get(port, "/reload", method="POST")
+        assert status == 200 and unchanged["changed"] is False and unchanged["version"] == 1
+
+        # list the space among the failing corridors, and make the reload slow
+        text = analysis.read_text(encoding="utf-8")
+        analysis.write_text(text.replace('"1220218\n', f'"1220218\n{SPACE_ID}\n', 1), encoding="utf-8")
+        refresh = state.report.refresh
+        state.report.refresh = lambda: (time.sleep(0.5), refresh())[1]
+
+        reload = asyncio.create_task(get(port, "/reload", method="POST"))
+        await asyncio.sleep(0.1)
+        t0 = time.perf_counter()
+        status, health = await get(port, "/health")
+        assert time.perf_counter() - t0 < 0.25, "queries should not wait for the reload"
+        assert status == 200 and health["version"] == 1 and not reload.done()
+
+        status, reloaded = await reload
+        assert status == 200 and reloaded["changed"] is True and reloaded["version"] == 2
+        status, after = await get(port, f"/spaces/{SPACE_ID}")
+        assert status == 200 and after["version"] == 2
+        assert after["fire_route_statement"] != before["fire_route_statement"]
+
+    run(tmp_path, scenario)
@@ -0,0 +1,81 @@
+import pytest
+
+import main
+import portfolio
+import sweep
+import synth
+
+def synthetic_portfolio(tmp_path):
+    inputs = synth.write_inputs(tmp_path, 3000, seed=7)
+    spaces, _, _ = main.load_desk_report(inputs["desks"])
+    # one record per row of the decision table, whatever the generator produced
+    spaces.update({
+        "edge-no-desks": main.SpaceRecord("edge-no-desks", "Hall:edge-no-desks", n_desks=0, n_doors_reported=2),
+        "edge-zero-doors": main.SpaceRecord("edge-zero-doors", "Office:edge-zero-doors", n_desks=3, n_doors_reported=0),
+        "edge-no-width": main.SpaceRecord("edge-no-width", "Office:edge-no-width", n_desks=3, n_doors_reported=1),
+        "edge-nothing": main.SpaceRecord("edge-nothing", "Office:edge-nothing", n_desks=3),
+        "edge-width-only": main.SpaceRecord("edge-width-only", "Office:edge-width-only", n_desks=4, total_door_width_cm_reported=88.8),
+    })
+    analysis, _ = main.parse_analysis_summary(inputs["analysis"])
+    return spaces, analysis
+
+def boundary_thresholds(spaces):
+    """Thresholds at which some space's required width equals its reported width, plus their neighbours."""
+    out = {0.0, main.DOOR_CM_PER_DESK}
+    for rec in spaces.values():
+        n, total = rec.get("n_desks"), rec.get("total_door_width_cm_reported")
+        if n and total is not None:
+            out.update((total / n, total / n - 1e-9, total / n + 1e-9))
+    return sorted(out)
+
+def scalar_verdicts(spaces, analysis, threshold):
+    return {sid: main.evaluate_space(rec, analysis, threshold).verdict for sid, rec in spaces.items()}
+
+@pytest.mark.skipif(not sweep.NUMPY_AVAILABLE, reason="needs NumPy")
+def test_verdict_grid_matches_scalar_rule_at_boundaries(tmp_path):
+    spaces, analysis = synthetic_portfolio(tmp_path)
+    thresholds = boundary_thresholds(spaces)
+    cols = sweep.space_columns(spaces)
+    grid = sweep.verdict_grid(cols, sweep.np.asarray(thresholds, dtype=sweep.np.float64))
+    for t, codes in zip(thresholds, grid):
+        expected = scalar_verdicts(spaces, analysis, t)
+        got = {sid: sweep.VERDICTS[c] for sid, c in zip(cols["ids"], codes)}
+        assert got == expected, f"threshold {t!r}"
+
+@pytest.mark.parametrize("numpy_engine", [True, False])
+def test_sweep_counts_and_flips_match_scalar_rule(tmp_path, monkeypatch, numpy_engine):
+    if numpy_engine and not sweep.NUMPY_AVAILABLE:
+        pytest.skip("needs NumPy")
+    monkeypatch.setattr(sweep, "NUMPY_AVAILABLE", numpy_engine)
+    spaces, analysis = synthetic_portfolio(tmp_path)
+    thresholds = boundary_thresholds(spaces)[::7] + [22.2, 2.5]
+    result = sweep.sweep_thresholds(spaces, analysis, thresholds)
+
+    default = scalar_verdicts(spaces, analysis, main.DOOR_CM_PER_DESK)
+    assert result["default"]["counts"] == {v: list(default.values()).count(v) for v in sweep.VERDICTS}
+    for row in result["sweep"]:
+        expected = scalar_verdicts(spaces, analysis, row["door_cm_per_desk"])
+        assert row["counts"] == {v: list(expected.values()).count(v) for v in sweep.VERDICTS}
+        assert row["flipped_to_fail"] == sorted(s for s, v in expected.items() if v == "FAIL" and default[s] != "FAIL")
+        assert row["flipped_to_pass"] == sorted(s for s, v in expected.items() if v == "PASS" and default[s] != "PASS")
+
+def test_occupant_sweep_matches_project_verdict(tmp_path):
+    spaces, analysis = synthetic_portfolio(tmp_path)
+    desks = sum(rec.get("n_desks") or 0 for rec in spaces.values())
+    width = round(sum(rec.get("total_door_width_cm_reported") or 0.0 for rec in spaces.values()), 1)
+    at_limit = width / desks
+    result = sweep.sweep_thresholds(spaces, analysis, [0.0], occupant_thresholds=[at_limit * 0.5, at_limit * 2])
+
+    assert result["building"] == {"desks_total": desks, "door_width_reported_total_cm": width}
+    assert result["default_occupant"]["cm_per_occupant"] == main.BR18_CM_PER_OCCUPANT
+    low, high = result["occupant_sweep"]
+    assert low["building_ok"] and not high["building_ok"]
+    assert high["br18_min_total_door_width_cm"] == round(desks * at_limit * 2, 1)
+    for row in (low, high):
+        assert [v["door_cm_per_desk"] for v in row["project_verdicts"]] == [main.DOOR_CM_PER_DESK, 0.0]
+        for v, door_row in zip(row["project_verdicts"], [result["default"]] + result["sweep"]):
+            c = door_row["counts"]
+            assert v["project_verdict"] == portfolio.project_verdict({
+                "spaces_fail": c["FAIL"], "spaces_unknown": c["UNKNOWN"], "door_width_reported_total_cm": width,
+                "br18_min_total_door_width_cm": row["br18_min_total_door_width_cm"]})
+    assert all(v["project_verdict"] == "FAIL" for v in high["project_verdicts"])
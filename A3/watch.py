@@ -0,0 +1,403 @@
+"""
+================================================================================
+INCREMENTAL WATCH MODE FOR THE A3 MANAGER SCRIPT
+================================================================================
+
+PURPOSE:
+
+main.py re-parses both analyst files and re-decides every space on each run.
+This module keeps the parsed spaces and their verdicts in memory, polls the
+GRP02 desk report and the GRP04 analysis summary, and on every change only:
+
+ - re-parses the byte ranges of the desk report that changed,
+ - re-decides the spaces whose record changed, were added or were removed,
+ - re-decides the spaces whose IDs entered or left the GRP04 failing IDs.
+
+The desk report is kept in memory as bytes, cut into ranges of about
+WATCH_CHUNK_BYTES where the parser's state is known (main.plan_chunks), each
+with its parsed events. After an edit, the file is read and compared with the
+previous bytes range by range from both ends. Only the ranges in between are
+parsed again, and only the spaces listed in them are looked up again. The read and
+compare is a memcmp-speed pass over the file (a few ms per 10 MB); the parse
+is proportional to the edit. An edit that touches a section header line is
+re-parsed to the next 'Space:' line or header. The aggregate totals are updated
+by subtracting the old and adding the new contribution of each re-decided
+space.
+
+OUTPUT FILES:
+
+ - A3/Results/spaces_accessibility_delta_<timestamp>_<n>.json   (one per change)
+    {"generated", "trigger", "reevaluated", "added", "removed", "changed", "totals", "seconds"}
+ - A3/Results/spaces_accessibility_allspaces_<timestamp>.json   (with --full-on-exit)
+    (same layout as the JSON report of main.py)
+
+Watch mode works on the text reports only; route tracing through an IFC model
+(main.py --routes-from) is not available here.
+
+USAGE:
+
+    python A3/watch.py [--desks FILE] [--analysis FILE] [--interval SECONDS] [--full-on-exit]
+
+================================================================================
+"""
+
+# ===========================
+# IMPORTS
+# ===========================
+
+from pathlib import Path
+import argparse
+import json
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+import main
+
+# ===========================
+# CONSTANTS
+# ===========================
+
+POLL_INTERVAL_S = 0.5
+WATCH_CHUNK_BYTES = 8 * 1024   # re-parse granularity of the desk report
+VERDICT_TOTALS = {"PASS": "spaces_pass", "FAIL": "spaces_fail", "UNKNOWN": "spaces_unknown", "NOT_APPLICABLE": "spaces_not_applicable"}
+
+# ===========================
+# HELPERS
+# ===========================
+
+def file_stamp(path: Path) -> Optional[Tuple[int, int]]:
+    """(mtime_ns, size), or None while the file is missing (e.g. being replaced)."""
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+def fail_ids_of(analysis: Dict[str, Any]) -> set:
+    fail_ids = analysis.get("fail_ids")
+    if fail_ids is None:
+        fail_ids = analysis.get("corridor_fail_ids", set()) | analysis.get("stairflight_fail_ids", set())
+    return fail_ids
+
+# ===========================
+# DESK REPORT CHUNKS
+# ===========================
+
+class Chunk:
+    """A byte range of the desk report, cut where the parser's state is known (see main.plan_chunks), and its events."""
+
+    __slots__ = ("start", "end", "mode", "events", "outside")
+
+    def __init__(self, data: bytes, start: int, end: int, mode: str):
+        self.start, self.end, self.mode = start, end, mode
+        self.events: List[Tuple[str, Any]] = []       # ("space", record) / ("no_desks", space id)
+        self.outside: List[Dict[str, str]] = []      # desks not in any IfcSpace
+        lines = main.decode_lines(data[start:end])
+        for kind, item in main.parse_report_events(main.iter_report_lines(lines, mode)):
+            if kind == "desk_outside":
+                self.outside.append(item)
+            else:
+                self.events.append((kind, item))
+
+def anchored(data: bytes, pos: int) -> bool:
+    """Whether the parser's state at pos does not depend on the text before it: a 'Space:' line, a section header or the end."""
+    if pos >= len(data):
+        return True
+    line = data[pos:main.line_end(data, pos, len(data))].decode("utf-8", errors="ignore")
+    return bool(main.SPACE_START_RE.match(line) or main.NO_DESKS_HEADER_RE.search(line)
+                or main.DESKS_OUTSIDE_HEADER_RE.search(line))
+
+def changed_chunks(chunks: List[Chunk], old: bytes, data: bytes) -> Optional[Tuple[int, int]]:
+    """
+    (i, k) such that chunks[i:k] must be parsed again from data (the rest is byte-identical,
+    shifted by the change in length), or None when data equals old.
+    """
+    n, delta = len(chunks), len(data) - len(old)
+    i = 0
+    while i < n and old[chunks[i].start:chunks[i].end] == data[chunks[i].start:chunks[i].end]:
+        i += 1
+    if i == n:
+        if delta == 0:
+            return None
+        return n - 1, n   # text appended (or cut) at the end
+    k = n
+    while (k > i and chunks[k - 1].start + delta >= chunks[i].start
+           and old[chunks[k - 1].start:chunks[k - 1].end] == data[chunks[k - 1].start + delta:chunks[k - 1].end + delta]):
+        k -= 1
+    # lines inserted right at chunks[i].start may continue the block before it
+    i = max(i - 1, 0)
+    k = max(k, i + 1)
+    # the first reused chunk must start a line, and with the same parser state as before
+    while k < n:
+        end = chunks[k - 1].end + delta
+        if data[end - 1:end] == b"\n" and (anchored(data, end) or not any(
+                b"==" in text or b"Space" in text
+                for text in (old[chunks[i].start:chunks[k - 1].end], data[chunks[i].start:end]))):
+            break
+        k += 1
+    return i, k
+
+# ===========================
+# INCREMENTAL STATE
+# ===========================
+
+class IncrementalReport:
+    """
+    In-memory report for one desk report / analysis summary pair. refresh()
+    brings it up to date with the files on disk and returns the delta.
+    """
+
+    def __init__(self, desks_path: Path, analysis_path: Path,
+                 door_cm_per_desk: Optional[float] = None, cm_per_occupant: Optional[float] = None):
+        self.desks_path = Path(desks_path)
+        self.analysis_path = Path(analysis_path)
+        self.cm_per_desk = main.DOOR_CM_PER_DESK if door_cm_per_desk is None else door_cm_per_desk
+        self.cm_per_occupant = main.BR18_CM_PER_OCCUPANT if cm_per_occupant is None else cm_per_occupant
+
+        self.stamps: Dict[Path, Optional[Tuple[int, int]]] = {}
+        self.data = b""                                     # desk report bytes of the current version
+        self.chunks: List[Chunk] = []                       # its ranges, in file order
+        self.blocks_in: Dict[str, List[Chunk]] = {}         # space id -> chunks with a 'Space:' block for it
+        self.no_desks_in: Dict[str, List[Chunk]] = {}       # space id -> chunks listing it under SPACES WITH NO DESKS
+        self.spaces: Dict[str, main.SpaceRecord] = {}       # space id -> record (last block wins)
+        self.evaluated: Dict[str, Tuple[main.SpaceRecord, main.SpaceVerdict]] = {}   # space id -> (record, verdict)
+        self.ids_to_spaces: Dict[str, set] = {}             # check id -> space ids using it
+        self.desks_outside: List[Dict[str, str]] = []
+        self.analysis: Dict[str, Any] = {"fail_ids": set()}
+        self.totals = {"spaces_scanned": 0, "spaces_with_desks": 0, "spaces_pass": 0, "spaces_fail": 0,
+                       "spaces_unknown": 0, "desks_total": 0, "spaces_not_applicable": 0}
+        self.door_width_reported_total = 0.0
+
+    # ---------- FILE CHANGES ----------
+
+    def changed_files(self) -> List[Path]:
+        changed = []
+        for path in (self.desks_path, self.analysis_path):
+            stamp = file_stamp(path)
+            if stamp is not None and stamp != self.stamps.get(path):
+                changed.append(path)
+        return changed
+
+    def reload_desks(self) -> set:
+        """
+        Re-reads the desk report; returns the ids of added, removed or changed spaces.
+        Only the chunks that changed are parsed again (all of them on the first load).
+        """
+        self.stamps[self.desks_path] = file_stamp(self.desks_path)
+        data = self.desks_path.read_bytes()
+        span = changed_chunks(self.chunks, self.data, data) if self.chunks else (0, 0)
+        if span is None:
+            return set()
+        i, k = span
+        if self.chunks:
+            delta = len(data) - len(self.data)
+            new = [Chunk(data, self.chunks[i].start, self.chunks[k - 1].end + delta, self.chunks[i].mode)]
+            for chunk in self.chunks[k:]:
+                chunk.start += delta
+                chunk.end += delta
+        else:
+            n_chunks = max(1, len(data) // WATCH_CHUNK_BYTES)
+            new = [Chunk(data, a, b, mode) for a, b, mode in main.plan_chunks(data, n_chunks)]
+        old = self.chunks[i:k]
+        self.chunks[i:k] = new
+        self.data = data
+
+        touched = set()
+        for chunk in old:
+            self.index_chunk(chunk, touched, remove=True)
+        for chunk in new:
+            self.index_chunk(chunk, touched)
+        dirty = set()
+        for sid in touched:
+            rec, before = self.resolve(sid), self.spaces.get(sid)
+            if rec is None:
+                if before is not None:
+                    del self.spaces[sid]
+                    dirty.add(sid)
+            elif before is None or before != rec:
+                self.spaces[sid] = rec
+                dirty.add(sid)
+        if any(chunk.outside for chunk in old + new):
+            self.desks_outside = [item for chunk in self.chunks for item in chunk.outside]
+        return dirty
+
+    def index_chunk(self, chunk: Chunk, touched: set, remove: bool = False):
+        for kind, item in chunk.events:
+            sid, where = (item["space_id"], self.blocks_in) if kind == "space" else (item, self.no_desks_in)
+            touched.add(sid)
+            if remove:
+                where[sid].remove(chunk)
+                if not where[sid]:
+                    del where[sid]
+            else:
+                where.setdefault(sid, []).append(chunk)
+
+    def resolve(self, sid: str) -> Optional[main.SpaceRecord]:
+        """Record of a space as the full parse would give it: its last 'Space:' block, else a no-desks record."""
+        chunks = self.blocks_in.get(sid)
+        if chunks:
+            last = max(chunks, key=lambda c: c.start)
+            for kind, item in reversed(last.events):
+                if kind == "space" and item["space_id"] == sid:
+                    return item
+        if sid in self.no_desks_in:
+            return main.no_desks_record(sid)
+        return None
+
+    def reload_analysis(self) -> set:
+        """Re-reads the analysis summary; returns the ids of spaces whose GRP04 status may have changed."""
+        self.stamps[self.analysis_path] = file_stamp(self.analysis_path)
+        analysis, _ = main.parse_analysis_summary(self.analysis_path)
+        flipped = fail_ids_of(self.analysis) ^ fail_ids_of(analysis)
+        self.analysis = analysis
+        dirty = set()
+        for fid in flipped:
+            dirty |= self.ids_to_spaces.get(fid, set())
+        return dirty
+
+    # ---------- AGGREGATE ----------
+
+    def account(self, info: main.SpaceRecord, result: main.SpaceVerdict, sign: int):
+        n = info.n_desks or 0
+        self.totals["spaces_scanned"] += sign
+        self.totals["desks_total"] += sign * n
+        self.totals["spaces_with_desks"] += sign * (n > 0)
+        self.totals[VERDICT_TOTALS[result.verdict]] += sign
+        self.door_width_reported_total += sign * (info.total_door_width_cm_reported or 0.0)
+
+    def aggregate(self) -> Dict[str, Any]:
+        totals = dict(self.totals)
+        totals["occupants_total"] = totals["desks_total"]
+        totals["br18_min_total_door_width_cm"] = round(totals["desks_total"] * self.cm_per_occupant, 1)
+        totals["door_width_reported_total_cm"] = round(self.door_width_reported_total, 1)
+        return totals
+
+    def detail(self, sid: str, evaluated: Tuple[main.SpaceRecord, main.SpaceVerdict]) -> Dict[str, Any]:
+        info, result = evaluated
+        return main.space_detail(sid, info, result.verdict, result.reasons(), result.statement)
+
+    def reevaluate(self, sid: str):
+        """(old, new) (record, verdict) pairs for one space, with totals and the id index updated."""
+        old = self.evaluated.pop(sid, None)
+        if old is not None:
+            self.account(*old, -1)
+            for cid in main.space_check_ids(sid):
+                self.ids_to_spaces[cid].discard(sid)
+        info = self.spaces.get(sid)
+        if info is None:
+            return old, None
+        new = (info, main.evaluate_space(info, self.analysis, self.cm_per_desk))
+        self.evaluated[sid] = new
+        self.account(*new, +1)
+        for cid in main.space_check_ids(sid):
+            self.ids_to_spaces.setdefault(cid, set()).add(sid)
+        return old, new
+
+    # ---------- REFRESH ----------
+
+    def refresh(self) -> Optional[Dict[str, Any]]:
+        """Brings the report up to date; None when neither input file changed."""
+        changed = self.changed_files()
+        if not changed:
+            return None
+        start = time.perf_counter()
+        dirty = set()
+        # analysis first: a space added in the same refresh is re-decided below anyway
+        if self.analysis_path in changed:
+            dirty |= self.reload_analysis()
+        if self.desks_path in changed:
+            dirty |= self.reload_desks()
+
+        added, removed, changed_details = [], [], []
+        for sid in sorted(dirty, key=str):
+            old, new = self.reevaluate(sid)
+            if old is None and new is not None:
+                added.append(self.detail(sid, new))
+            elif new is None and old is not None:
+                removed.append(sid)
+            elif old != new:
+                changed_details.append({"space_id": sid, "verdict_before": old[1].verdict, "verdict_after": new[1].verdict, "detail": self.detail(sid, new)})
+
+        return {
+            "generated": main.now_ts(),
+            "trigger": [str(p) for p in changed],
+            "reevaluated": len(dirty),
+            "added": added,
+            "removed": removed,
+            "changed": changed_details,
+            "totals": self.aggregate(),
+            "seconds": round(time.perf_counter() - start, 4),
+        }
+
+    def write_full_json(self, report_dir: Path) -> Path:
+        ts = main.now_ts()
+        out = report_dir / f"spaces_accessibility_allspaces_{ts}.json"
+        details = [self.detail(sid, self.evaluated[sid]) for sid in sorted(self.evaluated, key=str)]
+        totals = self.aggregate()
+        totals["chart_path"] = None
+        out.write_text(json.dumps({"generated": ts, "totals": totals, "details": details, "desks_outside": self.desks_outside}, indent=2, ensure_ascii=False), encoding="utf-8")
+        return out
+
+# ===========================
+# WATCH LOOP
+# ===========================
+
+def write_delta(delta: Dict[str, Any], report_dir: Path, seq: int) -> Path:
+    report_dir.mkdir(parents=True, exist_ok=True)
+    out = report_dir / f"spaces_accessibility_delta_{delta['generated']}_{seq}.json"
+    out.write_text(json.dumps(delta, indent=2, ensure_ascii=False), encoding="utf-8")
+    return out
+
+def print_delta(delta: Dict[str, Any]):
+    t = delta["totals"]
+    print(f"[{delta['generated']}] re-evaluated {delta['reevaluated']} space(s) in {delta['seconds'] * 1000:.1f} ms: "
+          f"+{len(delta['added'])} -{len(delta['removed'])} ~{len(delta['changed'])}")
+    for c in delta["changed"]:
+        if c["verdict_before"] != c["verdict_after"]:
+            print(f"   {c['space_id']}: {c['verdict_before']} -> {c['verdict_after']}")
+    print(f"   PASS: {t['spaces_pass']}  FAIL: {t['spaces_fail']}  UNKNOWN: {t['spaces_unknown']}  (spaces: {t['spaces_scanned']})")
+
+def watch(report: IncrementalReport, report_dir: Path, interval: float = POLL_INTERVAL_S):
+    """Polls the input files until interrupted; writes a delta file for every change after the first load."""
+    first = report.refresh()
+    if first is None:
+        raise FileNotFoundError(f"{report.desks_path} / {report.analysis_path}")
+    t = first["totals"]
+    print(f"Loaded {t['spaces_scanned']} space(s) in {first['seconds']:.2f} s — PASS: {t['spaces_pass']}  FAIL: {t['spaces_fail']}  UNKNOWN: {t['spaces_unknown']}")
+    print(f"Watching {report.desks_path.name} and {report.analysis_path.name} (Ctrl+C to stop)")
+    seq = 0
+    while True:
+        time.sleep(interval)
+        delta = report.refresh()
+        if delta is None:
+            continue
+        seq += 1
+        print_delta(delta)
+        print("   Delta written:", write_delta(delta, report_dir, seq))
+
+# ===========================
+# MAIN / CLI
+# ===========================
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Watch the analyst files and re-evaluate only the spaces that changed.")
+    parser.add_argument("--desks", type=Path, default=main.DESK_TXT, help="GRP02 desk report (TXT)")
+    parser.add_argument("--analysis", type=Path, default=main.ANALYSIS_SUMMARY_TXT, help="GRP04 analysis_summary (TXT)")
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL_S, help="seconds between file checks")
+    parser.add_argument("--door-cm-per-desk", type=float, default=None)
+    parser.add_argument("--cm-per-occupant", type=float, default=None)
+    parser.add_argument("--full-on-exit", action="store_true", help="write the full JSON report when stopped")
+    args = parser.parse_args()
+
+    report = IncrementalReport(args.desks, args.analysis, args.door_cm_per_desk, args.cm_per_occupant)
+    try:
+        watch(report, main.REPORT_DIR, args.interval)
+    except FileNotFoundError as e:
+        print("Input file not found:", e)
+    except KeyboardInterrupt:
+        print("\nStopped.")
+        if args.full_on_exit and report.evaluated:
+            print("Report written:", report.write_full_json(main.REPORT_DIR))
+
+if __name__ == "__main__":
+    main_cli()
@@ -1,28 +1,203 @@
-import ifcopenshell
+from pathlib import Path
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import multiprocessing
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from model_cache import ModelCache
+from model_access import ModelAccess
 
 from external.BIMANALYST_G_4.rules import FacadeTransparency
 from external.openBIM2025_GRP2.rules import alisaRule
 from external.BIManalyst_g_01.rules import StoreyRule
 
-model = ifcopenshell.open(
+MODEL_PATH = Path(
     r"C:\Users\nicol\OneDrive - Danmarks Tekniske Universitet\DTU\7. Semester\41934 Advanced Building Information Modeling\GitHub\AdvancedBIM_ARCH\model\25-16-D-ARCH.ifc"
 )
 
 rules = {
     "1": ("Facade Transparency Rule", FacadeTransparency.checkRule),
-    "2": ("Classification Rule", alisaRule.checkRule), 
+    "2": ("Classification Rule", alisaRule.checkRule),
     "3": ("Storey Rule", StoreyRule.checkRule)
 }
 
-print("Select which rule you want to run:")
-for key, (name, _) in rules.items():
-    print(f"{key}: {name}")
+# memoized access to the parsed model, shared by all rules of a run
+# (threads share it directly; forked worker processes inherit a copy)
+SHARED_MODEL = None
+
+class RuleOutput(io.TextIOBase):
+    """
+    sys.stdout during a batch: what a rule prints goes to the buffer of the rule
+    running in that thread (see run_rule_on_shared_model), anything else to the
+    real stdout. Keeps rule prints out of the combined JSON when it goes to stdout.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        buffer = getattr(self.local, "buffer", None)
+        return (self.stream if buffer is None else buffer).write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    @contextlib.contextmanager
+    def capture(self):
+        """Collects what the calling thread prints until the block ends."""
+        self.local.buffer = buffer = io.StringIO()
+        try:
+            yield buffer
+        finally:
+            self.local.buffer = None
+
+def run_rule_on_shared_model(key: str):
+    """
+    Runs one rule on SHARED_MODEL; returns (result, error, seconds, printed output)
+    so one failing rule never stops the batch.
+    """
+    _, rule_func = rules[key]
+    output = sys.stdout if isinstance(sys.stdout, RuleOutput) else RuleOutput(sys.stdout)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(output), output.capture() as printed:
+        try:
+            result, error = rule_func(SHARED_MODEL), None
+        except Exception as e:
+            result, error = None, f"{type(e).__name__}: {e}"
+    return result, error, time.perf_counter() - start, printed.getvalue()
+
+def collect_outcome(future):
+    """Result of a process-pool future; an error in sending it back (e.g. an unpicklable result) becomes that rule's error."""
+    try:
+        return future.result()
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}", 0.0, ""
+
+def run_batch(model_path: Path, keys, executor: str = "thread", jobs: int = None) -> dict:
+    """
+    Runs the selected rules against one parsed model and returns a combined,
+    JSON-serialisable result. Rules with a cached result for the current model
+    content are not run again; the model is parsed at most once, in this process.
+    executor: "serial", "thread" or "process" (process workers are forked and share
+    the parsed model; where fork is unavailable the batch falls back to threads).
+    """
+    global SHARED_MODEL
+    cache = ModelCache(model_path)
+    out = {
+        "model": str(model_path),
+        "content_sha256": cache.key,
+        "generated": datetime.datetime.now().strftime("%Y%m%d_%H%M%S"),
+        "executor": executor,
+        "results": {},
+        "access_stats": None,
+    }
+
+    pending = []
+    for key in keys:
+        name, rule_func = rules[key]
+        hit, result = cache.lookup(name, rule_func)
+        if hit:
+            out["results"][key] = {"rule": name, "result": result, "error": None, "cached": True, "seconds": 0.0, "output": ""}
+        else:
+            pending.append(key)
+
+    if pending:
+        # pset / containment lookups come from the persisted index; the model is opened when a rule needs entities
+        SHARED_MODEL = ModelAccess(index=cache.index, open_model=lambda: cache.model)
+        if executor == "process" and "fork" not in multiprocessing.get_all_start_methods():
+            print("Process executor needs fork to share the parsed model; using threads instead.", file=sys.stderr)
+            executor = out["executor"] = "thread"
+        if executor == "process":
+            SHARED_MODEL.model  # open before forking, so the workers share it instead of each opening the file
+
+        # what the rules print goes to their outcome's "output", not into the JSON on stdout
+        with contextlib.redirect_stdout(RuleOutput(sys.stdout)):
+            if executor == "serial" or len(pending) == 1:
+                outcomes = [run_rule_on_shared_model(k) for k in pending]
+            elif executor == "process":
+                with ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context("fork")) as pool:
+                    futures = [pool.submit(run_rule_on_shared_model, k) for k in pending]
+                    outcomes = [collect_outcome(f) for f in futures]
+            else:
+                with ThreadPoolExecutor(max_workers=jobs) as pool:
+                    outcomes = list(pool.map(run_rule_on_shared_model, pending))
+
+        for key, (result, error, seconds, output) in zip(pending, outcomes):
+            name, rule_func = rules[key]
+            if error is None:
+                cache.store(name, rule_func, result)
+            out["results"][key] = {"rule": name, "result": result, "error": error, "cached": False,
+                                   "seconds": round(seconds, 3), "output": output}
+        cache.save()
+        # worker processes keep their own counters, so only in-process runs are reported
+        if executor != "process":
+            out["access_stats"] = SHARED_MODEL.stats()
+
+    out["results"] = {k: out["results"][k] for k in keys}
+    return out
+
+def select_rules(selection: str):
+    """'all' or a comma-separated list of rule numbers/names -> rule keys."""
+    if not selection or selection == "all":
+        return list(rules)
+    keys = []
+    for token in selection.split(","):
+        token = token.strip()
+        match = [k for k, (name, _) in rules.items() if token == k or token.lower() == name.lower()]
+        if not match:
+            raise SystemExit(f"Unknown rule: {token!r} (choose from {', '.join(rules)})")
+        keys.extend(k for k in match if k not in keys)
+    return keys
+
+def interactive():
+    print("Select which rule you want to run:")
+    for key, (name, _) in rules.items():
+        print(f"{key}: {name}")
+
+    choice = input("Enter the number of the desired rule: ")
+
+    if choice in rules:
+        # the model is only parsed if this rule has no cached result for the current file content
+        outcome = run_batch(MODEL_PATH, [choice], executor="serial")["results"][choice]
+        if outcome["output"]:
+            print(outcome["output"], end="")
+        if outcome["error"]:
+            print(f"{outcome['rule']} failed:", outcome["error"])
+        else:
+            print(f"{outcome['rule']} result:", outcome["result"])
+    else:
+        print("Invalid choice.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Run BIM rule checks. Without a model argument, asks for one rule interactively.")
+    parser.add_argument("model", nargs="?", type=Path, help="IFC model; runs in batch mode")
+    parser.add_argument("--rules", default="all", help="'all' (default) or comma-separated rule numbers/names")
+    parser.add_argument("--executor", choices=("serial", "thread", "process"), default="thread")
+    parser.add_argument("--jobs", type=int, default=None, help="worker count (default: one per CPU)")
+    parser.add_argument("--out", type=Path, default=None, help="write the combined JSON here instead of stdout")
+    args = parser.parse_args()
+
+    if args.model is None:
+        interactive()
+        return
 
-choice = input("Enter the number of the desired rule: ")
+    combined = run_batch(args.model, select_rules(args.rules), executor=args.executor, jobs=args.jobs)
+    text = json.dumps(combined, indent=2, ensure_ascii=False, default=str)
+    if args.out:
+        args.out.write_text(text, encoding="utf-8")
+        print("Results written:", args.out)
+    else:
+        print(text)
 
-if choice in rules:
-    rule_name, rule_func = rules[choice]
-    result = rule_func(model)
-    print(f"{rule_name} result:", result)
-else:
-    print("Invalid choice.")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+================================================================================
+SHARED MEMOIZED MODEL ACCESS FOR THE RULE FUNCTIONS (main.py)
+================================================================================
+
+PURPOSE:
+
+Every checkRule(model) walks the model on its own. ModelAccess wraps one parsed
+ifcopenshell model and is handed to every rule in a run instead of the raw
+model: type queries, property-set lookups and containment relations are
+resolved once and then served from bounded LRU caches, so the work per element
+is done once per run rather than once per rule.
+
+Given the persisted entity index of the model (model_cache.build_model_index),
+these lookups are read from the index instead of walking the model, and the
+model is only opened (through open_model) when a rule needs its entities.
+
+Anything ModelAccess does not memoize is passed straight through to the
+wrapped model, so rules keep using the normal ifcopenshell.file API. Only
+calls made on the wrapper are memoized: a rule that calls
+ifcopenshell.util.element.get_psets(el) or get_container(el) itself still
+walks the model each time; use model.get_psets(el) / model.get_container(el)
+in rules to share the work.
+
+================================================================================
+"""
+
+# ===========================
+# IMPORTS
+# ===========================
+
+import copy
+import functools
+from typing import Dict, Any, Callable, List, Optional
+
+# ===========================
+# CONSTANTS
+# ===========================
+
+TYPE_CACHE_SIZE = 256         # distinct (type, include_subtypes) queries
+ELEMENT_CACHE_SIZE = 200_000  # per-element pset / container lookups
+
+# ===========================
+# ACCESS LAYER
+# ===========================
+
+class ModelAccess:
+    """
+    Memoizing wrapper around an ifcopenshell model for the duration of one run.
+    Pass the model, or open_model (called on first use) and the model's index.
+    """
+
+    def __init__(self, model=None, index: Optional[Dict[str, Any]] = None, open_model: Optional[Callable[[], Any]] = None,
+                 type_cache_size: int = TYPE_CACHE_SIZE, element_cache_size: int = ELEMENT_CACHE_SIZE):
+        self._model = model
+        self._open_model = open_model
+        self.index = index
+        self._by_type = functools.lru_cache(maxsize=type_cache_size)(self._query_type)
+        self._psets = functools.lru_cache(maxsize=element_cache_size)(self._query_psets)
+        self._container = functools.lru_cache(maxsize=element_cache_size)(self._query_container)
+        self._contained = functools.lru_cache(maxsize=element_cache_size)(self._query_contained)
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = self._open_model()
+        return self._model
+
+    def __getattr__(self, name):
+        # only called for attributes not defined here: fall through to the model
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.model, name)
+
+    # ---------- MEMOIZED QUERIES ----------
+
+    def by_type(self, type_name: str, include_subtypes: bool = True) -> List[Any]:
+        # copy, so a rule that mutates its list cannot corrupt the cache
+        return list(self._by_type(type_name, include_subtypes))
+
+    def get_psets(self, element, psets_only: bool = False, qtos_only: bool = False) -> Dict[str, Dict[str, Any]]:
+        """
+        Same as ifcopenshell.util.element.get_psets, computed once per element and run.
+        Returns a copy, so a rule that edits it cannot change what later rules see.
+        """
+        return copy.deepcopy(self._psets(element.id(), psets_only, qtos_only))
+
+    def get_pset(self, element, pset_name: str, prop: Optional[str] = None) -> Any:
+        values = self._psets(element.id(), False, False).get(pset_name)
+        if values is None or prop is None:
+            return copy.deepcopy(values)
+        return copy.deepcopy(values.get(prop))
+
+    def get_container(self, element):
+        """Spatial structure element (storey, space, ...) that contains element, or None."""
+        return self._container(element.id())
+
+    def get_contained(self, structure) -> List[Any]:
+        """Elements directly contained in a spatial structure element."""
+        return list(self._contained(structure.id()))
+
+    # ---------- UNCACHED IMPLEMENTATIONS ----------
+
+    def _query_type(self, type_name: str, include_subtypes: bool):
+        subtypes = self.index["subtypes"] if self.index is not None else None
+        if subtypes is not None and type_name.lower() in subtypes:
+            # classes with no instance (and non-IfcRoot classes) are not in the index: asked on the model
+            classes = subtypes[type_name.lower()] if include_subtypes else [c for c in subtypes[type_name.lower()] if c.lower() == type_name.lower()]
+            return tuple(self.model.by_id(i) for c in classes for i in self.index["by_type"][c])
+        return tuple(self.model.by_type(type_name, include_subtypes))
+
+    def _indexed(self, element_id: int) -> bool:
+        """Whether the index answers for this element (IfcRoot instances whose values are plain data)."""
+        return self.index is not None and element_id not in self.index["live"] and self.model.by_id(element_id).is_a("IfcRoot")
+
+    def _query_psets(self, element_id: int, psets_only: bool, qtos_only: bool):
+        if self._indexed(element_id):
+            psets = {} if qtos_only else self.index["psets"].get(element_id, {})
+            qtos = {} if psets_only else self.index["quantities"].get(element_id, {})
+            return {**psets, **qtos}
+        import ifcopenshell.util.element
+        return ifcopenshell.util.element.get_psets(self.model.by_id(element_id), psets_only=psets_only, qtos_only=qtos_only)
+
+    def _query_container(self, element_id: int):
+        if self._indexed(element_id):
+            container_id = self.index["container"].get(element_id)
+            return self.model.by_id(container_id) if container_id is not None else None
+        import ifcopenshell.util.element
+        return ifcopenshell.util.element.get_container(self.model.by_id(element_id))
+
+    def _query_contained(self, structure_id: int):
+        if self._indexed(structure_id):
+            return tuple(self.model.by_id(i) for i in self.index["contained"].get(structure_id, ()))
+        structure = self.model.by_id(structure_id)
+        elements = []
+        for rel in getattr(structure, "ContainsElements", None) or ():
+            elements.extend(rel.RelatedElements or ())
+        return tuple(elements)
+
+    # ---------- COUNTERS ----------
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Hit/miss counters per query kind, e.g. {"by_type": {"hits": 12, "misses": 3, "size": 3}}."""
+        out = {}
+        for name, cached in (("by_type", self._by_type), ("psets", self._psets), ("container", self._container), ("contained", self._contained)):
+            info = cached.cache_info()
+            out[name] = {"hits": info.hits, "misses": info.misses, "size": info.currsize}
+        return out
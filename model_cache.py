@@ -0,0 +1,295 @@
+"""
+================================================================================
+PERSISTENT MODEL INDEX CACHE FOR THE RULE RUNNER (main.py)
+================================================================================
+
+PURPOSE:
+
+Parsing a large IFC file with ifcopenshell dominates the runtime of main.py.
+This module keeps a precomputed entity index - and the results of rules that
+already ran - on disk, keyed by a content hash of the file. When the IFC has
+not changed, a rule result is served from the cache and the model is never
+parsed. A rule that has to run (new or edited) gets its pset, quantity and
+containment lookups from the index through ModelAccess (model_access.py); the
+model itself is only opened once a rule asks for entities.
+
+CACHE LAYOUT:
+
+ <cache dir>/<sha256 of model>-v<version>-m<marshal>-py<X.Y>.bin
+    marshal of {"version", "model_path", "created", "index", "results"}
+ <cache dir>/fingerprints.json
+    path -> [size, mtime_ns, sha256]  (skips rehashing an untouched file)
+
+ The cache dir is per user (BIM_RULE_CACHE_DIR, else %LOCALAPPDATA% or
+ $XDG_CACHE_HOME or ~/.cache, then "bim_rule_cache"), not next to the model:
+ entries are read back on every run, and a cache in a shared project folder
+ could be written by anyone with access to it. Entries are marshal data (no
+ pickle), so reading one never runs code; an unreadable entry is a miss.
+
+INDEX CONTENTS (STEP ids throughout):
+
+ - "by_type":    IFC class -> [ids]  (every IfcRoot instance, by its own class)
+ - "subtypes":   lower-case class -> [classes in "by_type" that are it or a
+                 subtype]; None if the schema could not be read
+ - "container":  id -> id of ifcopenshell.util.element.get_container(element)
+ - "contained":  spatial structure id -> [ids of elements contained in it]
+ - "psets":      id -> get_psets(element, psets_only=True)
+ - "quantities": id -> get_psets(element, qtos_only=True)
+ - "live":       ids whose property values are not plain data; looked up on the model
+
+EVICTION:
+
+Entries older than CACHE_MAX_AGE_DAYS (by last use) are removed first, then the
+least recently used entries until the directory is below CACHE_MAX_BYTES.
+
+================================================================================
+"""
+
+# ===========================
+# IMPORTS
+# ===========================
+
+from pathlib import Path
+import hashlib
+import inspect
+import json
+import marshal
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+# ===========================
+# CONSTANTS
+# ===========================
+
+CACHE_DIR_ENV = "BIM_RULE_CACHE_DIR"
+CACHE_VERSION = 3
+CACHE_MAX_BYTES = 512 * 1024 * 1024   # total size of all cache entries
+CACHE_MAX_AGE_DAYS = 30               # entries not used for this long are dropped
+HASH_CHUNK_BYTES = 1024 * 1024
+
+PLAIN_TYPES = (type(None), bool, int, float, str)
+
+def default_cache_dir() -> Path:
+    if os.environ.get(CACHE_DIR_ENV):
+        return Path(os.environ[CACHE_DIR_ENV])
+    base = os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "bim_rule_cache"
+
+# ===========================
+# CONTENT HASH
+# ===========================
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def rule_key(name: str, rule_func: Callable[[Any], Any]) -> str:
+    """Rule name plus a hash of the rule's source file, so editing a rule invalidates its cached results."""
+    try:
+        source = Path(inspect.getsourcefile(rule_func)).read_bytes()
+    except (TypeError, OSError):
+        source = getattr(getattr(rule_func, "__code__", None), "co_code", b"")
+    return f"{name}:{hashlib.sha256(source).hexdigest()[:16]}"
+
+def is_plain(value: Any) -> bool:
+    """Only None/bool/int/float/str in (nested) lists, tuples, sets and dicts: what the cache stores."""
+    if isinstance(value, PLAIN_TYPES):
+        return True
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return all(is_plain(v) for v in value)
+    if isinstance(value, dict):
+        return all(isinstance(k, (str, int)) and is_plain(v) for k, v in value.items())
+    return False
+
+# ===========================
+# INDEX BUILDING (ONE PASS PER RELATIONSHIP TYPE)
+# ===========================
+
+def subtype_closure(model, classes) -> Optional[Dict[str, List[str]]]:
+    """Lower-case class (and each of its supertypes) -> the given classes it covers, from the model's schema."""
+    try:
+        import ifcopenshell.ifcopenshell_wrapper as wrapper
+        schema = wrapper.schema_by_name(model.schema)
+        closure: Dict[str, List[str]] = {}
+        for name in classes:
+            decl = schema.declaration_by_name(name)
+            while decl is not None:
+                closure.setdefault(decl.name().lower(), []).append(name)
+                decl = decl.supertype()
+    except Exception:
+        return None
+    return closure
+
+def build_model_index(model) -> Dict[str, Any]:
+    """
+    The lookups ModelAccess serves, computed once per model content with the
+    ifcopenshell.util.element functions the live lookups use (see INDEX CONTENTS).
+    """
+    import ifcopenshell.util.element as element_util
+    index: Dict[str, Any] = {"by_type": {}, "subtypes": None, "container": {}, "contained": {},
+                             "psets": {}, "quantities": {}, "live": set()}
+
+    for el in model.by_type("IfcRoot"):
+        index["by_type"].setdefault(el.is_a(), []).append(el.id())
+    index["subtypes"] = subtype_closure(model, index["by_type"])
+
+    for rel in model.by_type("IfcRelContainedInSpatialStructure"):
+        index["contained"].setdefault(rel.RelatingStructure.id(), []).extend(el.id() for el in rel.RelatedElements or ())
+
+    for el in model.by_type("IfcProduct"):
+        container = element_util.get_container(el)
+        if container is not None:
+            index["container"][el.id()] = container.id()
+
+    # only objects and types with property definitions can have psets / quantities
+    defined = {}
+    for rel in model.by_type("IfcRelDefinesByProperties"):
+        defined.update((obj.id(), obj) for obj in rel.RelatedObjects or ())
+    for rel in model.by_type("IfcRelDefinesByType"):
+        if getattr(rel.RelatingType, "HasPropertySets", None):
+            defined.update((obj.id(), obj) for obj in rel.RelatedObjects or ())
+    for t in model.by_type("IfcTypeObject"):
+        if t.HasPropertySets:
+            defined[t.id()] = t
+
+    for el_id, el in defined.items():
+        psets = element_util.get_psets(el, psets_only=True)
+        qtos = element_util.get_psets(el, qtos_only=True)
+        if not (is_plain(psets) and is_plain(qtos)):
+            index["live"].add(el_id)
+            continue
+        if psets:
+            index["psets"][el_id] = psets
+        if qtos:
+            index["quantities"][el_id] = qtos
+    return index
+
+# ===========================
+# CACHE
+# ===========================
+
+class ModelCache:
+    """
+    On-disk cache entry for one IFC file. Loading the entry only needs a stat()
+    of the model (or one hash pass if it changed); the model itself is parsed
+    lazily through .model the first time something is not in the cache.
+    """
+
+    def __init__(self, model_path: Path, max_bytes: int = CACHE_MAX_BYTES, max_age_days: float = CACHE_MAX_AGE_DAYS,
+                 cache_dir: Optional[Path] = None):
+        self.model_path = Path(model_path)
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else default_cache_dir()
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_days * 86400.0
+        self.key = self._content_key()
+        # marshal's format may change between Python versions, so it is part of the name
+        self.entry_path = self.cache_dir / f"{self.key}-v{CACHE_VERSION}-m{marshal.version}-py{sys.version_info[0]}.{sys.version_info[1]}.bin"
+        self.entry = self._load_entry()
+        self._model = None
+        self._dirty = False
+
+    # ---------- KEY / ENTRY ----------
+
+    def _content_key(self) -> str:
+        st = self.model_path.stat()
+        fp_path = self.cache_dir / "fingerprints.json"
+        try:
+            fingerprints = json.loads(fp_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            fingerprints = {}
+        name = str(self.model_path.resolve())
+        known = fingerprints.get(name)
+        if known and known[0] == st.st_size and known[1] == st.st_mtime_ns:
+            return known[2]
+        digest = file_sha256(self.model_path)
+        fingerprints[name] = [st.st_size, st.st_mtime_ns, digest]
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            fp_path.write_text(json.dumps(fingerprints, indent=2), encoding="utf-8")
+        except OSError:
+            pass
+        return digest
+
+    def _load_entry(self) -> Dict[str, Any]:
+        try:
+            entry = marshal.loads(self.entry_path.read_bytes())
+            if entry.get("version") == CACHE_VERSION:
+                self.entry_path.touch()  # mark as recently used for eviction
+                return entry
+        except Exception:  # missing, truncated or otherwise unreadable entry: a miss
+            pass
+        return {"version": CACHE_VERSION, "model_path": str(self.model_path), "created": time.time(), "index": None, "results": {}}
+
+    # ---------- LAZY MODEL / INDEX ----------
+
+    @property
+    def model(self):
+        """The parsed ifcopenshell model; opened on first access only."""
+        if self._model is None:
+            import ifcopenshell
+            self._model = ifcopenshell.open(str(self.model_path))
+        return self._model
+
+    @property
+    def index(self) -> Dict[str, Any]:
+        """The entity index (see INDEX CONTENTS); building it parses the model, once per model content."""
+        if self.entry["index"] is None:
+            self.entry["index"] = build_model_index(self.model)
+            self._dirty = True
+        return self.entry["index"]
+
+    # ---------- RULE RESULTS ----------
+
+    def lookup(self, name: str, rule_func: Callable[[Any], Any]) -> Tuple[bool, Any]:
+        """(True, result) if rule_func already ran on this exact model content, else (False, None)."""
+        key = rule_key(name, rule_func)
+        if key in self.entry["results"]:
+            return True, self.entry["results"][key]
+        return False, None
+
+    def store(self, name: str, rule_func: Callable[[Any], Any], result: Any):
+        if not is_plain(result):
+            return  # not storable; still a valid result for this run
+        self.entry["results"][rule_key(name, rule_func)] = result
+        self._dirty = True
+
+    # ---------- PERSIST / EVICT ----------
+
+    def save(self):
+        if not self._dirty:
+            return
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # write-then-rename, so a concurrent run never reads half an entry
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(marshal.dumps(self.entry))
+        os.replace(tmp, self.entry_path)
+        self._dirty = False
+        self.evict()
+
+    def evict(self):
+        now = time.time()
+        entries = []
+        for p in self.cache_dir.glob("*.bin"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            if p != self.entry_path and now - st.st_mtime > self.max_age_s:
+                p.unlink(missing_ok=True)
+            else:
+                entries.append((st.st_mtime, st.st_size, p))
+        total = sum(size for _, size, _ in entries)
+        for _, size, p in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if p == self.entry_path:
+                continue
+            p.unlink(missing_ok=True)
+            total -= size